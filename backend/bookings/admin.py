@@ -5,13 +5,12 @@ from django import forms
 from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import reverse
-from django.db.models import Count, Sum, Q
-from django.utils import timezone as tz
-from django.http import HttpResponse
-from datetime import timedelta
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from django.db import IntegrityError, transaction
 from .models import User, Booking, BookingVersion, Room, RoomIssue, Notification
+from .serializers import is_room_conflict
+from . import events, search
+from .stats import admin_index_stats, invalidate_admin_stats, invalidate_room_issue_summary
+from .exports import BookingExport, BookingVersionExport, RoomExport, RoomIssueExport, UserExport
 
 # Customize admin site header and title
 admin.site.site_header = 'Pama Lodge Administration'
@@ -25,97 +24,7 @@ original_index = admin.site.index
 def custom_index(request, extra_context=None):
     """Custom admin index with statistics"""
     extra_context = extra_context or {}
-    
-    # Get statistics
-    today = tz.now().date()
-    week_ago = today - timedelta(days=7)
-    
-    # Booking statistics
-    total_bookings = Booking.objects.filter(is_original=True, deleted_at__isnull=True).count()
-    authorized_bookings = Booking.objects.filter(is_original=True, status='authorized', deleted_at__isnull=True).count()
-    pending_bookings = Booking.objects.filter(is_original=True, status='pending', deleted_at__isnull=True).count()
-    rejected_bookings = Booking.objects.filter(is_original=True, status='rejected', deleted_at__isnull=True).count()
-    deleted_bookings = Booking.objects.filter(is_original=True, deleted_at__isnull=False).count()
-    today_bookings = Booking.objects.filter(is_original=True, check_in_date=today, deleted_at__isnull=True).count()
-    week_bookings = Booking.objects.filter(is_original=True, check_in_date__gte=week_ago, deleted_at__isnull=True).count()
-    
-    # Revenue statistics
-    total_revenue = Booking.objects.filter(
-        is_original=True, 
-        status='authorized', 
-        deleted_at__isnull=True
-    ).aggregate(total=Sum('amount_ghs'))['total'] or 0
-    
-    today_revenue = Booking.objects.filter(
-        is_original=True,
-        check_in_date=today,
-        status='authorized',
-        deleted_at__isnull=True
-    ).aggregate(total=Sum('amount_ghs'))['total'] or 0
-    
-    week_revenue = Booking.objects.filter(
-        is_original=True,
-        check_in_date__gte=week_ago,
-        status='authorized',
-        deleted_at__isnull=True
-    ).aggregate(total=Sum('amount_ghs'))['total'] or 0
-    
-    # Room statistics
-    total_rooms = Room.objects.count()
-    available_rooms = Room.objects.filter(is_available=True).count()
-    booked_rooms = total_rooms - available_rooms
-    
-    # User statistics
-    total_users = User.objects.count()
-    managers = User.objects.filter(role='manager').count()
-    receptionists = User.objects.filter(role='receptionist').count()
-    
-    # Room Issues statistics
-    total_issues = RoomIssue.objects.count()
-    reported_issues = RoomIssue.objects.filter(status='reported').count()
-    in_progress_issues = RoomIssue.objects.filter(status='in_progress').count()
-    fixed_issues = RoomIssue.objects.filter(status='fixed').count()
-    
-    # Booking Versions
-    total_versions = BookingVersion.objects.count()
-    
-    extra_context.update({
-        'stats': {
-            'bookings': {
-                'total': total_bookings,
-                'authorized': authorized_bookings,
-                'pending': pending_bookings,
-                'rejected': rejected_bookings,
-                'deleted': deleted_bookings,
-                'today': today_bookings,
-                'this_week': week_bookings,
-            },
-            'revenue': {
-                'total': float(total_revenue),
-                'today': float(today_revenue),
-                'this_week': float(week_revenue),
-            },
-            'rooms': {
-                'total': total_rooms,
-                'available': available_rooms,
-                'booked': booked_rooms,
-            },
-            'users': {
-                'total': total_users,
-                'managers': managers,
-                'receptionists': receptionists,
-            },
-            'issues': {
-                'total': total_issues,
-                'reported': reported_issues,
-                'in_progress': in_progress_issues,
-                'fixed': fixed_issues,
-            },
-            'versions': {
-                'total': total_versions,
-            }
-        }
-    })
+    extra_context['stats'] = admin_index_stats()
     
     return original_index(request, extra_context)
 
@@ -194,63 +103,7 @@ class UserAdmin(BaseUserAdmin):
     
     def export_excel(self, request, queryset):
         """Export users to Excel file"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Users"
-        
-        # Headers
-        headers = [
-            'ID', 'Username', 'First Name', 'Last Name', 'Email',
-            'Role', 'Is Staff', 'Is Superuser', 'Is Active', 'Date Joined', 'Last Login'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, user in enumerate(queryset, 2):
-            ws.cell(row=row_num, column=1, value=user.id)
-            ws.cell(row=row_num, column=2, value=user.username)
-            ws.cell(row=row_num, column=3, value=user.first_name or '')
-            ws.cell(row=row_num, column=4, value=user.last_name or '')
-            ws.cell(row=row_num, column=5, value=user.email or '')
-            ws.cell(row=row_num, column=6, value=user.get_role_display())
-            ws.cell(row=row_num, column=7, value='Yes' if user.is_staff else 'No')
-            ws.cell(row=row_num, column=8, value='Yes' if user.is_superuser else 'No')
-            ws.cell(row=row_num, column=9, value='Yes' if user.is_active else 'No')
-            ws.cell(row=row_num, column=10, value=user.date_joined.strftime('%Y-%m-%d %H:%M:%S') if user.date_joined else '')
-            ws.cell(row=row_num, column=11, value=user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else '')
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"users_export_{tz.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return UserExport().response(queryset)
     export_excel.short_description = "Export selected users to Excel"
 
 
@@ -265,59 +118,7 @@ class RoomAdmin(admin.ModelAdmin):
     
     def export_excel(self, request, queryset):
         """Export rooms to Excel file"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Rooms"
-        
-        # Headers
-        headers = [
-            'ID', 'Room Number', 'Room Type', 'Price Per Night (GHS)',
-            'Is Available', 'Created At', 'Updated At'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, room in enumerate(queryset, 2):
-            ws.cell(row=row_num, column=1, value=room.id)
-            ws.cell(row=row_num, column=2, value=room.room_number)
-            ws.cell(row=row_num, column=3, value=room.get_room_type_display())
-            ws.cell(row=row_num, column=4, value=float(room.price_per_night))
-            ws.cell(row=row_num, column=5, value='Yes' if room.is_available else 'No')
-            ws.cell(row=row_num, column=6, value=room.created_at.strftime('%Y-%m-%d %H:%M:%S') if room.created_at else '')
-            ws.cell(row=row_num, column=7, value=room.updated_at.strftime('%Y-%m-%d %H:%M:%S') if room.updated_at else '')
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"rooms_export_{tz.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return RoomExport().response(queryset)
     export_excel.short_description = "Export selected rooms to Excel"
 
 
@@ -357,6 +158,15 @@ class BookingAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.filter(is_original=True)
     
+    def get_search_results(self, request, queryset, search_term):
+        """Guest search through the same trigram indexes as the API (bookings.search)"""
+        if not search_term.strip():
+            return queryset, False
+        # The changelist runs its queries later, outside any transaction the
+        # API's lower similarity threshold could be set in, so fuzzy name
+        # matches here use pg_trgm's default threshold
+        return search.matching(queryset, search_term), False
+    
     def soft_delete_selected(self, request, queryset):
         """Soft delete selected bookings"""
         # Only soft delete bookings that aren't already deleted
@@ -366,7 +176,9 @@ class BookingAdmin(admin.ModelAdmin):
         for booking in to_delete:
             booking.deleted_at = timezone.now()
             booking.deleted_by = request.user
-            booking.save()
+            # Each booking with its derived data (revenue rollup) or not at all
+            with transaction.atomic():
+                booking.save()
         
         if count > 0:
             self.message_user(request, f'{count} booking(s) soft deleted successfully.')
@@ -380,12 +192,20 @@ class BookingAdmin(admin.ModelAdmin):
         to_restore = queryset.filter(deleted_at__isnull=False)
         restored_count = 0
         expired_count = 0
+        conflict_count = 0
         
         for booking in to_restore:
             if booking.can_restore:
                 booking.deleted_at = None
                 booking.deleted_by = None
-                booking.save()
+                try:
+                    with transaction.atomic():
+                        booking.save()
+                except IntegrityError as e:
+                    if not is_room_conflict(e):
+                        raise
+                    conflict_count += 1
+                    continue
                 restored_count += 1
             else:
                 expired_count += 1
@@ -395,6 +215,8 @@ class BookingAdmin(admin.ModelAdmin):
             messages.append(f'{restored_count} booking(s) restored successfully.')
         if expired_count > 0:
             messages.append(f'{expired_count} booking(s) could not be restored (30-day period expired).')
+        if conflict_count > 0:
+            messages.append(f'{conflict_count} booking(s) could not be restored (room already booked for those dates).')
         
         if messages:
             self.message_user(request, ' '.join(messages))
@@ -409,13 +231,14 @@ class BookingAdmin(admin.ModelAdmin):
             return
         
         count = queryset.count()
-        # Delete all related booking versions first (if they exist)
-        for booking in queryset:
-            # Get all versions related to this booking
-            BookingVersion.objects.filter(booking=booking).delete()
-        
-        # Permanently delete the bookings
-        queryset.delete()
+        with transaction.atomic():
+            # Delete all related booking versions first (if they exist)
+            for booking in queryset:
+                # Get all versions related to this booking
+                BookingVersion.objects.filter(booking=booking).delete()
+            
+            # Permanently delete the bookings
+            queryset.delete()
         
         self.message_user(
             request, 
@@ -432,8 +255,9 @@ class BookingAdmin(admin.ModelAdmin):
         
         if permanent and request.user.is_manager():
             # Permanently delete
-            BookingVersion.objects.filter(booking=obj).delete()  # Delete related versions
-            obj.delete()  # Permanently delete
+            with transaction.atomic():
+                BookingVersion.objects.filter(booking=obj).delete()  # Delete related versions
+                obj.delete()  # Permanently delete
             self.message_user(
                 request, 
                 f'Booking "{obj.name}" has been permanently deleted. This action cannot be undone.',
@@ -443,7 +267,8 @@ class BookingAdmin(admin.ModelAdmin):
             # Soft delete (default)
             obj.deleted_at = timezone.now()
             obj.deleted_by = request.user
-            obj.save()
+            with transaction.atomic():
+                obj.save()
             self.message_user(request, f'Booking "{obj.name}" has been soft deleted.')
     
     def delete_queryset(self, request, queryset):
@@ -455,9 +280,10 @@ class BookingAdmin(admin.ModelAdmin):
         if permanent and request.user.is_manager():
             # Permanently delete
             count = queryset.count()
-            for booking in queryset:
-                BookingVersion.objects.filter(booking=booking).delete()  # Delete related versions
-            queryset.delete()  # Permanently delete
+            with transaction.atomic():
+                for booking in queryset:
+                    BookingVersion.objects.filter(booking=booking).delete()  # Delete related versions
+                queryset.delete()  # Permanently delete
             self.message_user(
                 request, 
                 f'{count} booking(s) permanently deleted. This action cannot be undone.',
@@ -469,94 +295,21 @@ class BookingAdmin(admin.ModelAdmin):
             for booking in queryset.filter(deleted_at__isnull=True):
                 booking.deleted_at = timezone.now()
                 booking.deleted_by = request.user
-                booking.save()
+                with transaction.atomic():
+                    booking.save()
             
             if count > 0:
                 self.message_user(request, f'{count} booking(s) soft deleted successfully.')
     
     def export_excel(self, request, queryset):
         """Export bookings to Excel file"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Bookings"
-        
-        # Headers
-        headers = [
-            'ID', 'Guest Name', 'Phone Number', 'Address/Location', 'Age',
-            'Room Number', 'Room Type', 'Check-in Date', 'Check-in Time',
-            'Check-out Date', 'Check-out Time', 'Payment Method',
-            'Amount (GHS)', 'Cash Amount', 'MoMo Amount', 'MoMo Network',
-            'MoMo Number', 'Booked By', 'Created At', 'Last Edited By',
-            'Updated At', 'Authorized/Rejected By', 'Status', 'Rejection Reason', 'Version Number'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, booking in enumerate(queryset, 2):
-            ws.cell(row=row_num, column=1, value=booking.id)
-            ws.cell(row=row_num, column=2, value=booking.name)
-            ws.cell(row=row_num, column=3, value=booking.id_or_telephone)
-            ws.cell(row=row_num, column=4, value=booking.address_location)
-            ws.cell(row=row_num, column=5, value=booking.age)
-            ws.cell(row=row_num, column=6, value=booking.room_no)
-            ws.cell(row=row_num, column=7, value=booking.room.get_room_type_display() if booking.room else 'N/A')
-            ws.cell(row=row_num, column=8, value=str(booking.check_in_date))
-            ws.cell(row=row_num, column=9, value=str(booking.check_in_time))
-            ws.cell(row=row_num, column=10, value=str(booking.check_out_date) if booking.check_out_date else '')
-            ws.cell(row=row_num, column=11, value=str(booking.check_out_time) if booking.check_out_time else '')
-            ws.cell(row=row_num, column=12, value=booking.get_payment_method_display())
-            ws.cell(row=row_num, column=13, value=float(booking.amount_ghs))
-            ws.cell(row=row_num, column=14, value=float(booking.cash_amount))
-            ws.cell(row=row_num, column=15, value=float(booking.momo_amount))
-            ws.cell(row=row_num, column=16, value=booking.momo_network or '')
-            ws.cell(row=row_num, column=17, value=booking.momo_number)
-            ws.cell(row=row_num, column=18, value=booking.booked_by.username if booking.booked_by else '')
-            ws.cell(row=row_num, column=19, value=booking.created_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=20, value=booking.last_edited_by.username if booking.last_edited_by else '')
-            ws.cell(row=row_num, column=21, value=booking.updated_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=22, value=booking.authorized_by or booking.rejected_by or '')
-            ws.cell(row=row_num, column=23, value=booking.get_status_display())
-            ws.cell(row=row_num, column=24, value=booking.rejection_reason or '')
-            ws.cell(row=row_num, column=25, value=booking.version_number)
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"bookings_export_{tz.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return BookingExport().response(queryset)
     export_excel.short_description = "Export selected bookings to Excel"
 
 
 @admin.register(BookingVersion)
 class BookingVersionAdmin(admin.ModelAdmin):
-    list_display = ['booking', 'edited_by', 'edited_at', 'is_manager_edit']
+    list_display = ['booking', 'sequence', 'edited_by', 'edited_at', 'is_manager_edit', 'is_snapshot']
     list_filter = ['is_manager_edit', 'edited_at']
     readonly_fields = ['edited_at']
     actions = ['export_excel']
@@ -564,64 +317,7 @@ class BookingVersionAdmin(admin.ModelAdmin):
     
     def export_excel(self, request, queryset):
         """Export booking versions to Excel file"""
-        import json
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Booking Versions"
-        
-        # Headers
-        headers = [
-            'Version ID', 'Booking ID', 'Guest Name', 'Room Number',
-            'Edited By', 'Edited At', 'Is Manager Edit', 'Version Data (JSON)'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, version in enumerate(queryset, 2):
-            version_data = version.version_data
-            booking = version.booking
-            ws.cell(row=row_num, column=1, value=version.id)
-            ws.cell(row=row_num, column=2, value=booking.id if booking else '')
-            ws.cell(row=row_num, column=3, value=version_data.get('name', ''))
-            ws.cell(row=row_num, column=4, value=version_data.get('room_no', ''))
-            ws.cell(row=row_num, column=5, value=version.edited_by.username if version.edited_by else '')
-            ws.cell(row=row_num, column=6, value=version.edited_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=7, value='Yes' if version.is_manager_edit else 'No')
-            ws.cell(row=row_num, column=8, value=json.dumps(version_data, indent=2))
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"booking_versions_export_{tz.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return BookingVersionExport().response(queryset)
     export_excel.short_description = "Export selected booking versions to Excel"
 
 
@@ -665,85 +361,37 @@ class RoomIssueAdmin(admin.ModelAdmin):
     
     def mark_as_fixed(self, request, queryset):
         """Mark selected issues as fixed"""
+        issue_ids = list(queryset.values_list('pk', flat=True))
+        now = timezone.now()
+        # update() skips auto_now, which delta sync reads
         updated = queryset.update(
             status='fixed',
             fixed_by=request.user,
-            fixed_at=timezone.now()
+            fixed_at=now,
+            updated_at=now
         )
+        # Bulk updates skip the signals that publish live events
+        for issue in RoomIssue.objects.filter(pk__in=issue_ids):
+            events.room_issue_changed(issue)
+        invalidate_admin_stats()
+        invalidate_room_issue_summary()
         self.message_user(request, f'{updated} issue(s) marked as fixed.')
     mark_as_fixed.short_description = "Mark selected issues as fixed"
     
     def mark_as_in_progress(self, request, queryset):
         """Mark selected issues as in progress"""
-        updated = queryset.update(status='in_progress')
+        issue_ids = list(queryset.values_list('pk', flat=True))
+        updated = queryset.update(status='in_progress', updated_at=timezone.now())
+        for issue in RoomIssue.objects.filter(pk__in=issue_ids):
+            events.room_issue_changed(issue)
+        invalidate_admin_stats()
+        invalidate_room_issue_summary()
         self.message_user(request, f'{updated} issue(s) marked as in progress.')
     mark_as_in_progress.short_description = "Mark selected issues as in progress"
     
     def export_excel(self, request, queryset):
         """Export room issues to Excel file"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Room Issues"
-        
-        # Headers
-        headers = [
-            'ID', 'Room Number', 'Room Type', 'Issue Type', 'Title',
-            'Description', 'Status', 'Priority', 'Reported By',
-            'Reported At', 'Fixed By', 'Fixed At', 'Resolution Notes',
-            'Created At', 'Updated At'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, issue in enumerate(queryset, 2):
-            ws.cell(row=row_num, column=1, value=issue.id)
-            ws.cell(row=row_num, column=2, value=issue.room.room_number)
-            ws.cell(row=row_num, column=3, value=issue.room.get_room_type_display())
-            ws.cell(row=row_num, column=4, value=issue.get_issue_type_display())
-            ws.cell(row=row_num, column=5, value=issue.title)
-            ws.cell(row=row_num, column=6, value=issue.description)
-            ws.cell(row=row_num, column=7, value=issue.get_status_display())
-            ws.cell(row=row_num, column=8, value=issue.get_priority_display())
-            ws.cell(row=row_num, column=9, value=issue.reported_by.username if issue.reported_by else '')
-            ws.cell(row=row_num, column=10, value=issue.reported_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=11, value=issue.fixed_by.username if issue.fixed_by else '')
-            ws.cell(row=row_num, column=12, value=issue.fixed_at.strftime('%Y-%m-%d %H:%M:%S') if issue.fixed_at else '')
-            ws.cell(row=row_num, column=13, value=issue.resolution_notes)
-            ws.cell(row=row_num, column=14, value=issue.created_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=15, value=issue.updated_at.strftime('%Y-%m-%d %H:%M:%S'))
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"room_issues_export_{tz.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return RoomIssueExport().response(queryset)
     export_excel.short_description = "Export selected room issues to Excel"
 
 
@@ -752,6 +400,6 @@ class NotificationAdmin(admin.ModelAdmin):
     list_display = ['id', 'notification_type', 'title', 'created_at']
     list_filter = ['notification_type', 'created_at']
     search_fields = ['title', 'message']
-    readonly_fields = ['notification_type', 'title', 'message', 'link', 'created_at', 'read_by']
+    readonly_fields = ['notification_type', 'title', 'message', 'link', 'created_at']
     date_hierarchy = 'created_at'
 
@@ -0,0 +1,217 @@
+"""
+Operational analytics.
+
+Issue resolution times are single grouped aggregate queries. Occupancy,
+ADR and RevPAR expand one fetch of the overlapping bookings into
+room-nights with NumPy array operations. Nothing here iterates over
+individual rows or days in Python.
+"""
+from datetime import timedelta
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Aggregate, Avg, Count, F, FloatField, Func, Q
+from django.utils import timezone
+
+from .models import Booking, Room, RoomIssue
+
+# Percentiles reported for issue resolution times
+RESOLUTION_PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL percentile_cont for several fractions at once, as an array"""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(%(fractions)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fractions, **extra):
+        fractions = 'ARRAY[%s]::double precision[]' % ', '.join(str(float(fraction)) for fraction in fractions)
+        super().__init__(expression, fractions=fractions, output_field=ArrayField(FloatField()), **extra)
+
+
+class EpochSeconds(Func):
+    """Length of an interval in seconds"""
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+def _resolution_stats(row):
+    percentiles = row['percentiles'] or [None] * len(RESOLUTION_PERCENTILES)
+    stats = {
+        'count': row['count'],
+        'mean_hours': _hours(row['mean']),
+    }
+    for fraction, value in zip(RESOLUTION_PERCENTILES, percentiles):
+        stats[f'p{round(fraction * 100)}_hours'] = _hours(value)
+    return stats
+
+
+def _hours(seconds):
+    return None if seconds is None else round(seconds / 3600, 2)
+
+
+def resolution_times(start=None, end=None):
+    """
+    Mean and percentile time from report to fix, in hours, for issues
+    reported between start and end (inclusive dates) that have been fixed.
+    """
+    issues = RoomIssue.objects.filter(fixed_at__isnull=False)
+    if start:
+        issues = issues.filter(reported_at__date__gte=start)
+    if end:
+        issues = issues.filter(reported_at__date__lte=end)
+    issues = issues.order_by().annotate(seconds=EpochSeconds(F('fixed_at') - F('reported_at')))
+
+    aggregates = {
+        'count': Count('id'),
+        'mean': Avg('seconds'),
+        'percentiles': PercentileCont('seconds', RESOLUTION_PERCENTILES),
+    }
+
+    overall = _resolution_stats(issues.aggregate(**aggregates))
+
+    by_room = [
+        {'room': row['room'], 'room_number': row['room__room_number'], **_resolution_stats(row)}
+        for row in issues.values('room', 'room__room_number').annotate(**aggregates).order_by('-mean')
+    ]
+
+    type_names = dict(RoomIssue.ISSUE_TYPE_CHOICES)
+    by_type = {
+        row['issue_type']: {'display': type_names.get(row['issue_type'], row['issue_type']), **_resolution_stats(row)}
+        for row in issues.values('issue_type').annotate(**aggregates).order_by('issue_type')
+    }
+
+    priority_names = dict(RoomIssue._meta.get_field('priority').choices)
+    by_priority = {
+        row['priority']: {'display': priority_names.get(row['priority'], row['priority']), **_resolution_stats(row)}
+        for row in issues.values('priority').annotate(**aggregates).order_by('priority')
+    }
+
+    return {
+        'overall': overall,
+        'by_room': by_room,
+        'by_type': by_type,
+        'by_priority': by_priority,
+    }
+
+
+def _occupancy_metrics(sold, revenue, rooms):
+    """
+    JSON-ready lists of occupancy, ADR and RevPAR for aligned arrays of
+    rooms sold, revenue and rooms available; undefined ratios are None.
+    """
+    import numpy as np
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = {
+            'occupancy': np.round(sold / rooms, 4),
+            'adr': np.round(revenue / sold, 2),
+            'revpar': np.round(revenue / rooms, 2),
+        }
+    metrics = {
+        'rooms': rooms.tolist(),
+        'sold': sold.tolist(),
+        'revenue': np.round(revenue, 2).tolist(),
+    }
+    for key, values in ratios.items():
+        metrics[key] = np.where(np.isfinite(values), values, None).tolist()
+    return metrics
+
+
+def occupancy(start, end):
+    """
+    Occupancy, ADR and RevPAR for every day from start to end (inclusive),
+    overall and per room type.
+
+    Only authorized, non-deleted bookings count as sold room-nights. A
+    booking's amount is spread evenly over its nights; a stay with no
+    check-out runs up to and including today, and a same-day stay counts
+    as one night. Inventory is the rooms that exist now.
+    """
+    import numpy as np
+
+    n_days = (end - start).days + 1
+    room_types = [room_type for room_type, _ in Room.ROOM_TYPE_CHOICES]
+    type_index = {room_type: i for i, room_type in enumerate(room_types)}
+
+    inventory = np.zeros(len(room_types), dtype=np.int64)
+    for row in Room.objects.order_by().values('room_type').annotate(rooms=Count('id')):
+        if row['room_type'] in type_index:
+            inventory[type_index[row['room_type']]] = row['rooms']
+
+    # Rooms sold and revenue per room type per day, via difference arrays:
+    # +x where a stay starts and -x where it ends, then a running sum
+    sold = np.zeros((len(room_types), n_days + 1), dtype=np.int64)
+    revenue = np.zeros((len(room_types), n_days + 1), dtype=np.float64)
+
+    # By dates rather than the stay range, which is empty for same-day stays
+    stays = list(Booking.objects.filter(
+        Q(check_out_date__isnull=True) | Q(check_out_date__gte=start),
+        is_original=True,
+        status='authorized',
+        deleted_at__isnull=True,
+        room__isnull=False,
+        check_in_date__lte=end,
+    ).values_list('room__room_type', 'check_in_date', 'check_out_date', 'amount_ghs'))
+    stays = [stay for stay in stays if stay[0] in type_index]
+
+    if stays:
+        stay_types, check_ins, check_outs, amounts = zip(*stays)
+        rows = np.fromiter((type_index[room_type] for room_type in stay_types), dtype=np.int64, count=len(stays))
+        origin = np.datetime64(start, 'D')
+        today = timezone.now().date()
+        starts = (np.array(check_ins, dtype='datetime64[D]') - origin).astype(np.int64)
+        ends = np.array(
+            [check_out if check_out is not None else today + timedelta(days=1) for check_out in check_outs],
+            dtype='datetime64[D]',
+        )
+        ends = (ends - origin).astype(np.int64)
+        # Same-day stays still hold the room for a night
+        ends = np.maximum(ends, starts + 1)
+        nightly = np.array(amounts, dtype=np.float64) / (ends - starts)
+
+        starts = np.clip(starts, 0, n_days)
+        ends = np.clip(ends, 0, n_days)
+        np.add.at(sold, (rows, starts), 1)
+        np.add.at(sold, (rows, ends), -1)
+        np.add.at(revenue, (rows, starts), nightly)
+        np.add.at(revenue, (rows, ends), -nightly)
+
+    sold = np.cumsum(sold[:, :-1], axis=1)
+    revenue = np.cumsum(revenue[:, :-1], axis=1)
+    # Running sums of floats leave dust where revenue should be zero
+    revenue[sold == 0] = 0
+
+    per_type_rooms = np.repeat(inventory[:, None], n_days, axis=1)
+    daily_types = [_occupancy_metrics(sold[i], revenue[i], per_type_rooms[i]) for i in range(len(room_types))]
+    daily_total = _occupancy_metrics(sold.sum(axis=0), revenue.sum(axis=0), per_type_rooms.sum(axis=0))
+
+    # Whole-range figures: room-nights sold over room-nights available
+    range_types = _occupancy_metrics(sold.sum(axis=1), revenue.sum(axis=1), inventory * n_days)
+    range_total = _occupancy_metrics(
+        np.array([sold.sum()]), np.array([revenue.sum()]), np.array([inventory.sum() * n_days])
+    )
+
+    type_names = dict(Room.ROOM_TYPE_CHOICES)
+    dates = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1).astype(str).tolist()
+
+    return {
+        'summary': {key: values[0] for key, values in range_total.items()},
+        'room_types': {
+            room_type: {
+                'display': type_names[room_type],
+                'summary': {key: values[i] for key, values in range_types.items()},
+            }
+            for i, room_type in enumerate(room_types)
+        },
+        'daily': [
+            {
+                'date': day,
+                **{key: values[d] for key, values in daily_total.items()},
+                'by_room_type': {
+                    room_type: {key: values[d] for key, values in daily_types[i].items()}
+                    for i, room_type in enumerate(room_types)
+                },
+            }
+            for d, day in enumerate(dates)
+        ],
+    }
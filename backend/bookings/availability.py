@@ -0,0 +1,219 @@
+"""
+Room availability engine.
+
+Decides availability for any number of rooms with a single overlap query
+instead of loading and scanning every booking per room in Python.
+"""
+from datetime import timedelta
+
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import Exists, OuterRef, Q
+
+from . import occupancy
+from .models import Booking, Room, holds_room_q
+
+
+def conflicting_bookings(check_in_date, check_out_date=None, exclude_booking_id=None):
+    """
+    Bookings that block the requested stay, for any room.
+
+    Uses the same rule as the exclusion constraint on Booking, so a room
+    reported free can always be booked: an active booking (see holds_room_q)
+    blocks the stay when the two stay ranges overlap. Check-out days are
+    free again, a stay without a check-out runs on indefinitely, and a stay
+    that ends on or before it starts occupies nothing. The GiST index on
+    (room, stay) turns this into a range scan.
+    """
+    bookings = Booking.objects.filter(
+        holds_room_q(),
+        stay__overlap=Booking.stay_range(check_in_date, check_out_date),
+    )
+
+    if exclude_booking_id:
+        bookings = bookings.exclude(id=exclude_booking_id)
+
+    return bookings
+
+
+def available_rooms(check_in_date, check_out_date=None, exclude_booking_id=None, rooms=None):
+    """
+    Rooms that are open for booking and free for the requested stay.
+
+    Runs as one query (an anti-join against conflicting bookings) no matter
+    how many rooms are being considered.
+    """
+    if rooms is None:
+        rooms = Room.objects.all()
+
+    conflicts = conflicting_bookings(
+        check_in_date, check_out_date, exclude_booking_id
+    ).filter(room=OuterRef('pk'))
+
+    return rooms.filter(is_available=True).filter(~Exists(conflicts))
+
+
+def find_available_rooms(check_in_date, check_out_date=None, exclude_booking_id=None, room_type=None):
+    """
+    Available rooms for the requested stay, answered from the in-process
+    occupancy index when it is enabled and from the database otherwise.
+    """
+    if occupancy.is_enabled():
+        return occupancy.get_index().available_rooms(
+            check_in_date, check_out_date, exclude_booking_id, room_type=room_type
+        )
+
+    rooms = Room.objects.all()
+    if room_type:
+        rooms = rooms.filter(room_type=room_type)
+    return available_rooms(check_in_date, check_out_date, exclude_booking_id, rooms=rooms)
+
+
+def is_room_available(room, check_in_date, check_out_date=None, exclude_booking_id=None):
+    """Check a single room using the same rules as available_rooms"""
+    if not room.is_available:
+        return False
+
+    if occupancy.is_enabled():
+        return occupancy.get_index().is_room_free(
+            room.id, check_in_date, check_out_date, exclude_booking_id
+        )
+
+    return not conflicting_bookings(
+        check_in_date, check_out_date, exclude_booking_id
+    ).filter(room=room).exists()
+
+
+def room_status_board(rooms, start_date, end_date=None):
+    """
+    Occupancy of every room for each day from start_date to end_date.
+
+    Returns a list of (day, entries) pairs where each entry holds the room,
+    its is_booked flag and the current booking (if any). Costs two queries
+    (rooms and the bookings overlapping the window) however many rooms or
+    days are requested.
+    """
+    end_date = end_date or start_date
+    rooms = list(rooms)
+
+    # Bookings touching the window, newest first so the first match per day
+    # is the same booking the board has always shown
+    bookings = Booking.objects.filter(
+        holds_room_q(),
+        room__in=[room.id for room in rooms],
+        check_in_date__lte=end_date,
+    ).filter(
+        Q(check_out_date__isnull=True) | Q(check_out_date__gte=start_date)
+    ).order_by('-created_at', '-id').values(
+        'room_id', 'name', 'check_in_date', 'check_out_date'
+    )
+
+    bookings_by_room = {}
+    for booking in bookings:
+        bookings_by_room.setdefault(booking['room_id'], []).append(booking)
+
+    board = []
+    day = start_date
+    while day <= end_date:
+        entries = []
+        for room in rooms:
+            room_bookings = bookings_by_room.get(room.id, [])
+            blocked = any(_blocks_day(booking, day) for booking in room_bookings)
+            is_booked = not room.is_available or blocked
+
+            current_booking = None
+            if is_booked:
+                for booking in room_bookings:
+                    check_out = booking['check_out_date']
+                    if booking['check_in_date'] <= day and (check_out is None or check_out >= day):
+                        current_booking = booking
+                        break
+
+            entries.append({
+                'room': room,
+                'is_booked': is_booked,
+                'current_booking': current_booking,
+            })
+        board.append((day, entries))
+        day += timedelta(days=1)
+
+    return board
+
+
+def _blocks_day(booking, day):
+    """Whether booking occupies the night of day (check-out days are free)"""
+    if booking['check_out_date'] is None:
+        return booking['check_in_date'] <= day
+    return booking['check_in_date'] <= day < booking['check_out_date']
+
+
+def occupancy_calendar(rooms, start_date, end_date):
+    """
+    Rooms x days occupancy for start_date..end_date (inclusive).
+
+    Returns the rooms (as a list) and a boolean NumPy matrix where
+    matrix[i, d] is True when rooms[i] is occupied on start_date + d days.
+    Built in one pass over the overlapping bookings with a difference
+    array, so a year of all rooms is a handful of vector operations.
+    """
+    import numpy as np
+
+    rooms = list(rooms)
+    n_days = (end_date - start_date).days + 1
+    matrix = np.zeros((len(rooms), n_days), dtype=bool)
+    if not rooms:
+        return rooms, matrix
+
+    room_index = {room.id: i for i, room in enumerate(rooms)}
+    bookings = list(Booking.objects.filter(
+        holds_room_q(),
+        room__in=list(room_index),
+        stay__overlap=DateRange(start_date, end_date, '[]'),
+    ).values_list('room_id', 'check_in_date', 'check_out_date'))
+    if not bookings:
+        return rooms, matrix
+
+    room_ids, check_ins, check_outs = zip(*bookings)
+    rows = np.fromiter((room_index[room_id] for room_id in room_ids), dtype=np.int64, count=len(room_ids))
+    origin = np.datetime64(start_date, 'D')
+    starts = (np.array(check_ins, dtype='datetime64[D]') - origin).astype(np.int64)
+    # Ongoing stays run past the end of the window
+    ends = np.array(
+        [check_out if check_out is not None else end_date + timedelta(days=1) for check_out in check_outs],
+        dtype='datetime64[D]',
+    )
+    ends = (ends - origin).astype(np.int64)
+
+    starts = np.clip(starts, 0, n_days)
+    ends = np.clip(ends, 0, n_days)
+
+    # +1 where a stay starts, -1 where it ends; a running sum > 0 is occupied
+    diff = np.zeros((len(rooms), n_days + 1), dtype=np.int32)
+    np.add.at(diff, (rows, starts), 1)
+    np.add.at(diff, (rows, ends), -1)
+    matrix = np.cumsum(diff[:, :-1], axis=1) > 0
+
+    return rooms, matrix
+
+
+def occupancy_runs(matrix):
+    """
+    Run-length encode each row of an occupancy matrix.
+
+    Returns one list per row of [start_offset, length] pairs covering the
+    occupied days.
+    """
+    import numpy as np
+
+    n_rows, n_days = matrix.shape
+    padded = np.zeros((n_rows, n_days + 2), dtype=np.int8)
+    padded[:, 1:-1] = matrix
+    edges = np.diff(padded, axis=1)
+
+    # nonzero() walks row-major, so run starts and ends pair up in order
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+
+    runs = [[] for _ in range(n_rows)]
+    for row, start, end in zip(start_rows.tolist(), start_cols.tolist(), end_cols.tolist()):
+        runs[row].append([start, end - start])
+    return runs
@@ -0,0 +1,177 @@
+"""
+Bulk booking creation for offline sync.
+
+A device that queued bookings while offline submits them in one request.
+Every item is validated with BookingSerializer and checked for room
+conflicts, against the database and against earlier items in the batch,
+before anything is written. The accepted bookings, their first versions and
+one notification for the whole batch are then inserted with bulk_create in a
+single transaction, and the work the model signals would have done per
+booking (occupancy index, revenue rollup, live events, cached stats) runs
+once for the batch.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import status
+
+from . import events, occupancy, rollups, stats
+from .models import Booking, Notification, Room
+from .serializers import (
+    BookingSerializer, booking_version_data, is_room_conflict, room_conflict_error,
+)
+from .versioning import record_first_versions
+
+# Largest batch accepted in one request
+MAX_ITEMS = 100
+
+
+def _overlaps(a, b):
+    """Whether two stay ranges ([) bounds, open upper end when ongoing) overlap"""
+    if a.isempty or b.isempty:
+        return False
+    return (a.upper is None or b.lower < a.upper) and (b.upper is None or a.lower < b.upper)
+
+
+def _link_room(data, rooms_by_id, rooms_by_number):
+    """Same room resolution as BookingSerializer.create, from preloaded rooms"""
+    room_id = data.pop('room_id', None)
+    room_no = data.get('room_no')
+    if room_id:
+        room = rooms_by_id.get(room_id)
+        if room:
+            data['room'] = room
+            data['room_no'] = f"{room.room_number} ({room.get_room_type_display()})"
+    elif room_no:
+        # Legacy: only a room number that matches exactly one room links
+        matches = rooms_by_number.get(room_no, [])
+        if len(matches) == 1:
+            data['room'] = matches[0]
+
+
+def _load_rooms(items):
+    room_ids = {data['room_id'] for data in items if data.get('room_id')}
+    room_numbers = {data['room_no'] for data in items if not data.get('room_id') and data.get('room_no')}
+    rooms = Room.objects.filter(Q(id__in=room_ids) | Q(room_number__in=room_numbers))
+    rooms_by_id = {}
+    rooms_by_number = {}
+    for room in rooms:
+        rooms_by_id[room.id] = room
+        rooms_by_number.setdefault(room.room_number, []).append(room)
+    return rooms_by_id, rooms_by_number
+
+
+def _taken_stays(bookings):
+    """{room_id: [stay]} of active bookings overlapping any of the new stays"""
+    overlapping = Q(pk__in=[])
+    for booking in bookings:
+        if booking.room_id and not booking.stay.isempty:
+            overlapping |= Q(room_id=booking.room_id, stay__overlap=booking.stay)
+    taken = {}
+    rows = (
+        Booking.objects.filter(overlapping, is_original=True, deleted_at__isnull=True)
+        .exclude(status='rejected')
+        .values_list('room_id', 'stay')
+    )
+    for room_id, stay in rows:
+        taken.setdefault(room_id, []).append(stay)
+    return taken
+
+
+def create_bookings(items, user, request=None):
+    """
+    Validate and create a batch of bookings.
+
+    Returns one result per item, in order: {'index', 'status', 'booking'}
+    for a created booking, or {'index', 'status', 'errors'} with the status
+    and errors a single POST of that item would have got.
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = BookingSerializer(data=item, context={'request': request})
+        if serializer.is_valid():
+            valid.append((index, dict(serializer.validated_data)))
+        else:
+            results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors}
+
+    rooms_by_id, rooms_by_number = _load_rooms([data for _, data in valid])
+    pending = []
+    for index, data in valid:
+        _link_room(data, rooms_by_id, rooms_by_number)
+        booking = Booking(**data, booked_by=user, is_original=True, version_number=1)
+        # bulk_create skips save(), which keeps the stay range in step
+        booking.stay = Booking.stay_range(booking.check_in_date, booking.check_out_date)
+        pending.append((index, booking))
+
+    # Earlier items win rooms over later ones, and nothing beats an existing booking
+    taken = _taken_stays([booking for _, booking in pending])
+    accepted = []
+    for index, booking in pending:
+        room_stays = taken.setdefault(booking.room_id, [])
+        if booking.room_id and any(_overlaps(booking.stay, stay) for stay in room_stays):
+            results[index] = {
+                'index': index,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'errors': room_conflict_error().detail,
+            }
+            continue
+        room_stays.append(booking.stay)
+        accepted.append((index, booking))
+
+    if accepted:
+        bookings = [booking for _, booking in accepted]
+        try:
+            with transaction.atomic():
+                _insert(bookings, user)
+        except IntegrityError as e:
+            # A booking committed since the conflict check took one of the
+            # rooms; nothing was written, so the whole batch may be retried
+            if not is_room_conflict(e):
+                raise
+            for index, _ in accepted:
+                results[index] = {
+                    'index': index,
+                    'status': status.HTTP_409_CONFLICT,
+                    'errors': room_conflict_error().detail,
+                }
+            return results
+
+        data = BookingSerializer(bookings, many=True, context={'request': request}).data
+        for (index, _), booking_data in zip(accepted, data):
+            results[index] = {'index': index, 'status': status.HTTP_201_CREATED, 'booking': booking_data}
+
+    return results
+
+
+def _insert(bookings, user):
+    Booking.objects.bulk_create(bookings)
+    record_first_versions(
+        [(booking, booking_version_data(booking)) for booking in bookings], edited_by=user
+    )
+
+    # One notification for the batch rather than one per booking
+    if len(bookings) == 1:
+        booking = bookings[0]
+        Notification.objects.create(
+            notification_type='booking_created',
+            title='New reservation',
+            message=f'{booking.name} — Room {booking.room_no} — Check-in {booking.check_in_date}',
+            link=f'/bookings/{booking.id}',
+        )
+    else:
+        names = ', '.join(booking.name for booking in bookings[:3])
+        if len(bookings) > 3:
+            names += f' and {len(bookings) - 3} more'
+        Notification.objects.create(
+            notification_type='booking_created',
+            title=f'{len(bookings)} new reservations',
+            message=names,
+            link='/bookings',
+        )
+
+    # What the post_save receivers do for a single booking
+    occupancy.bookings_created(bookings)
+    rollups.refresh_days({booking.check_in_date for booking in bookings})
+    for booking in bookings:
+        events.booking_changed(booking)
+    transaction.on_commit(stats.invalidate_admin_stats)
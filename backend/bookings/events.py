@@ -0,0 +1,266 @@
+"""
+Live events for the server-sent event stream.
+
+Model signals record each event in EventLog and send its id with PostgreSQL
+NOTIFY, which is only delivered once the writing transaction commits. Each
+worker process runs one listener thread that LISTENs on the channel, reads
+the new rows and hands them to the in-process broker, which fans them out to
+that process's open streams. The log doubles as the replay buffer for
+clients resuming with Last-Event-ID; publish() prunes it to
+EVENT_LOG_RETENTION_HOURS at most hourly per process, whether or not anyone
+is listening.
+
+Where LISTEN is unavailable (e.g. behind a transaction pooler) the listener
+falls back to polling the log every EVENT_STREAM_POLL_SECONDS.
+"""
+import asyncio
+import hashlib
+import logging
+import secrets
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .models import EventLog, StreamTicket
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'pama_events'
+
+# Rows read per query by the listener and by a resuming stream
+BATCH_SIZE = 200
+
+# Event batches a stream may fall behind by before it re-reads the log
+QUEUE_SIZE = 100
+
+# Ids the listener remembers so a row seen by both a poll and its NOTIFY is
+# only dispatched once
+RECENT_IDS = 1000
+
+# How often each process prunes the event log
+PRUNE_INTERVAL = timedelta(hours=1)
+
+_last_prune = None
+
+
+def publish(event_type, payload, audience=('all',)):
+    """Record an event; streams receive it when the current transaction commits"""
+    event = EventLog.objects.create(event_type=event_type, payload=payload, audience=list(audience))
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, str(event.pk)])
+    _maybe_prune()
+    return event
+
+
+def events_after(last_id, limit=BATCH_SIZE):
+    return list(EventLog.objects.filter(id__gt=last_id).order_by('id')[:limit])
+
+
+def can_resume(last_id):
+    """False if events after last_id may already have been pruned"""
+    oldest = EventLog.objects.order_by('id').values_list('id', flat=True).first()
+    return oldest is not None and oldest <= last_id + 1
+
+
+def prune():
+    cutoff = timezone.now() - timedelta(hours=settings.EVENT_LOG_RETENTION_HOURS)
+    # Unused tickets are worthless once expired
+    StreamTicket.objects.filter(created_at__lt=_ticket_cutoff()).delete()
+    return EventLog.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+def _maybe_prune():
+    global _last_prune
+    if _last_prune is None or timezone.now() - _last_prune > PRUNE_INTERVAL:
+        _last_prune = timezone.now()
+        # After the commit, so the writer's transaction does not wait on the delete
+        transaction.on_commit(prune)
+
+
+# Stream tickets
+
+def _ticket_cutoff():
+    return timezone.now() - timedelta(seconds=settings.EVENT_STREAM_TICKET_SECONDS)
+
+
+def _ticket_key(ticket):
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+def issue_ticket(user):
+    """A new single-use stream ticket for user"""
+    ticket = secrets.token_urlsafe(32)
+    StreamTicket.objects.create(key=_ticket_key(ticket), user=user)
+    return ticket
+
+
+def redeem_ticket(ticket):
+    """The active user a valid, unused ticket was issued to, or None; uses it up"""
+    record = StreamTicket.objects.filter(
+        key=_ticket_key(ticket), created_at__gte=_ticket_cutoff()
+    ).select_related('user').first()
+    if record is None:
+        return None
+    # Only the request whose delete removes the row gets in
+    if not StreamTicket.objects.filter(pk=record.pk).delete()[0]:
+        return None
+    return record.user if record.user.is_active else None
+
+
+# Event payloads
+
+def notification_created(notification):
+    publish('notification', {
+        'id': notification.pk,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'link': notification.link,
+        'created_at': notification.created_at.isoformat(),
+    })
+
+
+def booking_changed(booking, deleted=False):
+    # Same visibility as the booking list: receptionists only see authorized
+    # bookings and their own pending ones
+    if booking.status == 'authorized' and not booking.deleted_at:
+        audience = ['all']
+    else:
+        audience = ['managers']
+        if booking.status == 'pending' and booking.booked_by_id:
+            audience.append(f'user:{booking.booked_by_id}')
+    publish('booking', {
+        'id': booking.pk,
+        'status': booking.status,
+        'room': booking.room_id,
+        'check_in_date': str(booking.check_in_date),
+        'check_out_date': str(booking.check_out_date) if booking.check_out_date else None,
+        'deleted': deleted or booking.deleted_at is not None,
+    }, audience)
+
+
+def room_changed(room, deleted=False):
+    publish('room', {
+        'id': room.pk,
+        'room_number': room.room_number,
+        'is_available': room.is_available,
+        'deleted': deleted,
+    })
+
+
+def room_issue_changed(issue):
+    publish('room_issue', {
+        'id': issue.pk,
+        'room': issue.room_id,
+        'status': issue.status,
+        'priority': issue.priority,
+    })
+
+
+class Subscription:
+    """One open stream's queue of event batches"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        # Set when batches were dropped; the stream then re-reads the log
+        self.overflowed = False
+
+    def offer(self, events):
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broker:
+    """Fans events out to this process's streams; runs the listener while anyone listens"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.offer, events)
+
+    def _should_stop(self):
+        with self._lock:
+            if self._subscriptions:
+                return False
+            # Checked under the lock so a new subscriber starts a new listener
+            self._listener = None
+            return True
+
+    def _listen(self):
+        poll = settings.EVENT_STREAM_POLL_SECONDS
+        last_id = EventLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        recent = deque(maxlen=RECENT_IDS)
+        listen_db = None
+        try:
+            while not self._should_stop():
+                notified = []
+                try:
+                    if listen_db is None:
+                        listen_db = connections.create_connection('default')
+                        listen_db.ensure_connection()
+                        listen_db.connection.execute(f'LISTEN {CHANNEL}')
+                    for notify in listen_db.connection.notifies(timeout=poll, stop_after=1):
+                        notified.append(int(notify.payload))
+                except Exception:
+                    logger.exception('Event LISTEN failed; polling the event log instead')
+                    if listen_db is not None:
+                        listen_db.close()
+                        listen_db = None
+                    threading.Event().wait(poll)
+
+                # Rows committed out of id order arrive as NOTIFYs below last_id
+                late = [pk for pk in notified if pk <= last_id and pk not in recent]
+                events = []
+                while True:
+                    batch = events_after(events[-1].pk if events else last_id)
+                    events.extend(batch)
+                    if len(batch) < BATCH_SIZE:
+                        break
+                if late:
+                    events = list(EventLog.objects.filter(id__in=late)) + events
+
+                events = [event for event in events if event.pk not in recent]
+                if events:
+                    recent.extend(event.pk for event in events)
+                    last_id = max(last_id, *(event.pk for event in events))
+                    self.dispatch(events)
+        except Exception:
+            logger.exception('Event listener stopped')
+            with self._lock:
+                self._listener = None
+        finally:
+            if listen_db is not None:
+                listen_db.close()
+            connection.close()
+
+
+broker = Broker()
@@ -0,0 +1,369 @@
+"""
+Data exports shared by the API and the admin.
+
+Each export is a list of column specs that can be written as an Excel
+workbook, CSV or newline-delimited JSON. Rows are read from the database in
+chunks with a server-side cursor, so memory stays flat however many rows
+are exported: workbooks are built in openpyxl's write-only mode into a
+temporary file, and CSV/NDJSON are streamed row by row as they are read.
+"""
+import csv
+import json
+import tempfile
+import zlib
+from collections import namedtuple
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+CONTENT_TYPES = {
+    'xlsx': XLSX_CONTENT_TYPE,
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per database round trip
+CHUNK_SIZE = 2000
+
+MAX_COLUMN_WIDTH = 50
+
+# key names the column in NDJSON, header in workbooks and CSV
+Column = namedtuple('Column', ['key', 'header', 'value'])
+
+
+def _datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def _yes_no(value):
+    return 'Yes' if value else 'No'
+
+
+def _username(user):
+    return user.username if user else ''
+
+
+def _cell(value):
+    """Flatten nested data for formats without structure"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, indent=2)
+    return value
+
+
+class _Echo:
+    """File-like object whose write() hands back what it was given"""
+
+    def write(self, value):
+        return value
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Lets ?format= pick an export format on export actions.
+
+    Exports return their own file responses; this only renders errors.
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode()
+
+
+class XLSXRenderer(ExportRenderer):
+    media_type = XLSX_CONTENT_TYPE
+    format = 'xlsx'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+EXPORT_RENDERERS = [XLSXRenderer, CSVRenderer, NDJSONRenderer]
+
+
+class Export:
+    """
+    Declarative table export.
+
+    Subclasses set the sheet title, filename prefix, columns and the
+    relations their columns read; prepare() can enrich each chunk of rows
+    before it is written.
+    """
+    title = 'Export'
+    filename = 'export'
+    columns = []
+    select_related = ()
+
+    def prepare(self, rows):
+        return rows
+
+    def rows(self, queryset):
+        """Prepared rows in chunks, read with a server-side cursor"""
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        chunk = []
+        for obj in queryset.iterator(chunk_size=CHUNK_SIZE):
+            chunk.append(obj)
+            if len(chunk) == CHUNK_SIZE:
+                yield self.prepare(chunk)
+                chunk = []
+        if chunk:
+            yield self.prepare(chunk)
+
+    def values(self, obj):
+        return [column.value(obj) for column in self.columns]
+
+    # Excel
+
+    def write(self, queryset, fileobj):
+        """Write the workbook for queryset to a binary file object"""
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, PatternFill
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(self.title)
+
+        chunks = self.rows(queryset)
+        first_chunk = next(chunks, [])
+        first_values = [[_cell(value) for value in self.values(obj)] for obj in first_chunk]
+
+        # Write-only sheets need their widths before the first row, so size
+        # columns from the header and the first chunk
+        for index, column in enumerate(self.columns):
+            longest = max(
+                [len(column.header)] + [len(str(values[index])) for values in first_values]
+            )
+            ws.column_dimensions[get_column_letter(index + 1)].width = min(longest + 2, MAX_COLUMN_WIDTH)
+
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header_font = Font(bold=True, color="FFFFFF")
+        header_alignment = Alignment(horizontal='center', vertical='center')
+        header = []
+        for column in self.columns:
+            cell = WriteOnlyCell(ws, value=column.header)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = header_alignment
+            header.append(cell)
+        ws.append(header)
+
+        for values in first_values:
+            ws.append(values)
+        for chunk in chunks:
+            for obj in chunk:
+                ws.append([_cell(value) for value in self.values(obj)])
+
+        wb.save(fileobj)
+
+    def response(self, queryset, filename=None):
+        """Stream the workbook for queryset as an attachment"""
+        fileobj = tempfile.TemporaryFile()
+        self.write(queryset, fileobj)
+        fileobj.seek(0)
+
+        return FileResponse(
+            fileobj,
+            as_attachment=True,
+            filename=self.attachment_name(filename, 'xlsx'),
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
+    # Streamed text formats
+
+    def iter_csv(self, queryset):
+        writer = csv.writer(_Echo())
+        # Header goes out before the query runs
+        yield writer.writerow([column.header for column in self.columns]).encode()
+        for chunk in self.rows(queryset):
+            lines = [
+                writer.writerow([_cell(value) for value in self.values(obj)]) for obj in chunk
+            ]
+            yield ''.join(lines).encode()
+
+    def iter_ndjson(self, queryset):
+        keys = [column.key for column in self.columns]
+        for chunk in self.rows(queryset):
+            lines = [
+                json.dumps(dict(zip(keys, self.values(obj))), default=str) + '\n' for obj in chunk
+            ]
+            yield ''.join(lines).encode()
+
+    def stream(self, queryset, export_format, compress=False):
+        """Byte chunks of queryset as CSV or NDJSON, optionally gzipped"""
+        if export_format == 'csv':
+            chunks = self.iter_csv(queryset)
+        else:
+            chunks = self.iter_ndjson(queryset)
+        return _gzip(chunks) if compress else chunks
+
+    def streaming_response(self, queryset, export_format, compress=False, filename=None):
+        """Stream queryset as CSV or NDJSON while it is being read, optionally gzipped"""
+        chunks = self.stream(queryset, export_format, compress=compress)
+
+        extension = export_format
+        content_type = CONTENT_TYPES[export_format]
+        if compress:
+            extension += '.gz'
+            content_type = 'application/gzip'
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.attachment_name(filename, extension)}"'
+        return response
+
+    def from_request(self, request, queryset, filename=None):
+        """Response in the ?format= (xlsx, csv, ndjson) and ?compress=gzip the request asks for"""
+        export_format = request.query_params.get('format', 'xlsx').lower()
+        compress = request.query_params.get('compress', '').lower()
+
+        if export_format not in CONTENT_TYPES:
+            return Response(
+                {"error": "Invalid format. Use xlsx, csv or ndjson."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if compress not in ('', 'gzip'):
+            return Response(
+                {"error": "Invalid compress value. Use gzip."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if export_format == 'xlsx':
+            # Workbooks are zip files already
+            return self.response(queryset, filename=filename)
+        return self.streaming_response(queryset, export_format, compress=bool(compress), filename=filename)
+
+    def attachment_name(self, filename, extension):
+        filename = filename or self.filename
+        return f"{filename}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+class BookingExport(Export):
+    title = 'Bookings'
+    filename = 'bookings_export'
+    select_related = ('room', 'booked_by', 'last_edited_by')
+    columns = [
+        Column('id', 'ID', lambda booking: booking.id),
+        Column('guest_name', 'Guest Name', lambda booking: booking.name),
+        Column('phone_number', 'Phone Number', lambda booking: booking.id_or_telephone),
+        Column('address_location', 'Address/Location', lambda booking: booking.address_location),
+        Column('age', 'Age', lambda booking: booking.age),
+        Column('room_number', 'Room Number', lambda booking: booking.room_no),
+        Column('room_type', 'Room Type', lambda booking: booking.room.get_room_type_display() if booking.room else 'N/A'),
+        Column('check_in_date', 'Check-in Date', lambda booking: str(booking.check_in_date)),
+        Column('check_in_time', 'Check-in Time', lambda booking: str(booking.check_in_time)),
+        Column('check_out_date', 'Check-out Date', lambda booking: str(booking.check_out_date) if booking.check_out_date else ''),
+        Column('check_out_time', 'Check-out Time', lambda booking: str(booking.check_out_time) if booking.check_out_time else ''),
+        Column('payment_method', 'Payment Method', lambda booking: booking.get_payment_method_display()),
+        Column('amount_ghs', 'Amount (GHS)', lambda booking: float(booking.amount_ghs)),
+        Column('cash_amount', 'Cash Amount', lambda booking: float(booking.cash_amount)),
+        Column('momo_amount', 'MoMo Amount', lambda booking: float(booking.momo_amount)),
+        Column('momo_network', 'MoMo Network', lambda booking: booking.momo_network or ''),
+        Column('momo_number', 'MoMo Number', lambda booking: booking.momo_number),
+        Column('booked_by', 'Booked By', lambda booking: _username(booking.booked_by)),
+        Column('created_at', 'Created At', lambda booking: _datetime(booking.created_at)),
+        Column('last_edited_by', 'Last Edited By', lambda booking: _username(booking.last_edited_by)),
+        Column('updated_at', 'Updated At', lambda booking: _datetime(booking.updated_at)),
+        Column('authorized_rejected_by', 'Authorized/Rejected By', lambda booking: booking.authorized_by or booking.rejected_by or ''),
+        Column('status', 'Status', lambda booking: booking.get_status_display()),
+        Column('rejection_reason', 'Rejection Reason', lambda booking: booking.rejection_reason or ''),
+        Column('version_number', 'Version Number', lambda booking: booking.version_number),
+    ]
+
+
+class BookingVersionExport(Export):
+    title = 'Booking Versions'
+    filename = 'booking_versions_export'
+    select_related = ('edited_by',)
+    columns = [
+        Column('version_id', 'Version ID', lambda version: version.id),
+        Column('booking_id', 'Booking ID', lambda version: version.booking_id or ''),
+        Column('guest_name', 'Guest Name', lambda version: version.state.get('name', '')),
+        Column('room_number', 'Room Number', lambda version: version.state.get('room_no', '')),
+        Column('edited_by', 'Edited By', lambda version: _username(version.edited_by)),
+        Column('edited_at', 'Edited At', lambda version: _datetime(version.edited_at)),
+        Column('is_manager_edit', 'Is Manager Edit', lambda version: _yes_no(version.is_manager_edit)),
+        Column('version_data', 'Version Data (JSON)', lambda version: version.state),
+    ]
+
+    def prepare(self, rows):
+        # Versions are delta-encoded; rebuild the full data of the chunk at once
+        from .versioning import attach_states
+        return attach_states(rows)
+
+
+class RoomExport(Export):
+    title = 'Rooms'
+    filename = 'rooms_export'
+    columns = [
+        Column('id', 'ID', lambda room: room.id),
+        Column('room_number', 'Room Number', lambda room: room.room_number),
+        Column('room_type', 'Room Type', lambda room: room.get_room_type_display()),
+        Column('price_per_night_ghs', 'Price Per Night (GHS)', lambda room: float(room.price_per_night)),
+        Column('is_available', 'Is Available', lambda room: _yes_no(room.is_available)),
+        Column('created_at', 'Created At', lambda room: _datetime(room.created_at)),
+        Column('updated_at', 'Updated At', lambda room: _datetime(room.updated_at)),
+    ]
+
+
+class UserExport(Export):
+    title = 'Users'
+    filename = 'users_export'
+    columns = [
+        Column('id', 'ID', lambda user: user.id),
+        Column('username', 'Username', lambda user: user.username),
+        Column('first_name', 'First Name', lambda user: user.first_name or ''),
+        Column('last_name', 'Last Name', lambda user: user.last_name or ''),
+        Column('email', 'Email', lambda user: user.email or ''),
+        Column('role', 'Role', lambda user: user.get_role_display()),
+        Column('is_staff', 'Is Staff', lambda user: _yes_no(user.is_staff)),
+        Column('is_superuser', 'Is Superuser', lambda user: _yes_no(user.is_superuser)),
+        Column('is_active', 'Is Active', lambda user: _yes_no(user.is_active)),
+        Column('date_joined', 'Date Joined', lambda user: _datetime(user.date_joined)),
+        Column('last_login', 'Last Login', lambda user: _datetime(user.last_login)),
+    ]
+
+
+class RoomIssueExport(Export):
+    title = 'Room Issues'
+    filename = 'room_issues_export'
+    select_related = ('room', 'reported_by', 'fixed_by')
+    columns = [
+        Column('id', 'ID', lambda issue: issue.id),
+        Column('room_number', 'Room Number', lambda issue: issue.room.room_number),
+        Column('room_type', 'Room Type', lambda issue: issue.room.get_room_type_display()),
+        Column('issue_type', 'Issue Type', lambda issue: issue.get_issue_type_display()),
+        Column('title', 'Title', lambda issue: issue.title),
+        Column('description', 'Description', lambda issue: issue.description),
+        Column('status', 'Status', lambda issue: issue.get_status_display()),
+        Column('priority', 'Priority', lambda issue: issue.get_priority_display()),
+        Column('reported_by', 'Reported By', lambda issue: _username(issue.reported_by)),
+        Column('reported_at', 'Reported At', lambda issue: _datetime(issue.reported_at)),
+        Column('fixed_by', 'Fixed By', lambda issue: _username(issue.fixed_by)),
+        Column('fixed_at', 'Fixed At', lambda issue: _datetime(issue.fixed_at)),
+        Column('resolution_notes', 'Resolution Notes', lambda issue: issue.resolution_notes),
+        Column('created_at', 'Created At', lambda issue: _datetime(issue.created_at)),
+        Column('updated_at', 'Updated At', lambda issue: _datetime(issue.updated_at)),
+    ]
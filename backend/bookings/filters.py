@@ -0,0 +1,58 @@
+"""
+List filters shared by the API views and background export jobs.
+
+Each function takes a queryset, the requesting user where visibility depends
+on it, and a mapping of query parameters.
+"""
+from django.db.models import Q
+
+
+def filter_bookings(queryset, user, params):
+    """Booking list filters and the role-based visibility rules"""
+    # Filter by check-in date if provided
+    check_in_date = params.get('check_in_date', None)
+    if check_in_date:
+        try:
+            queryset = queryset.filter(check_in_date=check_in_date)
+        except ValueError:
+            pass
+    
+    # Receptionist sees authorized bookings and their own pending bookings
+    # Rejected bookings are hidden from receptionists
+    if user.is_receptionist():
+        queryset = queryset.filter(
+            Q(status='authorized') | 
+            (Q(status='pending') & Q(booked_by=user))
+        )
+    
+    # Exclude soft-deleted bookings by default (unless manager explicitly requests them)
+    include_deleted = params.get('include_deleted', 'false').lower() == 'true'
+    if not include_deleted or user.is_receptionist():
+        queryset = queryset.filter(deleted_at__isnull=True)
+    
+    return queryset.order_by('-created_at')
+
+
+def filter_room_issues(queryset, params):
+    """Room issue list filters; both roles see every issue"""
+    # Filter by room if provided
+    room_id = params.get('room', None)
+    if room_id:
+        queryset = queryset.filter(room_id=room_id)
+    
+    # Filter by status if provided
+    status_filter = params.get('status', None)
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    
+    # Filter by issue_type if provided
+    issue_type = params.get('issue_type', None)
+    if issue_type:
+        queryset = queryset.filter(issue_type=issue_type)
+    
+    # Filter unresolved issues
+    unresolved = params.get('unresolved', None)
+    if unresolved and unresolved.lower() == 'true':
+        queryset = queryset.exclude(status__in=['fixed', 'resolved'])
+    
+    return queryset.order_by('-reported_at')
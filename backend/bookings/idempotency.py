@@ -0,0 +1,166 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+A client that may retry a request (e.g. the offline sync after a timeout)
+sends a unique Idempotency-Key header. The first request with a key claims
+it in IdempotencyKey before doing any work and stores its response when it
+finishes; a retry with the same key gets the stored response back without
+touching bookings, versions or notifications. Keys are per user and expire
+after IDEMPOTENCY_KEY_TTL_HOURS. A claim that never got its response (the
+worker died mid-request) is taken over by a retry after
+IDEMPOTENCY_LEASE_SECONDS.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+# Responses that say nothing final about the request are not kept, so a
+# retry runs it again: server errors, and conflicts that may clear up, also
+# as the status of an item in a batch response. Neither are errors raised
+# as exceptions (validation, not found), which leave nothing behind to
+# duplicate
+RETRYABLE_STATUSES = {status.HTTP_409_CONFLICT}
+
+_last_prune = None
+
+
+def _ttl():
+    return timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def _lease():
+    return timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _claim(request, key, fingerprint):
+    """(record, True) if this request now owns key, else the existing (record or None, False)"""
+    keys = IdempotencyKey.objects.filter(user=request.user, key=key)
+    record = keys.first()
+    if record is not None:
+        now = timezone.now()
+        if record.status_code is None and record.created_at < now - _lease():
+            # Abandoned by the request that claimed it; unless another
+            # retry got here first, this one takes it over
+            keys.filter(pk=record.pk, status_code__isnull=True).delete()
+        elif record.created_at >= now - _ttl():
+            return record, False
+        else:
+            record.delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=request.user,
+                key=key,
+                method=request.method,
+                path=request.path[:500],
+                fingerprint=fingerprint,
+            )
+        return record, True
+    except IntegrityError:
+        # Claimed by a concurrent request just now
+        return keys.first(), False
+
+
+def _is_final(response):
+    """Whether response settles the request, so retries may be given it"""
+    if not isinstance(response, Response):
+        return False
+    if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+        return False
+    results = response.data.get('results') if isinstance(response.data, dict) else None
+    if isinstance(results, list):
+        return not any(
+            isinstance(result, dict) and result.get('status') in RETRYABLE_STATUSES
+            for result in results
+        )
+    return True
+
+
+def prune():
+    """Delete expired keys; returns how many"""
+    return IdempotencyKey.objects.filter(created_at__lt=timezone.now() - _ttl()).delete()[0]
+
+
+def _maybe_prune():
+    global _last_prune
+    if _last_prune is None or timezone.now() - _last_prune > timedelta(hours=1):
+        _last_prune = timezone.now()
+        prune()
+
+
+def idempotent(view_method):
+    """
+    Make a viewset action honour the Idempotency-Key header.
+
+    Goes under @action so the key is checked before the action looks up or
+    changes anything. Requests without the header are unaffected.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = _fingerprint(request)
+        record, claimed = _claim(request, key, fingerprint)
+        if not claimed:
+            if record is not None and record.fingerprint != fingerprint:
+                return Response(
+                    {"error": f"This {HEADER} was already used for a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record is None or record.status_code is None:
+                return Response(
+                    {"error": f"A request with this {HEADER} is still being processed"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            response = Response(record.response_body, status=record.status_code)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if not _is_final(response):
+            record.delete()
+        else:
+            # By pk, so a claim lost to a retry after the lease expired is
+            # not written back
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code,
+                response_body=json.loads(json.dumps(response.data, cls=JSONEncoder)),
+            )
+            _maybe_prune()
+        return response
+
+    return wrapper
@@ -0,0 +1,417 @@
+"""
+Background export jobs.
+
+Exports are built outside the request by a small in-process thread pool
+(EXPORT_JOB_WORKERS) or by the run_export_jobs management command, written
+to EXPORT_ROOT and downloaded later. A job whose kind, format, filters and
+audience match a finished job is answered from that job's file as long as
+the data watermark (newest change and row count) has not moved.
+
+A worker beats a heartbeat while it builds. Jobs left pending or running by
+a process that died are queued again (up to MAX_ATTEMPTS runs) once they
+have been quiet for EXPORT_JOB_STALE_SECONDS, and jobs and their files are
+deleted EXPORT_RETENTION_HOURS after they were requested.
+"""
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .exports import BookingExport, BookingVersionExport, RoomIssueExport
+from .filters import filter_bookings, filter_room_issues
+from .models import Booking, BookingVersion, ExportJob, RoomIssue
+
+logger = logging.getLogger(__name__)
+
+# Filters each kind accepts, as in the matching list endpoint
+ALLOWED_FILTERS = {
+    'bookings': ['check_in_date', 'include_deleted'],
+    'room_issues': ['room', 'status', 'issue_type', 'unresolved'],
+    'booking_versions': ['booking'],
+}
+
+# Kinds only managers may export
+MANAGER_ONLY_KINDS = {'booking_versions'}
+
+# Runs a job gets before a job that keeps dying with its worker is failed
+MAX_ATTEMPTS = 3
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_prune = None
+
+
+class ExportKind(ABC):
+    """How to build, describe and watermark one kind of export"""
+
+    def __init__(self, export_class, changed_field):
+        self.export_class = export_class
+        self.changed_field = changed_field
+
+    @abstractmethod
+    def queryset(self, user, filters):
+        """The rows user gets for filters (already cleaned by clean_filters)"""
+
+    def audience(self, user):
+        """Who sees the same rows for the same filters"""
+        return 'all'
+
+    def watermark(self, queryset):
+        stats = queryset.order_by().aggregate(newest=Max(self.changed_field), rows=Count('id'))
+        newest = stats['newest'].isoformat() if stats['newest'] else ''
+        return f"{newest}|{stats['rows']}"
+
+
+class BookingKind(ExportKind):
+    def queryset(self, user, filters):
+        return filter_bookings(Booking.objects.filter(is_original=True), user, filters)
+
+    def audience(self, user):
+        # Receptionists also see their own pending bookings
+        return f'user:{user.pk}' if user.is_receptionist() else 'managers'
+
+
+class RoomIssueKind(ExportKind):
+    def queryset(self, user, filters):
+        return filter_room_issues(RoomIssue.objects.all(), filters)
+
+
+class BookingVersionKind(ExportKind):
+    def queryset(self, user, filters):
+        versions = BookingVersion.objects.filter(booking__is_original=True)
+        if filters.get('booking'):
+            versions = versions.filter(booking_id=filters['booking'])
+        return versions.order_by('booking_id', 'sequence')
+
+
+KINDS = {
+    'bookings': BookingKind(BookingExport, 'updated_at'),
+    'room_issues': RoomIssueKind(RoomIssueExport, 'updated_at'),
+    'booking_versions': BookingVersionKind(BookingVersionExport, 'edited_at'),
+}
+
+
+def _id(value):
+    number = int(str(value))
+    if number < 1:
+        raise ValueError
+    return str(number)
+
+
+def _date(value):
+    return date.fromisoformat(str(value)).isoformat()
+
+
+def _flag(value):
+    flag = str(value).lower()
+    if flag not in ('true', 'false'):
+        raise ValueError
+    return flag
+
+
+def _choice(choices):
+    def parse(value):
+        if value not in dict(choices):
+            raise ValueError
+        return value
+    return parse
+
+
+# How each filter value is checked and written down
+FILTER_PARSERS = {
+    'check_in_date': _date,
+    'include_deleted': _flag,
+    'room': _id,
+    'status': _choice(RoomIssue.STATUS_CHOICES),
+    'issue_type': _choice(RoomIssue.ISSUE_TYPE_CHOICES),
+    'unresolved': _flag,
+    'booking': _id,
+}
+
+
+def clean_filters(kind, filters):
+    """
+    Only the filters kind understands, as strings; raises ValueError naming
+    the first filter whose value does not parse.
+    """
+    filters = filters or {}
+    cleaned = {}
+    for key in ALLOWED_FILTERS[kind]:
+        if filters.get(key) in (None, ''):
+            continue
+        try:
+            cleaned[key] = FILTER_PARSERS[key](filters[key])
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid value for filter {key}: {filters[key]!r}')
+    return cleaned
+
+
+def fingerprint(kind, export_format, compress, filters, user):
+    payload = json.dumps({
+        'kind': kind,
+        'format': export_format,
+        'compress': compress,
+        'filters': filters,
+        'audience': KINDS[kind].audience(user),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def enqueue(user, kind, export_format='xlsx', compress=False, filters=None):
+    """
+    Return (job, created) for the requested export.
+
+    A finished job for the same request whose watermark still matches the
+    data is reused, as is one that is already queued or running.
+    """
+    filters = clean_filters(kind, filters)
+    compress = compress and export_format != 'xlsx'
+    key = fingerprint(kind, export_format, compress, filters, user)
+
+    _maybe_prune()
+    in_flight = ExportJob.objects.filter(
+        fingerprint=key, requested_by=user, status__in=['pending', 'running']
+    ).first()
+    if in_flight and _is_stale(in_flight):
+        in_flight = _requeue(in_flight)
+    if in_flight:
+        return in_flight, False
+
+    watermark = KINDS[kind].watermark(KINDS[kind].queryset(user, filters))
+    cached = ExportJob.objects.filter(
+        fingerprint=key, status='completed', watermark=watermark
+    ).order_by('-finished_at').first()
+    if cached and os.path.exists(cached.file_path):
+        if cached.requested_by_id == user.pk:
+            return cached, False
+        # Same rows for this user too: share the file under their own job
+        return ExportJob.objects.create(
+            kind=kind,
+            export_format=export_format,
+            compress=compress,
+            filters=filters,
+            fingerprint=key,
+            watermark=watermark,
+            status='completed',
+            file_path=cached.file_path,
+            file_name=cached.file_name,
+            file_size=cached.file_size,
+            requested_by=user,
+            started_at=cached.started_at,
+            finished_at=cached.finished_at,
+        ), False
+
+    job = ExportJob.objects.create(
+        kind=kind,
+        export_format=export_format,
+        compress=compress,
+        filters=filters,
+        fingerprint=key,
+        requested_by=user,
+    )
+    _submit(job.pk)
+    return job, True
+
+
+def run_job(job_id):
+    """Build the file for a pending job; returns False if another worker claimed it"""
+    now = timezone.now()
+    claimed = ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return False
+
+    job = ExportJob.objects.select_related('requested_by').get(pk=job_id)
+    try:
+        with _heartbeat(job_id):
+            _build(job)
+    except Exception as e:
+        logger.exception('Export job %s failed', job_id)
+        ExportJob.objects.filter(pk=job_id).update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+    return True
+
+
+def _stale_cutoff():
+    return timezone.now() - timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+
+
+def _is_stale(job):
+    """Whether an in-flight job has gone quiet for longer than a live worker would"""
+    last_seen = job.heartbeat_at if job.status == 'running' else job.created_at
+    return last_seen is not None and last_seen < _stale_cutoff()
+
+
+def _requeue(job):
+    """
+    Queue an orphaned job again, or fail it after MAX_ATTEMPTS runs.
+
+    Returns the job if it is in flight again, None if it was failed.
+    """
+    if job.attempts >= MAX_ATTEMPTS:
+        ExportJob.objects.filter(pk=job.pk, status=job.status).update(
+            status='failed',
+            error='The export was interrupted too many times.',
+            finished_at=timezone.now(),
+        )
+        return None
+
+    if job.status == 'running':
+        # Only the first process to notice moves it back to the queue
+        requeued = ExportJob.objects.filter(
+            pk=job.pk, status='running', heartbeat_at=job.heartbeat_at
+        ).update(status='pending', started_at=None, heartbeat_at=None)
+        if requeued:
+            logger.warning('Export job %s stopped beating; queued again', job.pk)
+            job.status, job.started_at, job.heartbeat_at = 'pending', None, None
+    _submit(job.pk)
+    return job
+
+
+def recover_stale():
+    """Requeue or fail every orphaned job; returns how many were found"""
+    cutoff = _stale_cutoff()
+    stale = ExportJob.objects.filter(
+        Q(status='running', heartbeat_at__lt=cutoff) | Q(status='pending', created_at__lt=cutoff)
+    )
+    count = 0
+    for job in stale:
+        _requeue(job)
+        count += 1
+    return count
+
+
+def prune():
+    """
+    Delete jobs requested more than EXPORT_RETENTION_HOURS ago, then every
+    file in EXPORT_ROOT that old which no remaining job points at (including
+    partial files from builds that died). Returns how many jobs were deleted.
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.EXPORT_RETENTION_HOURS)
+    # In-flight jobs are left to recover_stale, which fails them eventually
+    deleted = ExportJob.objects.filter(created_at__lt=cutoff).exclude(
+        status__in=['pending', 'running']
+    ).delete()[0]
+
+    if not os.path.isdir(settings.EXPORT_ROOT):
+        return deleted
+    # Files are shared between jobs, so only unreferenced ones may go
+    in_use = set(ExportJob.objects.exclude(file_path='').values_list('file_path', flat=True))
+    for entry in os.scandir(settings.EXPORT_ROOT):
+        if not entry.is_file() or entry.path in in_use:
+            continue
+        if entry.stat().st_mtime < cutoff.timestamp():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+    return deleted
+
+
+def _maybe_prune():
+    global _last_prune
+    if _last_prune is None or timezone.now() - _last_prune > timedelta(hours=1):
+        _last_prune = timezone.now()
+        prune()
+
+
+def run_pending():
+    """Run every pending job in this process; returns how many were run"""
+    recover_stale()
+    _maybe_prune()
+    count = 0
+    for job_id in ExportJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True):
+        if run_job(job_id):
+            count += 1
+    return count
+
+
+def _build(job):
+    kind = KINDS[job.kind]
+    user = job.requested_by
+    if user is None:
+        raise ValueError('The user who requested this export no longer exists.')
+    queryset = kind.queryset(user, job.filters)
+    # Taken before reading so changes made during the build invalidate the file
+    watermark = kind.watermark(queryset)
+
+    export = kind.export_class()
+    extension = job.export_format + ('.gz' if job.compress else '')
+    file_name = export.attachment_name(None, extension)
+
+    os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+    path = os.path.join(settings.EXPORT_ROOT, f'export_{job.pk}.{extension}')
+    partial = path + '.part'
+    with open(partial, 'wb') as fileobj:
+        if job.export_format == 'xlsx':
+            export.write(queryset, fileobj)
+        else:
+            for chunk in export.stream(queryset, job.export_format, compress=job.compress):
+                fileobj.write(chunk)
+    os.replace(partial, path)
+
+    ExportJob.objects.filter(pk=job.pk).update(
+        status='completed',
+        watermark=watermark,
+        file_path=path,
+        file_name=file_name,
+        file_size=os.path.getsize(path),
+        finished_at=timezone.now(),
+    )
+
+
+@contextmanager
+def _heartbeat(job_id):
+    """Touch the job's heartbeat_at from a side thread while the body runs"""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.EXPORT_JOB_HEARTBEAT_SECONDS):
+                ExportJob.objects.filter(pk=job_id, status='running').update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'export-job-{job_id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _submit(job_id):
+    """Hand a pending job to this process's worker pool once the transaction commits"""
+    if settings.EXPORT_JOB_WORKERS > 0:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job_id))
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Pool threads each hold their own database connection
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_JOB_WORKERS, thread_name_prefix='export-job'
+            )
+        return _executor
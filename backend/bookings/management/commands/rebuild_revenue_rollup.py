@@ -0,0 +1,15 @@
+"""
+Management command to recompute the daily revenue rollup from bookings.
+Usage: python manage.py rebuild_revenue_rollup
+"""
+from django.core.management.base import BaseCommand
+
+from bookings.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute every DailyRevenueRollup row from the bookings table'
+
+    def handle(self, *args, **options):
+        days = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'[OK] Rebuilt revenue rollup for {days} day(s)'))
@@ -0,0 +1,35 @@
+"""
+Management command to build queued background exports.
+Usage: python manage.py run_export_jobs [--loop] [--interval 5]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Build pending export jobs (use with EXPORT_JOB_WORKERS=0 to keep exports out of web workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new jobs instead of exiting when the queue is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls when looping',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending()
+            if count:
+                self.stdout.write(self.style.SUCCESS(f'[OK] Ran {count} export job(s)'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
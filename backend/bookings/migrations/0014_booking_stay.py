@@ -0,0 +1,127 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:35
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+# Rows updated per statement while backfilling, so large tables are not
+# locked in one long transaction
+BATCH_SIZE = 1000
+
+# Overlapping pairs listed when the migration refuses to run
+MAX_REPORTED_OVERLAPS = 50
+
+# Same rules as Booking.stay_range
+STAY_SQL = """CASE
+    WHEN {t}.check_out_date IS NULL THEN daterange({t}.check_in_date, NULL, '[)')
+    WHEN {t}.check_out_date <= {t}.check_in_date THEN 'empty'::daterange
+    ELSE daterange({t}.check_in_date, {t}.check_out_date, '[)')
+END"""
+
+
+def check_no_overlaps(apps, schema_editor):
+    """
+    Refuse to start while existing bookings would violate the exclusion
+    constraint added below.
+
+    The migration is not atomic, so failing at AddConstraint would leave the
+    column, backfill and index applied without the migration being recorded.
+    Checking before any change keeps a failed run clean: resolve the listed
+    bookings (correct their dates, reject or delete one of each pair) and
+    migrate again.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    table = schema_editor.quote_name(Booking._meta.db_table)
+    # The constraint's condition (Booking.holds_room_q)
+    holds_room = "{t}.is_original AND {t}.deleted_at IS NULL AND {t}.room_id IS NOT NULL AND {t}.status <> 'rejected'"
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT a.room_id, a.id, a.check_in_date, a.check_out_date,
+                   b.id, b.check_in_date, b.check_out_date
+            FROM {table} a
+            JOIN {table} b ON b.room_id = a.room_id AND b.id > a.id
+            WHERE {holds_room.format(t='a')} AND {holds_room.format(t='b')}
+              AND {STAY_SQL.format(t='a')} && {STAY_SQL.format(t='b')}
+            ORDER BY a.room_id, a.id, b.id
+            LIMIT %s
+            """,
+            [MAX_REPORTED_OVERLAPS + 1],
+        )
+        overlaps = cursor.fetchall()
+
+    if not overlaps:
+        return
+
+    lines = [
+        f"  room {room_id}: booking {a_id} ({a_in} to {a_out or 'open'}) "
+        f"overlaps booking {b_id} ({b_in} to {b_out or 'open'})"
+        for room_id, a_id, a_in, a_out, b_id, b_in, b_out in overlaps[:MAX_REPORTED_OVERLAPS]
+    ]
+    if len(overlaps) > MAX_REPORTED_OVERLAPS:
+        lines.append(f"  ... and more (first {MAX_REPORTED_OVERLAPS} shown)")
+    raise RuntimeError(
+        "Cannot add the exclusion constraint exclude_overlapping_room_stays: these "
+        "active bookings hold the same room on the same nights. Correct their dates, "
+        "or reject or delete one booking of each pair, then run migrate again. "
+        "Nothing has been changed.\n" + "\n".join(lines)
+    )
+
+
+def backfill_stay(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    table = schema_editor.quote_name(Booking._meta.db_table)
+    last_id = 0
+
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f"SELECT max(id) FROM (SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s) batch",
+                [last_id, BATCH_SIZE],
+            )
+            upper_id = cursor.fetchone()[0]
+            if upper_id is None:
+                break
+
+            cursor.execute(
+                f"""
+                UPDATE {table} SET stay = {STAY_SQL.format(t=table)}
+                WHERE id > %s AND id <= %s
+                """,
+                [last_id, upper_id],
+            )
+            last_id = upper_id
+
+
+class Migration(migrations.Migration):
+
+    # Each backfill batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('bookings', '0013_allow_duplicate_room_numbers_by_type'),
+    ]
+
+    operations = [
+        # Before anything is changed, as the migration is not atomic
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        # Needed to combine room equality with range overlap in one GiST index
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='booking',
+            name='stay',
+            field=django.contrib.postgres.fields.ranges.DateRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_stay, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['room', 'stay'], name='booking_room_stay_gist'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('deleted_at__isnull', True), ('is_original', True), ('room__isnull', False), models.Q(('status', 'rejected'), _negated=True)), expressions=[('room', '='), ('stay', '&&')], name='exclude_overlapping_room_stays'),
+        ),
+    ]
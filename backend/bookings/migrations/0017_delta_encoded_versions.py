@@ -0,0 +1,109 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Bookings converted per transaction
+BATCH_SIZE = 500
+
+
+def _batches(BookingVersion):
+    booking_ids = list(
+        BookingVersion.objects.order_by('booking_id').values_list('booking_id', flat=True).distinct()
+    )
+    for start in range(0, len(booking_ids), BATCH_SIZE):
+        yield booking_ids[start:start + BATCH_SIZE]
+
+
+def _histories(BookingVersion, booking_ids):
+    histories = {}
+    versions = BookingVersion.objects.filter(booking_id__in=booking_ids).order_by('booking_id', 'edited_at', 'id')
+    for version in versions:
+        histories.setdefault(version.booking_id, []).append(version)
+    return histories.values()
+
+
+def encode_versions(apps, schema_editor):
+    """Number existing full snapshots and keep every Nth, storing the rest as deltas"""
+    BookingVersion = apps.get_model('bookings', 'BookingVersion')
+    interval = max(1, getattr(settings, 'BOOKING_VERSION_SNAPSHOT_INTERVAL', 10))
+
+    for booking_ids in _batches(BookingVersion):
+        changed = []
+        for history in _histories(BookingVersion, booking_ids):
+            previous = None
+            for sequence, version in enumerate(history, 1):
+                state = version.version_data
+                version.sequence = sequence
+                if previous is None or (sequence - 1) % interval == 0:
+                    version.is_snapshot = True
+                    version.removed_fields = []
+                else:
+                    version.is_snapshot = False
+                    version.version_data = {
+                        key: value for key, value in state.items()
+                        if key not in previous or previous[key] != value
+                    }
+                    version.removed_fields = sorted(key for key in previous if key not in state)
+                previous = state
+                changed.append(version)
+        BookingVersion.objects.bulk_update(
+            changed, ['sequence', 'is_snapshot', 'version_data', 'removed_fields'], batch_size=1000
+        )
+
+
+def decode_versions(apps, schema_editor):
+    """Turn every version back into a full snapshot"""
+    BookingVersion = apps.get_model('bookings', 'BookingVersion')
+
+    for booking_ids in _batches(BookingVersion):
+        changed = []
+        for history in _histories(BookingVersion, booking_ids):
+            state = {}
+            for version in sorted(history, key=lambda version: version.sequence):
+                if version.is_snapshot:
+                    state = dict(version.version_data)
+                else:
+                    state = {**state, **version.version_data}
+                    for key in version.removed_fields:
+                        state.pop(key, None)
+                version.version_data = state
+                version.is_snapshot = True
+                version.removed_fields = []
+                changed.append(version)
+        BookingVersion.objects.bulk_update(
+            changed, ['is_snapshot', 'version_data', 'removed_fields'], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    # Each batch of bookings commits on its own
+    atomic = False
+
+    dependencies = [
+        ('bookings', '0016_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingversion',
+            name='is_snapshot',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='bookingversion',
+            name='removed_fields',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='bookingversion',
+            name='sequence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(encode_versions, decode_versions),
+        migrations.AddConstraint(
+            model_name='bookingversion',
+            constraint=models.UniqueConstraint(fields=('booking', 'sequence'), name='unique_booking_version_sequence'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def read_by_to_watermarks(apps, schema_editor):
+    """
+    Give each user the latest watermark that only covers notifications they
+    had read, and keep their other read notifications as individual IDs.
+    """
+    Notification = apps.get_model('bookings', 'Notification')
+    NotificationReadState = apps.get_model('bookings', 'NotificationReadState')
+    ReadBy = Notification.read_by.through
+
+    notifications = list(Notification.objects.order_by('created_at', 'id').values_list('id', 'created_at'))
+    read_by_user = {}
+    for user_id, notification_id in ReadBy.objects.values_list('user_id', 'notification_id').iterator():
+        read_by_user.setdefault(user_id, set()).add(notification_id)
+
+    states = []
+    for user_id, read_ids in read_by_user.items():
+        # Oldest notification the user has not read
+        first_unread = next(
+            (created_at for notification_id, created_at in notifications if notification_id not in read_ids),
+            None,
+        )
+        # Everything strictly older than it was read
+        last_read_at = None
+        for notification_id, created_at in notifications:
+            if first_unread is not None and created_at >= first_unread:
+                break
+            last_read_at = created_at
+
+        newer_read = [
+            notification_id for notification_id, created_at in notifications
+            if notification_id in read_ids and (last_read_at is None or created_at > last_read_at)
+        ]
+        states.append(NotificationReadState(user_id=user_id, last_read_at=last_read_at, read_ids=newer_read))
+
+    NotificationReadState.objects.bulk_create(states, batch_size=500)
+
+
+def watermarks_to_read_by(apps, schema_editor):
+    Notification = apps.get_model('bookings', 'Notification')
+    NotificationReadState = apps.get_model('bookings', 'NotificationReadState')
+    ReadBy = Notification.read_by.through
+
+    rows = []
+    for state in NotificationReadState.objects.all():
+        read = Notification.objects.filter(id__in=state.read_ids)
+        if state.last_read_at:
+            read = read | Notification.objects.filter(created_at__lte=state.last_read_at)
+        rows.extend(
+            ReadBy(user_id=state.user_id, notification_id=notification_id)
+            for notification_id in read.values_list('id', flat=True)
+        )
+    ReadBy.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0018_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('read_ids', models.JSONField(blank=True, default=list)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_read_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(read_by_to_watermarks, watermarks_to_read_by),
+        migrations.RemoveField(
+            model_name='notification',
+            name='read_by',
+        ),
+    ]
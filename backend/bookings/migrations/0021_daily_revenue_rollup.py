@@ -0,0 +1,105 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:10
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def build_rollup(apps, schema_editor):
+    """
+    Fill the rollup from existing bookings.
+
+    A frozen copy of bookings.rollups.rebuild as of this migration, so later
+    changes to the app code cannot break replaying it.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    DailyRevenueRollup = apps.get_model('bookings', 'DailyRevenueRollup')
+
+    live = Q(deleted_at__isnull=True)
+    authorized = live & Q(status='authorized')
+
+    def total(field, condition):
+        return Coalesce(
+            Sum(field, filter=condition), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)
+        )
+
+    aggregates = {
+        'bookings': Count('id', filter=live),
+        'authorized_bookings': Count('id', filter=authorized),
+        'pending_bookings': Count('id', filter=live & Q(status='pending')),
+        'rejected_bookings': Count('id', filter=live & Q(status='rejected')),
+        'deleted_bookings': Count('id', filter=Q(deleted_at__isnull=False)),
+        'amount_ghs': total('amount_ghs', authorized),
+        'cash_amount': total('cash_amount', authorized),
+        'momo_amount': total('momo_amount', authorized),
+        'cash_bookings': Count('id', filter=authorized & Q(payment_method='cash')),
+        'momo_bookings': Count('id', filter=authorized & Q(payment_method='momo')),
+        'both_bookings': Count('id', filter=authorized & Q(payment_method='both')),
+        'mtn_bookings': Count('id', filter=authorized & Q(momo_network='MTN')),
+        'mtn_amount': total('momo_amount', authorized & Q(momo_network='MTN')),
+        'vodafone_bookings': Count('id', filter=authorized & Q(momo_network='Vodafone')),
+        'vodafone_amount': total('momo_amount', authorized & Q(momo_network='Vodafone')),
+        'at_bookings': Count('id', filter=authorized & Q(momo_network='AT')),
+        'at_amount': total('momo_amount', authorized & Q(momo_network='AT')),
+    }
+    # Aliased because annotations may not reuse Booking field names
+    rows = (
+        Booking.objects.filter(is_original=True)
+        .order_by()
+        .values('check_in_date')
+        .annotate(**{f'rollup_{column}': aggregate for column, aggregate in aggregates.items()})
+    )
+    DailyRevenueRollup.objects.all().delete()
+    DailyRevenueRollup.objects.bulk_create(
+        [
+            DailyRevenueRollup(
+                date=row['check_in_date'],
+                **{column: row[f'rollup_{column}'] for column in aggregates},
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0020_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('authorized_bookings', models.PositiveIntegerField(default=0)),
+                ('pending_bookings', models.PositiveIntegerField(default=0)),
+                ('rejected_bookings', models.PositiveIntegerField(default=0)),
+                ('deleted_bookings', models.PositiveIntegerField(default=0)),
+                ('amount_ghs', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cash_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('momo_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cash_bookings', models.PositiveIntegerField(default=0)),
+                ('momo_bookings', models.PositiveIntegerField(default=0)),
+                ('both_bookings', models.PositiveIntegerField(default=0)),
+                ('mtn_bookings', models.PositiveIntegerField(default=0)),
+                ('mtn_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('vodafone_bookings', models.PositiveIntegerField(default=0)),
+                ('vodafone_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('at_bookings', models.PositiveIntegerField(default=0)),
+                ('at_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['check_in_date'], name='booking_check_in_idx'),
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
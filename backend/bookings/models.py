@@ -1,8 +1,38 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.db.backends.postgresql.psycopg_any import DateRange
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
 from django.core.validators import MinValueValidator
 
 
+class LoadedFieldsMixin:
+    """
+    Remembers tracked_fields as loaded from the database so signal receivers
+    can tell which of them a save actually changed.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_fields = {
+            name: value for name, value in zip(field_names, values) if name in cls.tracked_fields
+        }
+        return instance
+
+    def field_changed(self, name):
+        """True if name differs from what was loaded (or nothing was loaded)"""
+        loaded = getattr(self, '_loaded_fields', {})
+        return name not in loaded or loaded[name] != getattr(self, name)
+
+    def remember_loaded_fields(self):
+        """Treat the current values as loaded, after a save has been handled"""
+        self._loaded_fields = {name: getattr(self, name) for name in self.tracked_fields}
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('receptionist', 'Receptionist'),
@@ -19,7 +49,7 @@ class User(AbstractUser):
         return self.role == 'receptionist'
 
 
-class Room(models.Model):
+class Room(LoadedFieldsMixin, models.Model):
     ROOM_TYPE_CHOICES = [
         ('standard_full_night_ac', 'Standard full night with A/C'),
         ('standard_fan_only', 'Standard - Fan only'),
@@ -35,8 +65,14 @@ class Room(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Changes published to the live event stream
+    tracked_fields = ('is_available',)
+    
     class Meta:
         ordering = ['room_number', 'room_type']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='room_updated_id_idx'),  # Delta sync
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['room_number', 'room_type'],
@@ -49,51 +85,16 @@ class Room(models.Model):
     
     def check_availability(self, check_in_date, check_out_date=None, exclude_booking_id=None):
         """Check if room is available for given dates"""
-        if not self.is_available:
-            return False
-        
-        # Get all bookings for this room that overlap with the requested dates
-        # Use room FK to correctly identify this specific room (allows same number, different types)
-        bookings = Booking.objects.filter(
-            room=self,
-            is_original=True
-        )
-        
-        if exclude_booking_id:
-            bookings = bookings.exclude(id=exclude_booking_id)
-        
-        # If no bookings exist, room is available
-        if not bookings.exists():
-            return True
-        
-        # Check for overlapping bookings
-        for booking in bookings:
-            booking_check_in = booking.check_in_date
-            # If booking has no check-out date, it's considered ongoing and blocks all future dates
-            if booking.check_out_date:
-                booking_check_out = booking.check_out_date
-            else:
-                # No check-out means ongoing booking - blocks all dates from check-in onwards
-                if check_in_date >= booking_check_in:
-                    return False
-                continue
-            
-            # Check if dates overlap
-            if check_out_date:
-                # Check if the requested dates overlap with existing booking
-                # Overlap occurs if: requested check-in < booking check-out AND requested check-out > booking check-in
-                if not (check_out_date <= booking_check_in or check_in_date >= booking_check_out):
-                    return False
-            else:
-                # If no check-out date specified for new booking, check if check-in conflicts
-                # Conflict if check-in is between booking check-in and check-out
-                if booking_check_in <= check_in_date < booking_check_out:
-                    return False
-        
-        return True
-
-
-class Booking(models.Model):
+        from .availability import is_room_available
+        return is_room_available(self, check_in_date, check_out_date, exclude_booking_id)
+
+
+def holds_room_q():
+    """Bookings that hold their room; the condition of the stay exclusion constraint"""
+    return Q(is_original=True, deleted_at__isnull=True, room__isnull=False) & ~Q(status='rejected')
+
+
+class Booking(LoadedFieldsMixin, models.Model):
     PAYMENT_METHOD_CHOICES = [
         ('cash', 'Cash'),
         ('momo', 'Mobile Money'),
@@ -119,6 +120,8 @@ class Booking(models.Model):
     check_in_time = models.TimeField()
     check_out_date = models.DateField(null=True, blank=True)
     check_out_time = models.TimeField(null=True, blank=True)
+    # [check_in_date, check_out_date) maintained on save; unbounded while there is no check-out
+    stay = DateRangeField(null=True, blank=True, editable=False)
     
     # Payment Information
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHOD_CHOICES, default='cash')
@@ -182,33 +185,90 @@ class Booking(models.Model):
         from datetime import timedelta
         return timezone.now() - self.deleted_at < timedelta(days=30)
     
+    # Changes published to the live event stream; check_in_date also tells
+    # the revenue rollup which day a booking moved away from
+    tracked_fields = ('status', 'deleted_at', 'check_in_date')
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['is_original', 'status', 'deleted_at']),
             models.Index(fields=['is_original', 'is_authorized', 'deleted_at']),  # Keep for backward compatibility
+            GistIndex(fields=['room', 'stay'], name='booking_room_stay_gist'),
+            models.Index(fields=['created_at', 'id'], name='booking_created_id_idx'),  # Keyset pagination
+            models.Index(fields=['check_in_date'], name='booking_check_in_idx'),  # Per-day rollup refresh
+            models.Index(fields=['updated_at', 'id'], name='booking_updated_id_idx'),  # Delta sync
+            # Guest search and admin icontains (bookings.search)
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='booking_name_trgm_idx'),
+            GinIndex(OpClass(Upper('id_or_telephone'), name='gin_trgm_ops'), name='booking_telephone_trgm_idx'),
+            GinIndex(OpClass(Upper('room_no'), name='gin_trgm_ops'), name='booking_room_no_trgm_idx'),
+        ]
+        constraints = [
+            # Two active bookings can never hold the same room on the same night
+            ExclusionConstraint(
+                name='exclude_overlapping_room_stays',
+                expressions=[
+                    ('room', RangeOperators.EQUAL),
+                    ('stay', RangeOperators.OVERLAPS),
+                ],
+                condition=holds_room_q(),
+            ),
         ]
     
     def __str__(self):
         return f"{self.name} - Room {self.room_no}"
+    
+    @staticmethod
+    def stay_range(check_in_date, check_out_date=None):
+        """Date range a stay occupies (check-out day is free, no check-out means ongoing)"""
+        if check_out_date is None:
+            return DateRange(check_in_date, None, '[)')
+        if check_out_date <= check_in_date:
+            return DateRange(empty=True)
+        return DateRange(check_in_date, check_out_date, '[)')
+    
+    def holds_room(self):
+        """Whether this booking blocks its room for other stays (see holds_room_q)"""
+        return bool(
+            self.is_original and self.room_id and self.deleted_at is None and self.status != 'rejected'
+        )
+    
+    def save(self, *args, **kwargs):
+        self.stay = self.stay_range(self.check_in_date, self.check_out_date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'check_in_date', 'check_out_date'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'stay'}
+        super().save(*args, **kwargs)
 
 
 class BookingVersion(models.Model):
-    """Stores historical versions of bookings for manager review"""
+    """
+    Stores historical versions of bookings for manager review.
+    
+    Every few versions hold a full snapshot; the rest only store the fields
+    that changed since the previous version. Use bookings.versioning to get
+    the full booking data of any version.
+    """
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='versions')
-    version_data = models.JSONField()  # Stores the booking data at this version
+    sequence = models.PositiveIntegerField(default=0)  # 1, 2, 3... per booking
+    version_data = models.JSONField()  # Full booking data, or changed fields only when not a snapshot
+    removed_fields = models.JSONField(default=list, blank=True)  # Fields dropped since the previous version
+    is_snapshot = models.BooleanField(default=True)
     edited_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     edited_at = models.DateTimeField(auto_now_add=True)
     is_manager_edit = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-edited_at']
+        constraints = [
+            models.UniqueConstraint(fields=['booking', 'sequence'], name='unique_booking_version_sequence'),
+        ]
     
     def __str__(self):
         return f"Version of {self.booking.name} - {self.edited_at}"
 
 
-class RoomIssue(models.Model):
+class RoomIssue(LoadedFieldsMixin, models.Model):
     """Track room issues, faults, and missing inventory"""
     ISSUE_TYPE_CHOICES = [
         ('missing_inventory', 'Missing Inventory'),
@@ -251,10 +311,17 @@ class RoomIssue(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Changes published to the live event stream
+    tracked_fields = ('status',)
+    
     class Meta:
         ordering = ['-reported_at']
         verbose_name = 'Room Issue'
         verbose_name_plural = 'Room Issues'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='roomissue_created_id_idx'),  # Keyset pagination
+            models.Index(fields=['updated_at', 'id'], name='roomissue_updated_id_idx'),  # Delta sync
+        ]
     
     def __str__(self):
         return f"Room {self.room.room_number} - {self.title} ({self.get_status_display()})"
@@ -286,11 +353,314 @@ class Notification(models.Model):
     message = models.TextField()
     link = models.CharField(max_length=500, blank=True, help_text='Frontend path e.g. /bookings/5 or /room-issues')
     created_at = models.DateTimeField(auto_now_add=True)
-    read_by = models.ManyToManyField(User, related_name='read_notifications', blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='notification_created_id_idx'),  # Keyset pagination
+        ]
 
     def __str__(self):
         return f"{self.get_notification_type_display()}: {self.title}"
 
+
+class NotificationReadState(models.Model):
+    """
+    What a user has read: every notification up to last_read_at, plus the
+    individually read ones created after it.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_read_state')
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    read_ids = models.JSONField(default=list, blank=True)  # Read notifications newer than last_read_at
+
+    def __str__(self):
+        return f"{self.user.username} read up to {self.last_read_at}"
+
+    @classmethod
+    def for_user(cls, user):
+        """The user's read state; unsaved (nothing read) if they never read anything"""
+        return cls.objects.filter(user=user).first() or cls(user=user)
+
+    @classmethod
+    def mark_all_read(cls, user):
+        """Move the watermark to now in a single UPDATE"""
+        from django.utils import timezone
+        now = timezone.now()
+        updated = cls.objects.filter(user=user).update(last_read_at=now, read_ids=[])
+        if not updated:
+            cls.objects.get_or_create(user=user, defaults={'last_read_at': now})
+
+    @classmethod
+    def mark_read(cls, user, notification):
+        with transaction.atomic():
+            state, _ = cls.objects.select_for_update().get_or_create(user=user)
+            if state.is_read(notification):
+                return
+            state.read_ids = state.read_ids + [notification.id]
+            state.save(update_fields=['read_ids'])
+
+    def is_read(self, notification):
+        if self.last_read_at and notification.created_at <= self.last_read_at:
+            return True
+        return notification.id in self.read_ids
+
+    def read_q(self):
+        """Q matching the notifications this user has read"""
+        read = Q(id__in=self.read_ids) if self.read_ids else None
+        if self.last_read_at:
+            watermark = Q(created_at__lte=self.last_read_at)
+            read = watermark if read is None else read | watermark
+        return read
+
+    def annotate_is_read(self, notifications):
+        """Add an is_read column computed in the same query"""
+        read = self.read_q()
+        if read is None:
+            is_read = models.Value(False)
+        else:
+            is_read = models.Case(models.When(read, then=models.Value(True)), default=models.Value(False))
+        return notifications.annotate(is_read=models.ExpressionWrapper(is_read, output_field=models.BooleanField()))
+
+    def unread(self, notifications=None):
+        """Notifications this user has not read"""
+        if notifications is None:
+            notifications = Notification.objects.all()
+        if self.last_read_at:
+            notifications = notifications.filter(created_at__gt=self.last_read_at)
+        if self.read_ids:
+            notifications = notifications.exclude(id__in=self.read_ids)
+        return notifications
+
+
+
+class DataVersion(models.Model):
+    """
+    Shared change counters.
+
+    Bumped right after the writes they track commit, so every worker process
+    can cheaply tell whether its in-memory caches are stale without the
+    counter's row lock being held for the length of those writes.
+    """
+    key = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+    @classmethod
+    def bump(cls, key):
+        """Increment the counter for key and return its new value"""
+        # The row lock taken by the update keeps the read below consistent
+        with transaction.atomic():
+            updated = cls.objects.filter(key=key).update(version=models.F('version') + 1)
+            if not updated:
+                cls.objects.get_or_create(key=key)
+                cls.objects.filter(key=key).update(version=models.F('version') + 1)
+            return cls.current(key)
+
+    @classmethod
+    def current(cls, key):
+        return cls.objects.filter(key=key).values_list('version', flat=True).first() or 0
+
+
+class ExportJob(models.Model):
+    """An export built in the background and kept on disk for download"""
+    KIND_CHOICES = [
+        ('bookings', 'Bookings'),
+        ('room_issues', 'Room Issues'),
+        ('booking_versions', 'Booking Versions'),
+    ]
+    FORMAT_CHOICES = [
+        ('xlsx', 'Excel'),
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='xlsx')
+    compress = models.BooleanField(default=False)
+    filters = models.JSONField(default=dict, blank=True)
+    # Same kind, format and filters as seen by the same audience
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    # Newest change and row count of the exported data when the file was built
+    watermark = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file_path = models.CharField(max_length=500, blank=True)
+    file_name = models.CharField(max_length=200, blank=True)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='export_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched while a worker builds the file; a running job that stops
+    # beating was orphaned by a restart and is queued again
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fingerprint', 'status']),
+            models.Index(fields=['created_at'], name='exportjob_created_idx'),  # Retention
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} export ({self.get_status_display()})"
+
+
+class EventLog(models.Model):
+    """
+    Live events pushed to connected clients.
+
+    The id is the SSE event id, so the log is also what a reconnecting
+    client replays from with Last-Event-ID. Old rows are pruned.
+    """
+    TYPE_CHOICES = [
+        ('notification', 'Notification'),
+        ('booking', 'Booking status'),
+        ('room', 'Room status'),
+        ('room_issue', 'Room issue status'),
+    ]
+
+    event_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    payload = models.JSONField(default=dict)
+    # Who may receive it: 'all', 'managers' and/or 'user:<id>'
+    audience = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.get_event_type_display()} event #{self.pk}"
+
+    def is_visible_to(self, user):
+        return (
+            'all' in self.audience
+            or ('managers' in self.audience and user.is_manager())
+            or f'user:{user.pk}' in self.audience
+        )
+
+
+class StreamTicket(models.Model):
+    """
+    Single-use pass for opening the event stream.
+
+    EventSource cannot send an Authorization header, and a JWT in the query
+    string ends up in access and proxy logs. The client trades its JWT for a
+    ticket that expires after EVENT_STREAM_TICKET_SECONDS and is deleted when
+    used; only its SHA-256 is stored.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stream_tickets')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Stream ticket for {self.user}"
+
+
+class DailyRevenueRollup(models.Model):
+    """
+    Booking counts and revenue for one check-in date.
+
+    Maintained by bookings.rollups whenever a booking is written; revenue
+    columns cover authorized bookings that are not deleted.
+    """
+    date = models.DateField(unique=True)
+    
+    # Booking counts by status (original bookings only)
+    bookings = models.PositiveIntegerField(default=0)  # Not deleted, any status
+    authorized_bookings = models.PositiveIntegerField(default=0)
+    pending_bookings = models.PositiveIntegerField(default=0)
+    rejected_bookings = models.PositiveIntegerField(default=0)
+    deleted_bookings = models.PositiveIntegerField(default=0)
+    
+    # Revenue
+    amount_ghs = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cash_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    momo_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    # Authorized bookings by payment method
+    cash_bookings = models.PositiveIntegerField(default=0)
+    momo_bookings = models.PositiveIntegerField(default=0)
+    both_bookings = models.PositiveIntegerField(default=0)
+    
+    # MoMo by network
+    mtn_bookings = models.PositiveIntegerField(default=0)
+    mtn_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    vodafone_bookings = models.PositiveIntegerField(default=0)
+    vodafone_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    at_bookings = models.PositiveIntegerField(default=0)
+    at_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"Revenue for {self.date}"
+
+
+class Tombstone(models.Model):
+    """
+    A hard-deleted row, so delta sync can tell clients to drop it.
+
+    Soft-deleted bookings are still rows and sync through updated_at;
+    tombstones only cover rows that are gone.
+    """
+    KIND_CHOICES = [
+        ('booking', 'Booking'),
+        ('room', 'Room'),
+        ('room_issue', 'Room issue'),
+        ('notification', 'Notification'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at', 'id'], name='tombstone_kind_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.get_kind_display().lower()} #{self.object_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a request sent with an Idempotency-Key header.
+
+    A retry with the same key gets this response back instead of running
+    the request again. status_code is empty while the first request is
+    still running, for at most IDEMPOTENCY_LEASE_SECONDS. Rows expire
+    after IDEMPOTENCY_KEY_TTL_HOURS.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    # Hash of the method, path and body, so a key reused for another request is caught
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.key})"
@@ -0,0 +1,237 @@
+"""
+In-process occupancy index.
+
+Keeps every room's bookings as sorted intervals so "is room X free for
+[a, b)" is a binary search instead of a database round trip. Writes update
+the index incrementally through model signals once they commit, and bump a
+shared DataVersion counter that tells other worker processes their copy is
+stale. Each process reads the counter at most every
+OCCUPANCY_INDEX_CHECK_SECONDS, so another process's booking can take that
+long to show up; the exclusion constraint on Booking still refuses a
+double booking made from a stale answer.
+
+Enabled with the OCCUPANCY_INDEX_ENABLED setting.
+"""
+import copy
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Booking, DataVersion, Room, holds_room_q
+
+VERSION_KEY = 'occupancy'
+
+_index = None
+_lock = threading.RLock()
+# time.monotonic() when this process last compared its index with DataVersion
+_checked_at = None
+
+
+def is_enabled():
+    return getattr(settings, 'OCCUPANCY_INDEX_ENABLED', False)
+
+
+class RoomOccupancy:
+    """Immutable interval set for one room; replaced wholesale on change"""
+
+    def __init__(self, stays):
+        # stays: {booking_id: (check_in_date, check_out_date or None)}
+        self.stays = stays
+
+        # Ongoing bookings (no check-out) block every night from their check-in
+        open_starts = [start for start, end in stays.values() if end is None]
+        self.open_min = min(open_starts) if open_starts else None
+
+        # Bounded stays sorted by check-in with a running max of check-out,
+        # so "any stay starting before b that ends after a" is one bisect.
+        # Stays that end on or before they start occupy nothing.
+        bounded = sorted(
+            (start, end) for start, end in stays.values()
+            if end is not None and end > start
+        )
+        self.starts = [start for start, _ in bounded]
+        self.max_ends = []
+        running = None
+        for _, end in bounded:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def is_free(self, check_in_date, check_out_date=None):
+        """Same overlap rule as availability.conflicting_bookings"""
+        if check_out_date is not None and check_out_date <= check_in_date:
+            # The requested stay occupies nothing
+            return True
+
+        if self.open_min is not None and (check_out_date is None or self.open_min < check_out_date):
+            return False
+
+        if check_out_date is None:
+            idx = len(self.starts)
+        else:
+            idx = bisect_left(self.starts, check_out_date)
+        return idx == 0 or self.max_ends[idx - 1] <= check_in_date
+
+    def without(self, booking_id):
+        stays = dict(self.stays)
+        stays.pop(booking_id, None)
+        return RoomOccupancy(stays)
+
+
+class OccupancyIndex:
+    """Rooms and their occupancy intervals as of a DataVersion"""
+
+    def __init__(self, version, rooms, stays_by_room):
+        self.version = version
+        self.rooms = rooms  # {room_id: Room}
+        self.occupancy = {
+            room_id: RoomOccupancy(stays) for room_id, stays in stays_by_room.items()
+        }
+        self.booking_rooms = {
+            booking_id: room_id
+            for room_id, stays in stays_by_room.items()
+            for booking_id in stays
+        }
+
+    @classmethod
+    def build(cls, version):
+        rooms = {room.id: room for room in Room.objects.all()}
+        stays_by_room = {}
+        bookings = Booking.objects.filter(holds_room_q()).values_list(
+            'id', 'room_id', 'check_in_date', 'check_out_date'
+        )
+        for booking_id, room_id, check_in, check_out in bookings.iterator(chunk_size=2000):
+            stays_by_room.setdefault(room_id, {})[booking_id] = (check_in, check_out)
+        return cls(version, rooms, stays_by_room)
+
+    def is_room_free(self, room_id, check_in_date, check_out_date=None, exclude_booking_id=None):
+        occupancy = self.occupancy.get(room_id)
+        if occupancy is None:
+            return True
+        if exclude_booking_id and exclude_booking_id in occupancy.stays:
+            occupancy = occupancy.without(exclude_booking_id)
+        return occupancy.is_free(check_in_date, check_out_date)
+
+    def available_rooms(self, check_in_date, check_out_date=None, exclude_booking_id=None, room_type=None):
+        """Free, bookable rooms in the usual room ordering"""
+        rooms = [
+            room for room in list(self.rooms.values())
+            if room.is_available
+            and (not room_type or room.room_type == room_type)
+            and self.is_room_free(room.id, check_in_date, check_out_date, exclude_booking_id)
+        ]
+        return sorted(rooms, key=lambda room: (room.room_number, room.room_type))
+
+    # Incremental updates
+
+    def put_booking(self, booking_id, room_id, check_in_date, check_out_date):
+        self.remove_booking(booking_id)
+        if room_id is None:
+            return
+        occupancy = self.occupancy.get(room_id)
+        stays = dict(occupancy.stays) if occupancy else {}
+        stays[booking_id] = (check_in_date, check_out_date)
+        self.occupancy[room_id] = RoomOccupancy(stays)
+        self.booking_rooms[booking_id] = room_id
+
+    def remove_booking(self, booking_id):
+        room_id = self.booking_rooms.pop(booking_id, None)
+        if room_id is not None and room_id in self.occupancy:
+            self.occupancy[room_id] = self.occupancy[room_id].without(booking_id)
+
+    def put_room(self, room):
+        self.rooms[room.id] = room
+
+    def remove_room(self, room_id):
+        self.rooms.pop(room_id, None)
+        # Bookings are detached (room set to NULL) when their room is deleted
+        occupancy = self.occupancy.pop(room_id, None)
+        if occupancy:
+            for booking_id in occupancy.stays:
+                self.booking_rooms.pop(booking_id, None)
+
+
+def get_index():
+    """The current index, rebuilt if another process has changed bookings or rooms"""
+    global _index, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if (
+            _index is not None
+            and _checked_at is not None
+            and now - _checked_at < settings.OCCUPANCY_INDEX_CHECK_SECONDS
+        ):
+            return _index
+
+        version = DataVersion.current(VERSION_KEY)
+        if _index is None or _index.version != version:
+            _index = OccupancyIndex.build(version)
+        _checked_at = now
+        return _index
+
+
+def _record_change(apply):
+    """
+    Once the current transaction commits, bump the shared version and apply
+    the change to this process's index.
+
+    Bumping after the commit keeps the single counter row from serialising
+    concurrent booking transactions.
+    """
+    if not is_enabled():
+        return
+
+    def on_commit():
+        global _index
+        version = DataVersion.bump(VERSION_KEY)
+        with _lock:
+            if _index is None:
+                return
+            if _index.version == version - 1:
+                apply(_index)
+                _index.version = version
+            else:
+                # Another process wrote in between; rebuild on next read
+                _index = None
+
+    transaction.on_commit(on_commit)
+
+
+def booking_saved(booking):
+    if booking.holds_room():
+        values = (booking.id, booking.room_id, booking.check_in_date, booking.check_out_date)
+        _record_change(lambda index: index.put_booking(*values))
+    else:
+        booking_id = booking.id
+        _record_change(lambda index: index.remove_booking(booking_id))
+
+
+def bookings_created(bookings):
+    """booking_saved for a batch of bookings inserted together, as one change"""
+    values = [
+        (booking.id, booking.room_id, booking.check_in_date, booking.check_out_date)
+        for booking in bookings if booking.holds_room()
+    ]
+
+    def apply(index):
+        for value in values:
+            index.put_booking(*value)
+
+    _record_change(apply)
+
+
+def booking_deleted(booking):
+    booking_id = booking.id
+    _record_change(lambda index: index.remove_booking(booking_id))
+
+
+def room_saved(room):
+    snapshot = copy.copy(room)
+    _record_change(lambda index: index.put_room(snapshot))
+
+
+def room_deleted(room):
+    room_id = room.id
+    _record_change(lambda index: index.remove_room(room_id))
@@ -0,0 +1,160 @@
+"""
+Keyset (seek) pagination for list endpoints.
+
+Pages are addressed by the (ordering_field, id) of the last row seen rather
+than an offset, so every page costs the same index range scan no matter how
+deep the client has scrolled, and rows inserted meanwhile never shift pages.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pagination on (-ordering_field, -id) with opaque cursors.
+
+    Pagination is opt-in: without page_size or cursor in the query string
+    the full list is returned as before.
+    """
+    ordering_field = 'created_at'
+    # None keeps pagination off until the client asks for a page
+    page_size = None
+    default_page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.cursor = self.decode_cursor(request, queryset)
+        field = self.ordering_field
+
+        if self.cursor is None:
+            reverse = False
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            value, pk, reverse = self.cursor
+            if reverse:
+                # Walking back towards newer rows
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+                ).order_by(field, 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+                ).order_by(f'-{field}', '-id')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        if rows:
+            self.next_position = self.get_position(rows[-1])
+            self.previous_position = self.get_position(rows[0])
+        else:
+            # Empty page: both directions continue from the cursor itself
+            position = self.cursor[:2] if self.cursor else None
+            self.next_position = self.previous_position = position
+            self.has_next = self.has_next and position is not None and reverse
+            self.has_previous = self.has_previous and position is not None and not reverse
+
+        return rows
+
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw is not None:
+            try:
+                size = int(raw)
+            except ValueError:
+                size = 0
+            if size > 0:
+                return min(size, self.max_page_size)
+        if self.cursor_query_param in request.query_params:
+            return self.page_size or self.default_page_size
+        return self.page_size
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.build_link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.build_link(self.previous_position, reverse=True)
+
+    def build_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    # Cursor encoding
+
+    def get_position(self, obj):
+        return getattr(obj, self.ordering_field), obj.pk
+
+    def encode_position_value(self, value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def decode_position_value(self, raw, queryset):
+        return queryset.model._meta.get_field(self.ordering_field).to_python(raw)
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        payload = json.dumps({'v': self.encode_position_value(value), 'i': pk, 'r': int(reverse)})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, queryset):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            value = self.decode_position_value(payload['v'], queryset)
+            return value, int(payload['i']), bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class BookingVersionPagination(KeysetPagination):
+    """Version history pages, newest edit first; always paginated"""
+    ordering_field = 'edited_at'
+    page_size = 20
+
+
+class SearchPagination(KeysetPagination):
+    """Search results, best match first; pages by (rank, id); always paginated"""
+    ordering_field = 'rank'
+    page_size = 20
+
+    def decode_position_value(self, raw, queryset):
+        # rank is an annotation, not a model field
+        return float(raw)
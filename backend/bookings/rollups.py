@@ -0,0 +1,190 @@
+"""
+Daily revenue rollup.
+
+DailyRevenueRollup holds one row per check-in date with the booking counts
+and revenue totals the dashboards show. Every booking write recomputes the
+rows for the dates it touched from the bookings on those dates, in the same
+transaction and under a row lock, so concurrent writes to the same day are
+serialized and the rollup never drifts from its source. rebuild() (and the
+rebuild_revenue_rollup command) recomputes every day.
+"""
+from datetime import date as date_type, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+
+from .models import Booking, DailyRevenueRollup
+
+LIVE = Q(deleted_at__isnull=True)
+AUTHORIZED = LIVE & Q(status='authorized')
+
+
+def _sum(field, condition):
+    return Coalesce(
+        Sum(field, filter=condition), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+# Rollup column -> aggregate over one day's original bookings
+AGGREGATES = {
+    'bookings': Count('id', filter=LIVE),
+    'authorized_bookings': Count('id', filter=AUTHORIZED),
+    'pending_bookings': Count('id', filter=LIVE & Q(status='pending')),
+    'rejected_bookings': Count('id', filter=LIVE & Q(status='rejected')),
+    'deleted_bookings': Count('id', filter=Q(deleted_at__isnull=False)),
+    'amount_ghs': _sum('amount_ghs', AUTHORIZED),
+    'cash_amount': _sum('cash_amount', AUTHORIZED),
+    'momo_amount': _sum('momo_amount', AUTHORIZED),
+    'cash_bookings': Count('id', filter=AUTHORIZED & Q(payment_method='cash')),
+    'momo_bookings': Count('id', filter=AUTHORIZED & Q(payment_method='momo')),
+    'both_bookings': Count('id', filter=AUTHORIZED & Q(payment_method='both')),
+    'mtn_bookings': Count('id', filter=AUTHORIZED & Q(momo_network='MTN')),
+    'mtn_amount': _sum('momo_amount', AUTHORIZED & Q(momo_network='MTN')),
+    'vodafone_bookings': Count('id', filter=AUTHORIZED & Q(momo_network='Vodafone')),
+    'vodafone_amount': _sum('momo_amount', AUTHORIZED & Q(momo_network='Vodafone')),
+    'at_bookings': Count('id', filter=AUTHORIZED & Q(momo_network='AT')),
+    'at_amount': _sum('momo_amount', AUTHORIZED & Q(momo_network='AT')),
+}
+
+COLUMNS = list(AGGREGATES)
+
+
+def day_totals(bookings):
+    """{check_in_date: {column: value}} for a queryset of bookings"""
+    # Aliased because annotations may not reuse Booking field names
+    rows = (
+        bookings.filter(is_original=True)
+        .order_by()
+        .values('check_in_date')
+        .annotate(**{f'rollup_{column}': aggregate for column, aggregate in AGGREGATES.items()})
+    )
+    return {
+        row['check_in_date']: {column: row[f'rollup_{column}'] for column in COLUMNS}
+        for row in rows
+    }
+
+
+def refresh_days(dates):
+    """Recompute the rollup rows for dates from the bookings on those days"""
+    dates = sorted({
+        date_type.fromisoformat(day) if isinstance(day, str) else day
+        for day in dates if day
+    })
+    if not dates:
+        return
+
+    with transaction.atomic():
+        # Make sure each row exists, then lock them in date order so two
+        # writers on the same days queue up instead of deadlocking
+        DailyRevenueRollup.objects.bulk_create(
+            [DailyRevenueRollup(date=day) for day in dates], ignore_conflicts=True
+        )
+        rows = {
+            row.date: row
+            for row in DailyRevenueRollup.objects.select_for_update().filter(date__in=dates).order_by('date')
+        }
+        # Read after the lock so the totals include writes committed meanwhile
+        totals = day_totals(Booking.objects.filter(check_in_date__in=dates))
+        empty = [day for day in dates if day not in totals]
+        for day, values in totals.items():
+            row = rows[day]
+            for column, value in values.items():
+                setattr(row, column, value)
+            row.save()
+        if empty:
+            DailyRevenueRollup.objects.filter(date__in=empty).delete()
+
+
+def booking_saved(booking):
+    if booking.is_original:
+        refresh_days({booking.check_in_date, getattr(booking, '_loaded_fields', {}).get('check_in_date')})
+
+
+def booking_deleted(booking):
+    if booking.is_original:
+        refresh_days({booking.check_in_date})
+
+
+def rebuild():
+    """Recompute every day from scratch; returns the number of days"""
+    totals = day_totals(Booking.objects.all())
+    with transaction.atomic():
+        DailyRevenueRollup.objects.all().delete()
+        DailyRevenueRollup.objects.bulk_create(
+            [DailyRevenueRollup(date=day, **values) for day, values in totals.items()], batch_size=1000
+        )
+    return len(totals)
+
+
+def totals(rows=None):
+    """Column sums over rollup rows (all days by default)"""
+    if rows is None:
+        rows = DailyRevenueRollup.objects.all()
+    return rows.aggregate(**{
+        column: Coalesce(Sum(column), Value(0), output_field=DailyRevenueRollup._meta.get_field(column))
+        for column in COLUMNS
+    })
+
+
+def summary(values):
+    """API shape for a dict of rollup column values"""
+    return {
+        'total_bookings': values['authorized_bookings'],
+        'total_amount_ghs': float(values['amount_ghs']),
+        'cash_amount_ghs': float(values['cash_amount']),
+        'momo_amount_ghs': float(values['momo_amount']),
+        'payment_methods': {
+            'cash': values['cash_bookings'],
+            'momo': values['momo_bookings'],
+            'both': values['both_bookings'],
+        },
+        'momo_networks': {
+            'MTN': {'bookings': values['mtn_bookings'], 'amount_ghs': float(values['mtn_amount'])},
+            'Vodafone': {'bookings': values['vodafone_bookings'], 'amount_ghs': float(values['vodafone_amount'])},
+            'AT': {'bookings': values['at_bookings'], 'amount_ghs': float(values['at_amount'])},
+        },
+    }
+
+
+# Report granularity -> expression giving each rollup row's bucket
+GRANULARITIES = {
+    'day': F('date'),
+    'week': TruncWeek('date'),  # Buckets start on Monday
+    'month': TruncMonth('date'),
+}
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def periods(start, end, granularity):
+    """Every bucket start from the one holding start through end"""
+    period = bucket_start(start, granularity)
+    while period <= end:
+        yield period
+        if granularity == 'day':
+            period += timedelta(days=1)
+        elif granularity == 'week':
+            period += timedelta(days=7)
+        else:
+            period = (period + timedelta(days=32)).replace(day=1)
+
+
+def report(start, end, granularity):
+    """[(bucket start, column values)] for every bucket in [start, end], zero-filled"""
+    rows = (
+        DailyRevenueRollup.objects.filter(date__gte=start, date__lte=end)
+        .order_by()
+        .annotate(period=GRANULARITIES[granularity])
+        .values('period')
+        .annotate(**{f'sum_{column}': Sum(column) for column in COLUMNS})
+    )
+    by_period = {row['period']: {column: row[f'sum_{column}'] for column in COLUMNS} for row in rows}
+    empty = dict.fromkeys(COLUMNS, 0)
+    return [(period, by_period.get(period, empty)) for period in periods(start, end, granularity)]
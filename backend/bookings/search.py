@@ -0,0 +1,58 @@
+"""
+Guest search.
+
+Bookings are matched on the guest's name (typos allowed), telephone/ID and
+room number through pg_trgm GIN indexes on UPPER() of those columns, the
+same expressions Django's icontains compares, so the admin search and the
+API both avoid sequential scans. Results are ranked by trigram word
+similarity of the name or telephone to the query.
+"""
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, Greatest, Upper
+from django.contrib.postgres.search import TrigramWordSimilarity
+
+# Lowest name word similarity (0-1) that counts as a fuzzy match; pg_trgm's
+# default of 0.6 misses most single-letter typos in short names
+WORD_SIMILARITY_THRESHOLD = 0.3
+
+
+def set_threshold():
+    """Use WORD_SIMILARITY_THRESHOLD for the rest of the current transaction"""
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL pg_trgm.word_similarity_threshold = %s', [WORD_SIMILARITY_THRESHOLD])
+
+
+def matching(queryset, query):
+    """Bookings whose name is like query, or whose telephone/ID or room contains it"""
+    term = query.strip().upper()
+    return queryset.alias(
+        search_name=Upper('name'),
+        search_telephone=Upper('id_or_telephone'),
+        search_room=Upper('room_no'),
+    ).filter(
+        Q(search_name__trigram_word_similar=term)
+        | Q(search_name__contains=term)
+        | Q(search_telephone__contains=term)
+        | Q(search_room__contains=term)
+    )
+
+
+def ranked(queryset, query):
+    """
+    matching() with a rank annotation, best first.
+
+    pg_trgm similarities are real; rank is cast to double precision so the
+    value a page cursor carries compares equal to the row it came from, and
+    rows tied on rank are paged by id instead of skipped or repeated.
+    """
+    term = query.strip().upper()
+    return matching(queryset, query).annotate(
+        rank=Cast(
+            Greatest(
+                TrigramWordSimilarity(term, F('search_name')),
+                TrigramWordSimilarity(term, F('search_telephone')),
+            ),
+            FloatField(),
+        )
+    ).order_by('-rank', '-id')
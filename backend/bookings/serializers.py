@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import User, Booking, BookingVersion, Room, RoomIssue, Notification
+from .models import (
+    User, Booking, BookingVersion, Room, RoomIssue, Notification, NotificationReadState, ExportJob,
+)
+from .versioning import attach_states, reconstruct, record_version
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -159,13 +163,93 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+ROOM_CONFLICT_CONSTRAINT = 'exclude_overlapping_room_stays'
+
+
+def is_room_conflict(error):
+    """True if an IntegrityError came from the room double-booking constraint"""
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == ROOM_CONFLICT_CONSTRAINT
+
+
+def room_conflict_error():
+    return serializers.ValidationError({
+        'room_id': 'This room is already booked for the selected dates.'
+    })
+
+
+# Version fields that change on every save and say nothing about the edit itself
+VERSION_BOOKKEEPING_FIELDS = {'id', 'created_at', 'updated_at', 'version_number', 'last_edited_by_name'}
+
+
+def booking_version_data(instance):
+    """Full booking data as recorded in its version history"""
+    return {
+        'id': instance.id,
+        'name': instance.name,
+        'id_or_telephone': instance.id_or_telephone,
+        'address_location': instance.address_location,
+        'room_no': instance.room_no,
+        'check_in_date': str(instance.check_in_date),
+        'check_in_time': str(instance.check_in_time),
+        'check_out_date': str(instance.check_out_date) if instance.check_out_date else None,
+        'check_out_time': str(instance.check_out_time) if instance.check_out_time else None,
+        'payment_method': instance.payment_method,
+        'amount_ghs': str(instance.amount_ghs),
+        'cash_amount': str(instance.cash_amount),
+        'momo_amount': str(instance.momo_amount),
+        'momo_network': instance.momo_network or None,
+        'momo_number': instance.momo_number or None,
+        'booked_by_name': instance.booked_by.username if instance.booked_by else None,
+        'last_edited_by_name': instance.last_edited_by.username if instance.last_edited_by else None,
+        'created_at': instance.created_at.isoformat(),
+        'updated_at': instance.updated_at.isoformat(),
+        'version_number': instance.version_number,
+        'is_authorized': instance.is_authorized,
+        'authorized_by': instance.authorized_by or None,
+    }
+
+
+def changed_fields(old_data, new_data):
+    """Names of the booking fields that differ between two version snapshots"""
+    # Older snapshots record fewer fields; only compare what both recorded
+    keys = (set(old_data) & set(new_data)) - VERSION_BOOKKEEPING_FIELDS
+    return sorted(key for key in keys if old_data.get(key) != new_data.get(key))
+
+
+class BookingVersionListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Rebuild the full data of delta-encoded versions in one pass
+        versions = data.all() if hasattr(data, 'all') else data
+        return super().to_representation(attach_states(versions))
+
+
 class BookingVersionSerializer(serializers.ModelSerializer):
     edited_by_name = serializers.CharField(source='edited_by.username', read_only=True)
+    version_data = serializers.SerializerMethodField()
     
     class Meta:
         model = BookingVersion
         fields = ['id', 'version_data', 'edited_by', 'edited_by_name', 'edited_at', 'is_manager_edit']
         read_only_fields = ['id', 'edited_at']
+        list_serializer_class = BookingVersionListSerializer
+    
+    def get_version_data(self, obj):
+        """Full booking data at this version, whether stored as snapshot or delta"""
+        if not hasattr(obj, 'state'):
+            reconstruct(obj)
+        return obj.state
+
+
+class BookingVersionSummarySerializer(serializers.ModelSerializer):
+    """Who edited a booking, when, and which fields the edit changed"""
+    edited_by_name = serializers.CharField(source='edited_by.username', read_only=True)
+    changed_fields = serializers.ListField(child=serializers.CharField(), read_only=True)
+    
+    class Meta:
+        model = BookingVersion
+        fields = ['id', 'edited_by', 'edited_by_name', 'edited_at', 'is_manager_edit', 'changed_fields']
+        read_only_fields = fields
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -194,6 +278,20 @@ class BookingSerializer(serializers.ModelSerializer):
                            'deleted_by', 'is_deleted', 'can_restore', 'status', 'is_pending', 
                            'is_rejected', 'is_authorized']
     
+    @staticmethod
+    def expands_versions(request):
+        """Version history is only embedded for managers who ask for ?expand=versions"""
+        if request is None or not request.user.is_authenticated or not request.user.is_manager():
+            return False
+        expand = request.query_params.get('expand', '')
+        return 'versions' in expand.split(',')
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.expands_versions(self.context.get('request')):
+            fields.pop('versions')
+        return fields
+    
     def validate(self, attrs):
         """Validate MoMo fields, age, and check-in/check-out times"""
         from datetime import time
@@ -335,35 +433,22 @@ class BookingSerializer(serializers.ModelSerializer):
             except (Room.DoesNotExist, Room.MultipleObjectsReturned):
                 pass  # Keep room_no as string if no unique match
         
+        try:
+            with transaction.atomic():
+                booking = self._create_booking(validated_data)
+        except IntegrityError as e:
+            if is_room_conflict(e):
+                raise room_conflict_error()
+            raise
+        
+        return booking
+    
+    def _create_booking(self, validated_data):
         booking = Booking.objects.create(**validated_data)
         
         # Create initial version record after booking is saved
-        version_data = {
-            'id': booking.id,
-            'name': booking.name,
-            'id_or_telephone': booking.id_or_telephone,
-            'address_location': booking.address_location,
-            'room_no': booking.room_no,
-            'check_in_date': str(booking.check_in_date),
-            'check_in_time': str(booking.check_in_time),
-            'check_out_date': str(booking.check_out_date) if booking.check_out_date else None,
-            'check_out_time': str(booking.check_out_time) if booking.check_out_time else None,
-            'payment_method': booking.payment_method,
-            'amount_ghs': str(booking.amount_ghs),
-            'cash_amount': str(booking.cash_amount),
-            'momo_amount': str(booking.momo_amount),
-            'momo_network': booking.momo_network or None,
-            'momo_number': booking.momo_number or None,
-            'booked_by_name': booking.booked_by.username if booking.booked_by else None,
-            'created_at': booking.created_at.isoformat(),
-            'version_number': booking.version_number,
-        }
-        BookingVersion.objects.create(
-            booking=booking,
-            version_data=version_data,
-            edited_by=self.context['request'].user,
-            is_manager_edit=False
-        )
+        version_data = booking_version_data(booking)
+        record_version(booking, version_data, edited_by=self.context['request'].user)
         
         # Notify all staff of new reservation
         Notification.objects.create(
@@ -376,39 +461,24 @@ class BookingSerializer(serializers.ModelSerializer):
         return booking
     
     def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return self._update_booking(instance, validated_data)
+        except IntegrityError as e:
+            if is_room_conflict(e):
+                raise room_conflict_error()
+            raise
+    
+    def _update_booking(self, instance, validated_data):
         user = self.context['request'].user
         
         # If manager is editing, mark as manager edit
         is_manager_edit = user.is_manager()
         
         # Save current state as version before updating
-        version_data = {
-            'id': instance.id,
-            'name': instance.name,
-            'id_or_telephone': instance.id_or_telephone,
-            'address_location': instance.address_location,
-            'room_no': instance.room_no,
-            'check_in_date': str(instance.check_in_date),
-            'check_in_time': str(instance.check_in_time),
-            'check_out_date': str(instance.check_out_date) if instance.check_out_date else None,
-            'check_out_time': str(instance.check_out_time) if instance.check_out_time else None,
-            'payment_method': instance.payment_method,
-            'amount_ghs': str(instance.amount_ghs),
-            'cash_amount': str(instance.cash_amount),
-            'momo_amount': str(instance.momo_amount),
-            'momo_network': instance.momo_network or None,
-            'momo_number': instance.momo_number or None,
-            'booked_by_name': instance.booked_by.username if instance.booked_by else None,
-            'last_edited_by_name': instance.last_edited_by.username if instance.last_edited_by else None,
-            'created_at': instance.created_at.isoformat(),
-            'updated_at': instance.updated_at.isoformat(),
-            'version_number': instance.version_number,
-            'is_authorized': instance.is_authorized,
-            'authorized_by': instance.authorized_by or None,
-        }
-        BookingVersion.objects.create(
-            booking=instance,
-            version_data=version_data,
+        record_version(
+            instance,
+            booking_version_data(instance),
             edited_by=user,
             is_manager_edit=is_manager_edit
         )
@@ -505,8 +575,38 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['notification_type', 'title', 'message', 'link', 'created_at']
 
     def get_is_read(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user:
-            return False
-        return obj.read_by.filter(pk=request.user.pk).exists()
+        # Annotated by NotificationViewSet.get_queryset
+        annotated = getattr(obj, 'is_read', None)
+        if annotated is not None:
+            return annotated
+        
+        read_state = self.context.get('read_state')
+        if read_state is None:
+            request = self.context.get('request')
+            if not request or not request.user.is_authenticated:
+                return False
+            read_state = NotificationReadState.for_user(request.user)
+            self.context['read_state'] = read_state
+        return read_state.is_read(obj)
+
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'kind', 'kind_display', 'export_format', 'compress', 'filters',
+            'status', 'status_display', 'file_name', 'file_size', 'error',
+            'created_at', 'started_at', 'finished_at', 'download_url'
+        ]
+        read_only_fields = fields
 
+    def get_download_url(self, obj):
+        if obj.status != 'completed':
+            return None
+        from rest_framework.reverse import reverse
+        return reverse('export-job-download', args=[obj.pk], request=self.context.get('request'))
@@ -0,0 +1,89 @@
+"""
+Model signal receivers that keep derived data (caches, indexes, the daily
+revenue rollup) in step with bookings and rooms, publish status changes to
+the live event stream and record hard deletes for delta sync.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import events, occupancy, rollups, stats, sync
+from .models import Booking, BookingVersion, Notification, Room, RoomIssue, User
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, **kwargs):
+    occupancy.booking_saved(instance)
+    rollups.booking_saved(instance)
+    if instance.is_original and (created or instance.field_changed('status') or instance.field_changed('deleted_at')):
+        events.booking_changed(instance)
+    instance.remember_loaded_fields()
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    occupancy.booking_deleted(instance)
+    rollups.booking_deleted(instance)
+    if instance.is_original:
+        events.booking_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, created, **kwargs):
+    occupancy.room_saved(instance)
+    if created or instance.field_changed('is_available'):
+        events.room_changed(instance)
+    instance.remember_loaded_fields()
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    occupancy.room_deleted(instance)
+    events.room_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=RoomIssue)
+def room_issue_saved(sender, instance, created, **kwargs):
+    if created or instance.field_changed('status'):
+        events.room_issue_changed(instance)
+    instance.remember_loaded_fields()
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    if created:
+        events.notification_created(instance)
+
+
+def admin_stats_changed(sender, **kwargs):
+    # Once committed: a request in between would cache the old figures again
+    transaction.on_commit(stats.invalidate_admin_stats)
+
+
+# Models counted by the admin dashboard statistics
+for model in (Booking, BookingVersion, Room, RoomIssue, User):
+    post_save.connect(admin_stats_changed, sender=model, dispatch_uid=f'admin_stats_saved_{model.__name__}')
+    post_delete.connect(admin_stats_changed, sender=model, dispatch_uid=f'admin_stats_deleted_{model.__name__}')
+
+
+def room_issue_summary_changed(sender, **kwargs):
+    transaction.on_commit(stats.invalidate_room_issue_summary)
+
+
+# Room numbers are shown in the per-room breakdown
+for model in (Room, RoomIssue):
+    post_save.connect(room_issue_summary_changed, sender=model, dispatch_uid=f'issue_summary_saved_{model.__name__}')
+    post_delete.connect(room_issue_summary_changed, sender=model, dispatch_uid=f'issue_summary_deleted_{model.__name__}')
+
+
+def record_deletion(sender, instance, **kwargs):
+    # Clients only ever hold original bookings
+    if getattr(instance, 'is_original', True):
+        sync.record_deletion(SYNC_KINDS[sender], instance.pk)
+
+
+# Models served by delta sync, and their Tombstone kind
+SYNC_KINDS = {Booking: 'booking', Room: 'room', RoomIssue: 'room_issue', Notification: 'notification'}
+
+for model in SYNC_KINDS:
+    post_delete.connect(record_deletion, sender=model, dispatch_uid=f'sync_deleted_{model.__name__}')
@@ -0,0 +1,175 @@
+"""
+Dashboard statistics.
+
+Each table is summarised with one conditional-aggregation or grouped query,
+and the result is cached for STATS_CACHE_SECONDS. Signal receivers drop the
+cached copy when a change to a counted row commits, so the TTL only bounds
+how stale a change made outside the ORM (e.g. raw SQL) can look.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BookingVersion, DailyRevenueRollup, Room, RoomIssue, User
+
+ADMIN_STATS_CACHE_KEY = 'stats:admin_index'
+ISSUE_SUMMARY_CACHE_KEY = 'stats:room_issue_summary'
+
+RESOLVED_STATUSES = ['fixed', 'resolved']
+
+
+def _sum(column, condition=None):
+    field = DailyRevenueRollup._meta.get_field(column)
+    return Coalesce(Sum(column, filter=condition), Value(0), output_field=field)
+
+
+def admin_index_stats():
+    """Statistics shown on the admin home page; cached"""
+    today = timezone.now().date()
+    # Keyed by date so "today" and "this week" roll over at midnight
+    key = f'{ADMIN_STATS_CACHE_KEY}:{today}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = _compute(today)
+        cache.set(key, stats, settings.STATS_CACHE_SECONDS)
+    return stats
+
+
+def invalidate_admin_stats():
+    cache.delete(f'{ADMIN_STATS_CACHE_KEY}:{timezone.now().date()}')
+
+
+def _compute(today):
+    week_ago = today - timedelta(days=7)
+    this_week = Q(date__gte=week_ago)
+    on_today = Q(date=today)
+
+    # Bookings and revenue come from the daily rollup
+    bookings = DailyRevenueRollup.objects.aggregate(
+        total=_sum('bookings'),
+        authorized=_sum('authorized_bookings'),
+        pending=_sum('pending_bookings'),
+        rejected=_sum('rejected_bookings'),
+        deleted=_sum('deleted_bookings'),
+        today=_sum('bookings', on_today),
+        this_week=_sum('bookings', this_week),
+        revenue_total=_sum('amount_ghs'),
+        revenue_today=_sum('amount_ghs', on_today),
+        revenue_this_week=_sum('amount_ghs', this_week),
+    )
+    rooms = Room.objects.aggregate(
+        total=Count('id'),
+        available=Count('id', filter=Q(is_available=True)),
+    )
+    users = User.objects.aggregate(
+        total=Count('id'),
+        managers=Count('id', filter=Q(role='manager')),
+        receptionists=Count('id', filter=Q(role='receptionist')),
+    )
+    issues = RoomIssue.objects.aggregate(
+        total=Count('id'),
+        reported=Count('id', filter=Q(status='reported')),
+        in_progress=Count('id', filter=Q(status='in_progress')),
+        fixed=Count('id', filter=Q(status='fixed')),
+    )
+
+    return {
+        'bookings': {
+            'total': bookings['total'],
+            'authorized': bookings['authorized'],
+            'pending': bookings['pending'],
+            'rejected': bookings['rejected'],
+            'deleted': bookings['deleted'],
+            'today': bookings['today'],
+            'this_week': bookings['this_week'],
+        },
+        'revenue': {
+            'total': float(bookings['revenue_total']),
+            'today': float(bookings['revenue_today']),
+            'this_week': float(bookings['revenue_this_week']),
+        },
+        'rooms': {
+            'total': rooms['total'],
+            'available': rooms['available'],
+            'booked': rooms['total'] - rooms['available'],
+        },
+        'users': users,
+        'issues': issues,
+        'versions': {
+            'total': BookingVersion.objects.count(),
+        },
+    }
+
+
+def room_issue_summary():
+    """Issue counts by type, status, priority and room; cached"""
+    summary = cache.get(ISSUE_SUMMARY_CACHE_KEY)
+    if summary is None:
+        summary = _issue_summary()
+        cache.set(ISSUE_SUMMARY_CACHE_KEY, summary, settings.STATS_CACHE_SECONDS)
+    return summary
+
+
+def invalidate_room_issue_summary():
+    cache.delete(ISSUE_SUMMARY_CACHE_KEY)
+
+
+def _issue_summary():
+    def counters(choices):
+        return {
+            value: {'display': display, 'count': 0, 'unresolved': 0}
+            for value, display in choices
+        }
+
+    by_type = counters(RoomIssue.ISSUE_TYPE_CHOICES)
+    by_status = counters(RoomIssue.STATUS_CHOICES)
+    by_priority = counters(RoomIssue._meta.get_field('priority').choices)
+    total_issues = unresolved = 0
+
+    groups = (
+        RoomIssue.objects.order_by()
+        .values('issue_type', 'status', 'priority')
+        .annotate(count=Count('id'))
+    )
+    for group in groups:
+        count = group['count']
+        is_unresolved = group['status'] not in RESOLVED_STATUSES
+        total_issues += count
+        for counts, key in ((by_type, 'issue_type'), (by_status, 'status'), (by_priority, 'priority')):
+            # Values no longer in the choices still get counted
+            bucket = counts.setdefault(group[key], {'display': group[key], 'count': 0, 'unresolved': 0})
+            bucket['count'] += count
+            if is_unresolved:
+                bucket['unresolved'] += count
+        if is_unresolved:
+            unresolved += count
+
+    # Rooms with the most open issues first
+    rooms = (
+        RoomIssue.objects.values('room', 'room__room_number')
+        .annotate(count=Count('id'), unresolved=Count('id', filter=~Q(status__in=RESOLVED_STATUSES)))
+        .order_by('-unresolved', '-count', 'room__room_number')
+    )
+    by_room = [
+        {
+            'room': row['room'],
+            'room_number': row['room__room_number'],
+            'count': row['count'],
+            'unresolved': row['unresolved'],
+        }
+        for row in rooms
+    ]
+
+    return {
+        'total_issues': total_issues,
+        'unresolved': unresolved,
+        'resolved': total_issues - unresolved,
+        'by_type': by_type,
+        'by_status': by_status,
+        'by_priority': by_priority,
+        'by_room': by_room,
+    }
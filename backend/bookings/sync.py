@@ -0,0 +1,186 @@
+"""
+Delta sync for offline-capable clients.
+
+GET /api/<collection>/changes/?since=<watermark> returns the rows written
+since the watermark, the ids the client should drop, and a new watermark to
+send next time. Without since the client gets a full snapshot, page by page.
+
+Rows are read in (timestamp, id) order from an index, and the watermark is
+the position of the last row handed out, so every page is one range scan.
+Hard deletes are read the same way from Tombstone. The watermark never
+moves past rows written in the last SYNC_SETTLE_SECONDS: such rows are sent
+straight away and again on the next sync, so a transaction that commits
+late cannot land behind a watermark a client already holds.
+
+Tombstones are kept for SYNC_TOMBSTONE_RETENTION_DAYS. A client whose
+watermark is older than that may have missed deletes, so it gets a fresh
+snapshot flagged full_resync and must drop its copy before applying it.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Tombstone
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+PRUNE_INTERVAL = timedelta(hours=1)
+
+_last_prune = None
+
+
+def _after(field, position):
+    value, pk = position
+    return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+
+
+def encode_watermark(rows_position, removed_position):
+    payload = {
+        'r': [rows_position[0].isoformat(), rows_position[1]] if rows_position else None,
+        'd': [removed_position[0].isoformat(), removed_position[1]],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_watermark(token):
+    """(rows position or None, tombstone position); raises ValueError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        rows = payload['r']
+        removed = payload['d']
+        return (
+            (datetime.fromisoformat(rows[0]), int(rows[1])) if rows else None,
+            (datetime.fromisoformat(removed[0]), int(removed[1])),
+        )
+    except Exception:
+        raise ValueError('Invalid sync token')
+
+
+def get_limit(params):
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _page(queryset, field, position, cutoff, limit):
+    """
+    Up to limit rows after position, the new position and whether more rows
+    are ready. The position only moves past rows written by cutoff; newer
+    rows are handed out now and again next time.
+    """
+    if position:
+        queryset = queryset.filter(_after(field, position))
+    rows = list(queryset.order_by(field, 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    settled = [row for row in rows if _value(row, field) <= cutoff]
+    if settled:
+        position = (_value(settled[-1], field), _pk(settled[-1]))
+    # Rows past an unsettled one are unsettled too; wait for them to settle
+    return rows, position, has_more and len(settled) == len(rows)
+
+
+def _value(row, field):
+    return row[0] if isinstance(row, tuple) else getattr(row, field)
+
+
+def _pk(row):
+    return row[1] if isinstance(row, tuple) else row.pk
+
+
+def changes(queryset, kind, serialize, since=None, limit=DEFAULT_LIMIT, visible=None, field='updated_at'):
+    """
+    One page of changes to queryset after the since watermark.
+
+    serialize turns a list of rows into API data. visible, a Q, separates
+    rows the user may see from changed rows to report as removed (e.g. a
+    booking that was soft-deleted); a full snapshot only reads visible rows.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    incremental = bool(since)
+    rows_position, removed_position = decode_watermark(since) if incremental else (None, None)
+    full_resync = incremental and removed_position[0] < _retention_cutoff()
+    if full_resync:
+        # Tombstones this client still needed may be gone: start over
+        incremental = False
+        rows_position = removed_position = None
+
+    if visible is not None:
+        if incremental:
+            queryset = queryset.annotate(sync_visible=ExpressionWrapper(visible, output_field=BooleanField()))
+        else:
+            queryset = queryset.filter(visible)
+    rows, rows_position, has_more = _page(queryset, field, rows_position, cutoff, limit)
+
+    removed = []
+    if not incremental:
+        # A snapshot has nothing to remove; later syncs pick up deletes from here
+        removed_position = (cutoff, 0)
+    else:
+        tombstones = Tombstone.objects.filter(kind=kind).values_list('deleted_at', 'id', 'object_id')
+        tombstones, removed_position, more_removed = _page(tombstones, 'deleted_at', removed_position, cutoff, limit)
+        has_more = has_more or more_removed
+        if not more_removed:
+            # Every settled tombstone has been read, so the position can move
+            # up to the cutoff and stays inside the retention window
+            removed_position = max(removed_position, (cutoff, 0))
+        removed = [object_id for _, _, object_id in tombstones]
+
+    if visible is not None and incremental:
+        removed += [row.pk for row in rows if not row.sync_visible]
+        rows = [row for row in rows if row.sync_visible]
+
+    return {
+        'results': serialize(rows),
+        'removed': removed,
+        'watermark': encode_watermark(rows_position, removed_position),
+        'has_more': has_more,
+        'full_resync': full_resync,
+    }
+
+
+def changes_response(view, queryset, kind, visible=None, field='updated_at'):
+    """changes() for a viewset action, reading since and limit from the query string"""
+    params = view.request.query_params
+    try:
+        data = changes(
+            queryset,
+            kind,
+            lambda rows: view.get_serializer(rows, many=True).data,
+            since=params.get('since') or None,
+            limit=get_limit(params),
+            visible=visible,
+            field=field,
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
+
+
+def _retention_cutoff():
+    return timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+
+def prune():
+    return Tombstone.objects.filter(deleted_at__lt=_retention_cutoff()).delete()[0]
+
+
+def _maybe_prune():
+    global _last_prune
+    if _last_prune is None or timezone.now() - _last_prune > PRUNE_INTERVAL:
+        _last_prune = timezone.now()
+        transaction.on_commit(prune)
+
+
+def record_deletion(kind, object_id):
+    Tombstone.objects.create(kind=kind, object_id=object_id)
+    _maybe_prune()
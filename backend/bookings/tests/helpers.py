@@ -0,0 +1,53 @@
+"""Shared test data builders"""
+from datetime import date, timedelta
+
+from rest_framework.test import APIClient
+
+from ..models import Room, User
+
+
+def make_user(username, role='manager'):
+    return User.objects.create_user(username=username, password='secret', role=role)
+
+
+def make_rooms(count, room_type='short_stay_1_3_fan'):
+    return [
+        Room.objects.create(room_number=f'{100 + i}', room_type=room_type, price_per_night=100)
+        for i in range(count)
+    ]
+
+
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def booking_data(room, check_in_date, nights=2, **extra):
+    """POST /api/bookings/ body for a cash booking of room"""
+    data = {
+        'name': 'Guest',
+        'id_or_telephone': '0240000000',
+        'room_id': room.id,
+        'room_no': room.room_number,
+        'check_in_date': str(check_in_date),
+        'check_in_time': '14:00',
+        'check_out_date': str(check_in_date + timedelta(days=nights)),
+        'check_out_time': '11:00',
+        'payment_method': 'cash',
+        'amount_ghs': '200',
+        'cash_amount': '200',
+        'momo_amount': '0',
+    }
+    data.update(extra)
+    return data
+
+
+def create_bookings(client, rooms, start=date(2030, 1, 1), **extra):
+    """One booking per room through the API; returns their ids"""
+    ids = []
+    for room in rooms:
+        response = client.post('/api/bookings/', booking_data(room, start, **extra), format='json')
+        assert response.status_code == 201, response.data
+        ids.append(response.data['id'])
+    return ids
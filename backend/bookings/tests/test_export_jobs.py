@@ -0,0 +1,42 @@
+"""Export job requests"""
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from ..models import ExportJob
+from .helpers import api_client, make_user
+
+
+@override_settings(EXPORT_JOB_WORKERS=0)
+class ExportJobFilterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = make_user('manager', role='manager')
+
+    def setUp(self):
+        self.client = api_client(self.manager)
+
+    def request_export(self, kind, filters):
+        return self.client.post(
+            '/api/export-jobs/', {'kind': kind, 'export_format': 'csv', 'filters': filters}, format='json'
+        )
+
+    def test_malformed_filters_are_rejected(self):
+        for kind, filters in [
+            ('booking_versions', {'booking': 'abc'}),
+            ('room_issues', {'room': '-1'}),
+            ('room_issues', {'status': 'lost'}),
+            ('bookings', {'check_in_date': '2030-13-01'}),
+            ('bookings', {'include_deleted': 'maybe'}),
+        ]:
+            with self.subTest(kind=kind, filters=filters):
+                response = self.request_export(kind, filters)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(filters)), response.data['error'])
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_filters_are_stored_in_canonical_form(self):
+        response = self.request_export('bookings', {'check_in_date': '2030-01-01', 'include_deleted': True})
+        self.assertEqual(response.status_code, 202, response.data)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.filters, {'check_in_date': '2030-01-01', 'include_deleted': 'true'})
@@ -0,0 +1,68 @@
+"""Idempotency-Key claims, replays and what is not replayed"""
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import bulk
+from ..idempotency import REPLAYED_HEADER, _fingerprint
+from ..models import Booking, IdempotencyKey
+from .helpers import api_client, booking_data, make_rooms, make_user
+
+
+@override_settings(IDEMPOTENCY_LEASE_SECONDS=60)
+class IdempotencyTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = make_user('manager', role='manager')
+        cls.rooms = make_rooms(2)
+
+    def setUp(self):
+        self.client = api_client(self.manager)
+
+    def post(self, url, data, key):
+        return self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_stored_response(self):
+        data = booking_data(self.rooms[0], date(2030, 1, 1))
+        first = self.post('/api/bookings/', data, 'key-1')
+        retry = self.post('/api/bookings/', data, 'key-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry[REPLAYED_HEADER], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_bulk_response_with_retryable_items_is_not_stored(self):
+        items = [booking_data(self.rooms[0], date(2030, 1, 1))]
+        conflict = [{'index': 0, 'status': status.HTTP_409_CONFLICT, 'errors': {}}]
+        with mock.patch.object(bulk, 'create_bookings', return_value=conflict):
+            first = self.post('/api/bookings/bulk/', items, 'batch-1')
+        self.assertEqual(first.data['results'][0]['status'], status.HTTP_409_CONFLICT)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        retry = self.post('/api/bookings/bulk/', items, 'batch-1')
+        self.assertNotIn(REPLAYED_HEADER, retry)
+        self.assertEqual(retry.data['results'][0]['status'], status.HTTP_201_CREATED)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_unfinished_claim_blocks_retry_until_lease_expires(self):
+        data = booking_data(self.rooms[1], date(2030, 1, 1))
+        # As left behind by a worker that died mid-request
+        request = SimpleNamespace(method='POST', path='/api/bookings/', data=data)
+        record = IdempotencyKey.objects.create(
+            user=self.manager, key='key-2', method='POST', path='/api/bookings/', fingerprint=_fingerprint(request),
+        )
+
+        in_progress = self.post('/api/bookings/', data, 'key-2')
+        self.assertEqual(in_progress.status_code, status.HTTP_409_CONFLICT)
+
+        IdempotencyKey.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(seconds=61))
+        retry = self.post('/api/bookings/', data, 'key-2')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.get(key='key-2').status_code, status.HTTP_201_CREATED)
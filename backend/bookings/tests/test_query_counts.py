@@ -0,0 +1,125 @@
+"""
+Query budgets for the list and detail endpoints.
+
+Each test measures an endpoint with a little data, adds more rows of the
+kind it serializes, and expects exactly the same number of queries, so an
+N+1 regression fails here instead of in production.
+"""
+from datetime import date
+
+from rest_framework.test import APITestCase
+
+from ..models import RoomIssue
+from .helpers import api_client, create_bookings, make_rooms, make_user
+
+
+class QueryBudgetTestCase(APITestCase):
+
+    def assertQueryBudget(self, budget, client, url):
+        with self.assertNumQueries(budget):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return response
+
+
+class BookingQueryCountTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = make_user('manager', role='manager')
+        cls.receptionist = make_user('receptionist', role='receptionist')
+        cls.rooms = make_rooms(8)
+
+    def setUp(self):
+        self.client = api_client(self.manager)
+
+    def test_list_is_constant(self):
+        create_bookings(self.client, self.rooms[:2])
+        response = self.assertQueryBudget(1, self.client, '/api/bookings/')
+        self.assertEqual(len(response.data), 2)
+
+        create_bookings(self.client, self.rooms[2:])
+        response = self.assertQueryBudget(1, self.client, '/api/bookings/')
+        self.assertEqual(len(response.data), 8)
+
+    def test_paginated_list_is_constant(self):
+        create_bookings(self.client, self.rooms)
+        response = self.assertQueryBudget(1, self.client, '/api/bookings/?page_size=3')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertQueryBudget(1, self.client, response.data['next'])
+
+    def test_receptionist_list_is_constant(self):
+        receptionist = api_client(self.receptionist)
+        create_bookings(receptionist, self.rooms[:2])
+        self.assertQueryBudget(1, receptionist, '/api/bookings/')
+
+        create_bookings(receptionist, self.rooms[2:])
+        response = self.assertQueryBudget(1, receptionist, '/api/bookings/')
+        self.assertEqual(len(response.data), 8)
+
+    def test_retrieve_is_constant(self):
+        booking_id = create_bookings(self.client, self.rooms[:1])[0]
+        self.assertQueryBudget(1, self.client, f'/api/bookings/{booking_id}/')
+
+    def test_retrieve_with_versions_is_constant(self):
+        booking_id = create_bookings(self.client, self.rooms[:1])[0]
+        url = f'/api/bookings/{booking_id}/?expand=versions'
+        self.assertQueryBudget(2, self.client, url)
+
+        for nights in range(3, 8):
+            response = self.client.patch(
+                f'/api/bookings/{booking_id}/',
+                {'check_out_date': str(date(2030, 1, 1 + nights))},
+                format='json',
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+        response = self.assertQueryBudget(2, self.client, url)
+        self.assertEqual(len(response.data['versions']), 6)
+
+
+class RoomQueryCountTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = make_user('manager', role='manager')
+        cls.rooms = make_rooms(3)
+
+    def setUp(self):
+        self.client = api_client(self.manager)
+
+    def test_available_is_constant(self):
+        url = '/api/rooms/available/?check_in_date=2030-01-01&check_out_date=2030-01-03'
+        create_bookings(self.client, self.rooms[:1])
+        self.assertQueryBudget(1, self.client, url)
+
+        make_rooms(5, room_type='short_stay_1_3_ac')
+        response = self.assertQueryBudget(1, self.client, url)
+        self.assertEqual(len(response.data), 7)
+
+    def test_status_board_is_constant(self):
+        create_bookings(self.client, self.rooms[:1])
+        self.assertQueryBudget(2, self.client, '/api/rooms/status/?date=2030-01-01')
+
+        create_bookings(self.client, self.rooms[1:])
+        make_rooms(5, room_type='short_stay_1_3_ac')
+        response = self.assertQueryBudget(2, self.client, '/api/rooms/status/?date=2030-01-01')
+        self.assertEqual(sum(room['is_booked'] for room in response.data), 3)
+
+    def test_status_board_range_is_constant(self):
+        create_bookings(self.client, self.rooms)
+        response = self.assertQueryBudget(2, self.client, '/api/rooms/status/?from=2030-01-01&to=2030-01-31')
+        self.assertEqual(len(response.data), 31)
+
+    def test_issue_list_is_constant(self):
+        def report(room):
+            RoomIssue.objects.create(
+                room=room, title='Broken tap', description='Drips', reported_by=self.manager
+            )
+
+        report(self.rooms[0])
+        self.assertQueryBudget(1, self.client, '/api/room-issues/')
+
+        for room in self.rooms:
+            report(room)
+        response = self.assertQueryBudget(1, self.client, '/api/room-issues/')
+        self.assertEqual(len(response.data), 4)
@@ -0,0 +1,46 @@
+"""Guest search paging"""
+from datetime import date
+
+from rest_framework.test import APITestCase
+
+from .helpers import api_client, create_bookings, make_rooms, make_user
+
+
+class SearchPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = make_user('manager', role='manager')
+        cls.rooms = make_rooms(7)
+
+    def setUp(self):
+        self.client = api_client(self.manager)
+        # Same name, so every booking has the same rank
+        self.ids = create_bookings(self.client, self.rooms, start=date(2030, 1, 1), name='Ama Owusu')
+
+    def walk(self, url, link):
+        """The pages from url on, following link; and the last response"""
+        pages = []
+        while True:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data['results'])
+            if not response.data[link]:
+                return pages, response
+            url = response.data[link]
+
+    def test_pages_cover_tied_ranks_once(self):
+        pages, _ = self.walk('/api/bookings/search/?q=Ama Owusu&page_size=2', 'next')
+        results = [item for page in pages for item in page]
+
+        self.assertEqual(len({item['rank'] for item in results}), 1)
+        self.assertEqual([item['id'] for item in results], sorted(self.ids, reverse=True))
+        self.assertEqual(len(pages), 4)
+
+    def test_previous_links_walk_back_over_tied_ranks(self):
+        _, last = self.walk('/api/bookings/search/?q=Ama Owusu&page_size=2', 'next')
+        pages, _ = self.walk(last.data['previous'], 'previous')
+        ids = [item['id'] for page in reversed(pages) for item in page]
+
+        # Everything before the last page, in order
+        self.assertEqual(ids, sorted(self.ids, reverse=True)[:-1])
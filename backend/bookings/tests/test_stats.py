@@ -0,0 +1,33 @@
+"""Dashboard statistics cache invalidation"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import stats
+from .helpers import make_rooms
+
+
+class StatsInvalidationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin_key = f'{stats.ADMIN_STATS_CACHE_KEY}:{timezone.now().date()}'
+
+    def test_cached_admin_stats_are_dropped_when_the_write_commits(self):
+        stats.admin_index_stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_rooms(1)
+            # Still uncommitted: a reader now would cache the old figures again
+            self.assertIsNotNone(cache.get(self.admin_key))
+
+        self.assertIsNone(cache.get(self.admin_key))
+
+    def test_cached_issue_summary_is_dropped_when_the_write_commits(self):
+        stats.room_issue_summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_rooms(1)
+            self.assertIsNotNone(cache.get(stats.ISSUE_SUMMARY_CACHE_KEY))
+
+        self.assertIsNone(cache.get(stats.ISSUE_SUMMARY_CACHE_KEY))
@@ -0,0 +1,62 @@
+"""Delta sync watermarks and tombstone retention"""
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .. import sync
+from ..models import Tombstone
+from .helpers import api_client, make_rooms, make_user
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0, SYNC_TOMBSTONE_RETENTION_DAYS=30)
+class TombstoneRetentionTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = make_user('manager', role='manager')
+
+    def setUp(self):
+        self.client = api_client(self.manager)
+        self.rooms = make_rooms(3)
+
+    def sync(self, since=None):
+        params = {'since': since} if since else {}
+        response = self.client.get('/api/rooms/changes/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_recent_watermark_receives_deletes(self):
+        watermark = self.sync()['watermark']
+        deleted = self.rooms[0].pk
+        self.rooms[0].delete()
+
+        data = self.sync(watermark)
+        self.assertFalse(data['full_resync'])
+        self.assertEqual(data['removed'], [deleted])
+
+    def test_watermark_older_than_retention_gets_full_resync(self):
+        stale = timezone.now() - timedelta(days=31)
+        watermark = sync.encode_watermark((stale, 0), (stale, 0))
+
+        data = self.sync(watermark)
+        self.assertTrue(data['full_resync'])
+        self.assertEqual(data['removed'], [])
+        self.assertEqual({room['id'] for room in data['results']}, {room.pk for room in self.rooms})
+
+        # The snapshot's watermark is current again
+        self.assertFalse(self.sync(data['watermark'])['full_resync'])
+
+    def test_watermark_advances_without_deletes(self):
+        first = self.sync()['watermark']
+        second = self.sync(first)['watermark']
+        self.assertGreater(sync.decode_watermark(second)[1], sync.decode_watermark(first)[1])
+
+    def test_prune_keeps_tombstones_inside_retention(self):
+        old = Tombstone.objects.create(kind='room', object_id=1)
+        recent = Tombstone.objects.create(kind='room', object_id=2)
+        Tombstone.objects.filter(pk=old.pk).update(deleted_at=timezone.now() - timedelta(days=31))
+
+        self.assertEqual(sync.prune(), 1)
+        self.assertEqual(list(Tombstone.objects.values_list('pk', flat=True)), [recent.pk])
@@ -0,0 +1,39 @@
+"""Booking version snapshots"""
+from datetime import date
+
+from rest_framework.test import APITestCase
+
+from ..models import Booking
+from ..serializers import booking_version_data, changed_fields
+from ..versioning import reconstruct
+from .helpers import api_client, booking_data, create_bookings, make_rooms, make_user
+
+
+class FirstVersionTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = make_user('manager', role='manager')
+        cls.rooms = make_rooms(2)
+
+    def setUp(self):
+        self.client = api_client(self.manager)
+
+    def assertAuthorizationIsAChange(self, booking):
+        first = reconstruct(booking.versions.get())
+        self.assertEqual(first, booking_version_data(booking))
+
+        booking.is_authorized = True
+        booking.authorized_by = 'manager'
+        self.assertIn('is_authorized', changed_fields(first, booking_version_data(booking)))
+
+    def test_created_booking_records_full_snapshot(self):
+        booking_id = create_bookings(self.client, self.rooms[:1])[0]
+        self.assertAuthorizationIsAChange(Booking.objects.get(pk=booking_id))
+
+    def test_bulk_created_booking_records_full_snapshot(self):
+        response = self.client.post(
+            '/api/bookings/bulk/', [booking_data(self.rooms[1], date(2030, 1, 1))], format='json'
+        )
+        booking_id = response.data['results'][0]['booking']['id']
+        self.assertAuthorizationIsAChange(Booking.objects.get(pk=booking_id))
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .serializers import CustomTokenObtainPairSerializer
-from .views import BookingViewSet, UserViewSet, RoomViewSet, RoomIssueViewSet, NotificationViewSet
+from .views import BookingViewSet, UserViewSet, RoomViewSet, RoomIssueViewSet, NotificationViewSet, ExportJobViewSet
 from . import views
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'users', UserViewSet, basename='user')
 router.register(r'rooms', RoomViewSet, basename='room')
 router.register(r'room-issues', RoomIssueViewSet, basename='room-issue')
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'export-jobs', ExportJobViewSet, basename='export-job')
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
@@ -19,5 +20,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('events/', views.event_stream, name='event-stream'),
+    path('events/ticket/', views.event_stream_ticket, name='event-stream-ticket'),
 ]
 
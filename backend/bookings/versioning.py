@@ -0,0 +1,187 @@
+"""
+Delta-encoded booking version history.
+
+A BookingVersion either holds the full booking data (a snapshot) or only the
+fields that changed since the previous version of the same booking. A full
+snapshot is written every BOOKING_VERSION_SNAPSHOT_INTERVAL versions, so
+rebuilding any version reads at most that many rows.
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Booking, BookingVersion
+
+
+def snapshot_interval():
+    return max(1, getattr(settings, 'BOOKING_VERSION_SNAPSHOT_INTERVAL', 10))
+
+
+def diff_state(old_state, new_state):
+    """Changed or added fields of new_state, and the fields it no longer has"""
+    changes = {
+        key: value for key, value in new_state.items()
+        if key not in old_state or old_state[key] != value
+    }
+    removed = sorted(key for key in old_state if key not in new_state)
+    return changes, removed
+
+
+def apply_delta(state, version):
+    """The full data of version given the full data of the version before it"""
+    if version.is_snapshot:
+        return dict(version.version_data)
+    state = dict(state)
+    state.update(version.version_data)
+    for key in version.removed_fields:
+        state.pop(key, None)
+    return state
+
+
+def record_version(booking, state, edited_by=None, is_manager_edit=False):
+    """
+    Append a version holding state to the booking's history.
+    
+    Must run inside a transaction; the booking row is locked so concurrent
+    edits get consecutive sequence numbers.
+    """
+    list(Booking.objects.select_for_update().filter(pk=booking.pk).values_list('pk'))
+    
+    chain = _latest_chain(booking.pk)
+    sequence = chain[-1].sequence + 1 if chain else 1
+    
+    if not chain or (sequence - 1) % snapshot_interval() == 0:
+        version_data, removed, is_snapshot = state, [], True
+    else:
+        previous_state = replay(chain)
+        version_data, removed = diff_state(previous_state, state)
+        is_snapshot = False
+    
+    return BookingVersion.objects.create(
+        booking=booking,
+        sequence=sequence,
+        version_data=version_data,
+        removed_fields=removed,
+        is_snapshot=is_snapshot,
+        edited_by=edited_by,
+        is_manager_edit=is_manager_edit,
+    )
+
+
+def record_first_versions(states, edited_by=None):
+    """
+    First versions of newly created bookings, in one insert.
+    
+    states is [(booking, state)]; new bookings have no history to lock or
+    diff against, so each version is a sequence 1 snapshot.
+    """
+    return BookingVersion.objects.bulk_create([
+        BookingVersion(
+            booking=booking,
+            sequence=1,
+            version_data=state,
+            removed_fields=[],
+            is_snapshot=True,
+            edited_by=edited_by,
+        )
+        for booking, state in states
+    ])
+
+
+def replay(chain):
+    """Full data of the last version in chain, which must start at a snapshot"""
+    state = {}
+    for version in chain:
+        state = apply_delta(state, version)
+    return state
+
+
+def reconstruct(version):
+    """Full booking data of a single version"""
+    attach_states([version])
+    return version.state
+
+
+def attach_states(versions):
+    """
+    Set .state to the full booking data on each of the given versions.
+    
+    Versions whose chain back to a snapshot is already among the given
+    versions are resolved in memory; the rest cost two queries in total
+    however many bookings they belong to.
+    """
+    versions = list(versions)
+    by_booking = {}
+    for version in versions:
+        by_booking.setdefault(version.booking_id, []).append(version)
+    
+    missing = {}
+    for booking_id, booking_versions in by_booking.items():
+        booking_versions.sort(key=lambda version: version.sequence)
+        if not _resolve(booking_versions, booking_versions):
+            missing[booking_id] = booking_versions
+    
+    if missing:
+        _resolve_from_db(missing)
+    return versions
+
+
+def _resolve(chain, targets):
+    """Replay chain onto targets if it is complete from a snapshot; returns success"""
+    if not chain or not chain[0].is_snapshot:
+        return False
+    if any(later.sequence != earlier.sequence + 1 for earlier, later in zip(chain, chain[1:])):
+        return False
+    
+    states = {}
+    state = {}
+    for version in chain:
+        state = apply_delta(state, version)
+        states[version.sequence] = state
+    for version in targets:
+        version.state = states[version.sequence]
+    return True
+
+
+def _resolve_from_db(missing):
+    # Nearest snapshot at or before the oldest requested version of each booking
+    floors = {}
+    snapshots = BookingVersion.objects.filter(
+        booking_id__in=list(missing), is_snapshot=True
+    ).values_list('booking_id', 'sequence')
+    for booking_id, sequence in snapshots:
+        lowest = missing[booking_id][0].sequence
+        if sequence <= lowest and sequence > floors.get(booking_id, 0):
+            floors[booking_id] = sequence
+    
+    ranges = Q(pk__in=[])
+    for booking_id, booking_versions in missing.items():
+        ranges |= Q(
+            booking_id=booking_id,
+            sequence__gte=floors.get(booking_id, 0),
+            sequence__lte=booking_versions[-1].sequence,
+        )
+    
+    chains = {}
+    rows = BookingVersion.objects.filter(ranges).only(
+        'booking_id', 'sequence', 'version_data', 'removed_fields', 'is_snapshot'
+    ).order_by('booking_id', 'sequence')
+    for version in rows:
+        chains.setdefault(version.booking_id, []).append(version)
+    
+    for booking_id, booking_versions in missing.items():
+        if not _resolve(chains.get(booking_id, []), booking_versions):
+            # Broken history: fall back to whatever the row itself holds
+            for version in booking_versions:
+                version.state = dict(version.version_data)
+
+
+def _latest_chain(booking_id):
+    """Versions of a booking from its latest snapshot onwards, oldest first"""
+    latest_snapshot = BookingVersion.objects.filter(
+        booking_id=OuterRef('booking_id'), is_snapshot=True
+    ).order_by('-sequence').values('sequence')[:1]
+    return list(
+        BookingVersion.objects.filter(
+            booking_id=booking_id, sequence__gte=Subquery(latest_snapshot)
+        ).order_by('sequence')
+    )
@@ -1,62 +1,73 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum
-from django.db import models
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Prefetch, Q, Sum
+from django.db import models, transaction, IntegrityError
 from django.utils import timezone
-from datetime import date
-from .models import Booking, User, Room, RoomIssue, Notification
+from datetime import date, timedelta
+import asyncio
+import hashlib
+import json
+import os
+import time
+from .models import (
+    Booking, BookingVersion, User, Room, RoomIssue, Notification, NotificationReadState, ExportJob,
+    DailyRevenueRollup,
+)
 from .serializers import (
     BookingSerializer, BookingListSerializer, UserSerializer, ChangePasswordSerializer,
     SetPasswordSerializer,
     RoomSerializer, RoomAvailabilitySerializer, RoomIssueSerializer,
-    NotificationSerializer,
+    NotificationSerializer, ExportJobSerializer, is_room_conflict,
 )
 from .permissions import IsManagerOrReadOnly, IsManager
+from .idempotency import idempotent
+from . import analytics, bulk, events, rollups, search, sync
+from .stats import room_issue_summary
+from .filters import filter_bookings, filter_room_issues
+from .pagination import KeysetPagination, BookingVersionPagination, SearchPagination
+from .exports import (
+    BookingExport, BookingVersionExport, RoomIssueExport, EXPORT_RENDERERS,
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES,
+)
+from .availability import (
+    find_available_rooms, room_status_board, occupancy_calendar, occupancy_runs,
+)
+
+# Export actions also accept ?format=xlsx|csv|ndjson
+EXPORT_ACTION_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, *EXPORT_RENDERERS]
+
+# Largest revenue report, in buckets; longer ranges need a coarser granularity
+REVENUE_REPORT_MAX_BUCKETS = 1000
 
 
 class BookingViewSet(viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        user = self.request.user
-        queryset = Booking.objects.filter(is_original=True)
-        
-        # Filter by check-in date if provided
-        check_in_date = self.request.query_params.get('check_in_date', None)
-        if check_in_date:
-            try:
-                queryset = queryset.filter(check_in_date=check_in_date)
-            except ValueError:
-                pass
-        
-        # Receptionist sees authorized bookings and their own pending bookings
-        # Rejected bookings are hidden from receptionists
-        if user.is_receptionist():
-            queryset = queryset.filter(
-                models.Q(status='authorized') | 
-                (models.Q(status='pending') & models.Q(booked_by=user))
-            )
-        
-        # Exclude soft-deleted bookings by default (unless manager explicitly requests them)
-        include_deleted = self.request.query_params.get('include_deleted', 'false').lower() == 'true'
-        if not include_deleted or user.is_receptionist():
-            queryset = queryset.filter(deleted_at__isnull=True)
-        
-        return queryset.order_by('-created_at')
+        return filter_bookings(self._base_queryset(), self.request.user, self.request.query_params)
     
     def get_object(self):
         """Override to allow fetching deleted bookings when needed"""
         # For restore action, we MUST include deleted bookings
         if self.action == 'restore':
             # Get all bookings including deleted ones for restore
-            queryset = Booking.objects.filter(is_original=True)
+            queryset = self._base_queryset()
             # No filtering by deleted_at - we need to find deleted bookings
         # For versions and export_versions actions, include deleted bookings
         elif self.action in ['versions', 'export_versions_excel']:
-            queryset = Booking.objects.filter(is_original=True)
+            queryset = self._base_queryset()
             if self.request.user.is_receptionist():
                 queryset = queryset.filter(
                     models.Q(status='authorized') | 
@@ -64,7 +75,7 @@ class BookingViewSet(viewsets.ModelViewSet):
                 )
         # For retrieve action, check if include_deleted is requested
         elif self.action == 'retrieve' and self.request.query_params.get('include_deleted', 'false').lower() == 'true':
-            queryset = Booking.objects.filter(is_original=True)
+            queryset = self._base_queryset()
             # Don't filter by deleted_at when include_deleted=true
             if self.request.user.is_receptionist():
                 queryset = queryset.filter(
@@ -88,8 +99,32 @@ class BookingViewSet(viewsets.ModelViewSet):
         self.check_object_permissions(self.request, obj)
         return obj
     
+    def _base_queryset(self):
+        """Original bookings with the joins and prefetches the current action serializes"""
+        queryset = Booking.objects.filter(is_original=True)
+        
+        if self.action in ['list', 'changes', 'search']:
+            # BookingListSerializer only dereferences booked_by
+            return queryset.select_related('booked_by')
+        if self.action == 'export_excel':
+            # BookingExport joins the relations its columns read
+            return queryset
+        if self.action == 'versions':
+            # The newest version is compared against the booking's current state
+            return queryset.select_related('booked_by', 'last_edited_by')
+        if self.action in ['export_versions_excel', 'daily_totals', 'revenue_report']:
+            return queryset
+        
+        # Detail responses serialize the full BookingSerializer
+        queryset = queryset.select_related('booked_by', 'last_edited_by', 'room')
+        if BookingSerializer.expands_versions(self.request):
+            queryset = queryset.prefetch_related(
+                Prefetch('versions', queryset=BookingVersion.objects.select_related('edited_by'))
+            )
+        return queryset
+    
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'changes', 'search']:
             return BookingListSerializer
         return BookingSerializer
     
@@ -102,6 +137,10 @@ class BookingViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAuthenticated()]
     
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         serializer.save(booked_by=self.request.user)
     
@@ -109,6 +148,20 @@ class BookingViewSet(viewsets.ModelViewSet):
         # The update logic is handled in the serializer
         serializer.save()
     
+    def _save_or_conflict(self, booking):
+        """Save a booking, returning an error response if its room is taken for those dates"""
+        try:
+            with transaction.atomic():
+                booking.save()
+        except IntegrityError as e:
+            if not is_room_conflict(e):
+                raise
+            return Response(
+                {"detail": "This room is already booked for the selected dates."},
+                status=status.HTTP_409_CONFLICT
+            )
+        return None
+    
     def perform_destroy(self, instance):
         # Only manager can delete (soft delete)
         if not self.request.user.is_manager():
@@ -121,11 +174,17 @@ class BookingViewSet(viewsets.ModelViewSet):
         from django.utils import timezone
         instance.deleted_at = timezone.now()
         instance.deleted_by = self.request.user
-        instance.save()
+        with transaction.atomic():
+            instance.save()
     
     @action(detail=True, methods=['get'])
     def versions(self, request, pk=None):
-        """Get all versions of a booking (manager only)"""
+        """
+        Paginated version history of a booking (manager only).
+        
+        Each version is summarised as who edited, when and which fields the
+        edit changed; pass ?full=true for the complete snapshots.
+        """
         if not request.user.is_manager():
             return Response(
                 {"detail": "Only managers can view booking versions."},
@@ -133,111 +192,149 @@ class BookingViewSet(viewsets.ModelViewSet):
             )
         
         booking = self.get_object()
-        versions = booking.versions.all()
+        versions = booking.versions.select_related('edited_by')
         
-        from .serializers import BookingVersionSerializer
-        serializer = BookingVersionSerializer(versions, many=True)
-        return Response(serializer.data)
+        paginator = BookingVersionPagination()
+        page = paginator.paginate_queryset(versions, request, view=self)
+        
+        from .serializers import BookingVersionSerializer, BookingVersionSummarySerializer
+        if request.query_params.get('full', 'false').lower() == 'true':
+            serializer = BookingVersionSerializer(page, many=True)
+        else:
+            self._attach_changed_fields(booking, page)
+            serializer = BookingVersionSummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
-    @action(detail=True, methods=['get'])
+    def _attach_changed_fields(self, booking, page):
+        """
+        Set changed_fields on each version of a newest-first page.
+        
+        A version holds the booking as it was before that edit, so the edit's
+        changes are the difference to the next newer version, or to the
+        booking itself for the latest one.
+        """
+        from .serializers import booking_version_data, changed_fields
+        from .versioning import attach_states
+        
+        if not page:
+            return
+        newest = page[0]
+        newer = booking.versions.filter(
+            models.Q(edited_at__gt=newest.edited_at)
+            | models.Q(edited_at=newest.edited_at, id__gt=newest.id)
+        ).order_by('edited_at', 'id').first()
+        attach_states(page + [newer] if newer else page)
+        newer_data = newer.state if newer else booking_version_data(booking)
+        
+        for version in page:
+            version.changed_fields = changed_fields(version.state, newer_data)
+            newer_data = version.state
+    
+    @action(detail=True, methods=['get'], renderer_classes=EXPORT_ACTION_RENDERERS)
     def export_versions_excel(self, request, pk=None):
-        """Export booking versions to Excel file (manager only)"""
+        """Export booking versions as Excel, or ?format=csv / ndjson (manager only)"""
         if not request.user.is_manager():
             return Response(
                 {"detail": "Only managers can export booking versions."},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from django.http import HttpResponse
-        from django.utils import timezone
-        import json
-        
         booking = self.get_object()
-        versions = booking.versions.all()
-        
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Booking Versions"
-        
-        # Headers
-        headers = [
-            'Version ID', 'Booking ID', 'Guest Name', 'Room Number',
-            'Edited By', 'Edited At', 'Is Manager Edit', 'Version Data (JSON)'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, version in enumerate(versions, 2):
-            version_data = version.version_data
-            ws.cell(row=row_num, column=1, value=version.id)
-            ws.cell(row=row_num, column=2, value=booking.id)
-            ws.cell(row=row_num, column=3, value=version_data.get('name', ''))
-            ws.cell(row=row_num, column=4, value=version_data.get('room_no', ''))
-            ws.cell(row=row_num, column=5, value=version.edited_by.username if version.edited_by else '')
-            ws.cell(row=row_num, column=6, value=version.edited_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=7, value='Yes' if version.is_manager_edit else 'No')
-            ws.cell(row=row_num, column=8, value=json.dumps(version_data, indent=2))
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return BookingVersionExport().from_request(
+            request, booking.versions.all(), filename=f"booking_versions_{booking.id}"
         )
-        filename = f"booking_versions_{booking.id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Find bookings by guest name (typos allowed), telephone/ID or room,
+        best match first, in pages of ?page_size= (default 20) with
+        ?cursor= links. Same visibility rules as the booking list.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {"error": "q parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        wb.save(response)
-        return response
+        bookings = filter_bookings(self._base_queryset(), request.user, request.query_params)
+        paginator = SearchPagination()
+        with transaction.atomic():
+            search.set_threshold()
+            page = paginator.paginate_queryset(search.ranked(bookings, query), request, view=self)
+        
+        data = self.get_serializer(page, many=True).data
+        for item, booking in zip(data, page):
+            item['rank'] = round(booking.rank, 3)
+        return paginator.get_paginated_response(data)
+    
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk(self, request):
+        """
+        Create several bookings at once, e.g. those queued while offline.
+        
+        Takes a JSON array of bookings (or {"bookings": [...]}) and returns
+        one result per item, in order, with the status and body a single
+        POST of that item would have got. Items that fail validation or
+        would double-book a room, including against earlier items in the
+        same batch, are skipped; the rest are created together. If another
+        booking takes a room while the batch is written, no item is created
+        and the accepted ones come back with 409 so they can be resent.
+        """
+        items = request.data.get('bookings') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Expected a non-empty list of bookings"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > bulk.MAX_ITEMS:
+            return Response(
+                {"error": f"At most {bulk.MAX_ITEMS} bookings can be submitted at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not all(isinstance(item, dict) for item in items):
+            return Response(
+                {"error": "Each booking must be an object"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = bulk.create_bookings(items, request.user, request=request)
+        created = sum(1 for result in results if result['status'] == status.HTTP_201_CREATED)
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Bookings created, edited or deleted since ?since=<watermark>, in list
+        form, with a new watermark; without since, a full snapshot in pages
+        of ?limit= rows. Bookings the user can no longer see (deleted, or
+        rejected for receptionists) come back in removed.
+        """
+        visible = models.Q(deleted_at__isnull=True)
+        if request.user.is_receptionist():
+            visible &= models.Q(status='authorized') | models.Q(status='pending', booked_by=request.user)
+        return sync.changes_response(self, self._base_queryset(), 'booking', visible=visible)
     
     @action(detail=False, methods=['get'])
     def daily_totals(self, request):
         """Get daily totals for bookings or total if no date provided"""
         target_date = request.query_params.get('date', None)
-        user = request.user
         
-        # Base queryset - exclude soft-deleted bookings and only authorized
-        bookings = Booking.objects.filter(
-            is_original=True,
-            deleted_at__isnull=True,
-            status='authorized'
-        )
-        
-        # Apply role-based filtering
-        if user.is_receptionist():
-            # Receptionists see all authorized bookings (already filtered above)
-            pass
-        # Managers see all authorized bookings
+        # Authorized, non-deleted bookings are the same for both roles, so
+        # both read the precomputed daily rollup
+        rows = DailyRevenueRollup.objects.all()
         
         # If date is provided, filter by that date
         if target_date:
             try:
                 target_date = date.fromisoformat(target_date)
-                bookings = bookings.filter(check_in_date=target_date)
+                rows = rows.filter(date=target_date)
             except ValueError:
                 return Response(
                     {"error": "Invalid date format. Use YYYY-MM-DD."},
@@ -247,20 +344,65 @@ class BookingViewSet(viewsets.ModelViewSet):
             # No date filter - return total for all bookings
             target_date = None
         
-        total_amount = bookings.aggregate(total=Sum('amount_ghs'))['total'] or 0
-        total_bookings = bookings.count()
-        
-        response_data = {
-            'total_bookings': total_bookings,
-            'total_amount_ghs': float(total_amount)
-        }
+        response_data = rollups.summary(rollups.totals(rows))
         
         if target_date:
             response_data['date'] = target_date
         
         return Response(response_data)
     
+    @action(detail=False, methods=['get'], url_path='revenue-report')
+    def revenue_report(self, request):
+        """
+        Revenue per day, week or month between ?from= and ?to= (inclusive),
+        with every bucket present even when nothing was booked.
+        """
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in rollups.GRANULARITIES:
+            return Response(
+                {"error": "granularity must be one of: day, week, month."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            end = request.query_params.get('to')
+            end = date.fromisoformat(end) if end else timezone.now().date()
+            start = request.query_params.get('from')
+            # Defaults to the last 30 days
+            start = date.fromisoformat(start) if start else end - timedelta(days=30)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {"error": "'from' must not be after 'to'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        buckets = rollups.report(start, end, granularity)
+        if len(buckets) > REVENUE_REPORT_MAX_BUCKETS:
+            return Response(
+                {"error": f"Too many {granularity}s in range (max {REVENUE_REPORT_MAX_BUCKETS}). Use a coarser granularity."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        totals = dict.fromkeys(rollups.COLUMNS, 0)
+        for _, values in buckets:
+            for column in rollups.COLUMNS:
+                totals[column] += values[column]
+        
+        return Response({
+            'from': start,
+            'to': end,
+            'granularity': granularity,
+            'totals': rollups.summary(totals),
+            'buckets': [{'period': period, **rollups.summary(values)} for period, values in buckets],
+        })
+    
     @action(detail=True, methods=['post'])
+    @idempotent
     def authorize(self, request, pk=None):
         """Authorize a booking (manager only)"""
         if not request.user.is_manager():
@@ -277,12 +419,15 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking.authorized_by = authorized_by
         booking.rejected_by = ''  # Clear rejection if previously rejected
         booking.rejection_reason = ''  # Clear rejection reason
-        booking.save()
+        conflict = self._save_or_conflict(booking)
+        if conflict:
+            return conflict
         
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def reject(self, request, pk=None):
         """Reject a booking (manager only)"""
         if not request.user.is_manager():
@@ -300,12 +445,15 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking.rejected_by = rejected_by
         booking.rejection_reason = rejection_reason
         booking.authorized_by = ''  # Clear authorization if previously authorized
-        booking.save()
+        # Rolls back with the derived data (revenue rollup, versions) if those fail
+        with transaction.atomic():
+            booking.save()
         
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def restore(self, request, pk=None):
         """Restore a soft-deleted booking (manager only, within 30 days)"""
         if not request.user.is_manager():
@@ -331,98 +479,18 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         booking.deleted_at = None
         booking.deleted_by = None
-        booking.save()
+        conflict = self._save_or_conflict(booking)
+        if conflict:
+            return conflict
         
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
     
-    @action(detail=False, methods=['get'], url_path='export-excel')
+    @action(detail=False, methods=['get'], url_path='export-excel', renderer_classes=EXPORT_ACTION_RENDERERS)
     def export_excel(self, request):
-        """Export bookings to Excel file"""
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
+        """Export bookings as Excel, or ?format=csv / ndjson (optionally &compress=gzip)"""
         # Get bookings based on user role
-        queryset = self.get_queryset()
-        
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Bookings"
-        
-        # Headers
-        headers = [
-            'ID', 'Guest Name', 'Phone Number', 'Address/Location', 'Age',
-            'Room Number', 'Room Type', 'Check-in Date', 'Check-in Time',
-            'Check-out Date', 'Check-out Time', 'Payment Method',
-            'Amount (GHS)', 'Cash Amount', 'MoMo Amount', 'MoMo Network',
-            'MoMo Number', 'Booked By', 'Created At', 'Last Edited By',
-            'Updated At', 'Authorized/Rejected By', 'Status', 'Rejection Reason', 'Version Number'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, booking in enumerate(queryset, 2):
-            ws.cell(row=row_num, column=1, value=booking.id)
-            ws.cell(row=row_num, column=2, value=booking.name)
-            ws.cell(row=row_num, column=3, value=booking.id_or_telephone)
-            ws.cell(row=row_num, column=4, value=booking.address_location)
-            ws.cell(row=row_num, column=5, value=booking.age)
-            ws.cell(row=row_num, column=6, value=booking.room_no)
-            ws.cell(row=row_num, column=7, value=booking.room.get_room_type_display() if booking.room else 'N/A')
-            ws.cell(row=row_num, column=8, value=str(booking.check_in_date))
-            ws.cell(row=row_num, column=9, value=str(booking.check_in_time))
-            ws.cell(row=row_num, column=10, value=str(booking.check_out_date) if booking.check_out_date else '')
-            ws.cell(row=row_num, column=11, value=str(booking.check_out_time) if booking.check_out_time else '')
-            ws.cell(row=row_num, column=12, value=booking.get_payment_method_display())
-            ws.cell(row=row_num, column=13, value=float(booking.amount_ghs))
-            ws.cell(row=row_num, column=14, value=float(booking.cash_amount))
-            ws.cell(row=row_num, column=15, value=float(booking.momo_amount))
-            ws.cell(row=row_num, column=16, value=booking.momo_network or '')
-            ws.cell(row=row_num, column=17, value=booking.momo_number)
-            ws.cell(row=row_num, column=18, value=booking.booked_by.username if booking.booked_by else '')
-            ws.cell(row=row_num, column=19, value=booking.created_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=20, value=booking.last_edited_by.username if booking.last_edited_by else '')
-            ws.cell(row=row_num, column=21, value=booking.updated_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=22, value=booking.authorized_by or booking.rejected_by or '')
-            ws.cell(row=row_num, column=23, value=booking.get_status_display())
-            ws.cell(row=row_num, column=24, value=booking.rejection_reason or '')
-            ws.cell(row=row_num, column=25, value=booking.version_number)
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"bookings_export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return BookingExport().from_request(request, self.get_queryset())
 
 
 class RoomViewSet(viewsets.ModelViewSet):
@@ -430,6 +498,18 @@ class RoomViewSet(viewsets.ModelViewSet):
     serializer_class = RoomSerializer
     permission_classes = [IsAuthenticated]
     
+    # Longest range the status board will render in one request
+    MAX_STATUS_DAYS = 31
+    # Longest range the occupancy calendar will render in one request
+    MAX_CALENDAR_DAYS = 366
+    # Longest range of daily occupancy analytics in one request
+    MAX_ANALYTICS_DAYS = 3660
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Rooms changed since ?since=<watermark>; see BookingViewSet.changes"""
+        return sync.changes_response(self, Room.objects.all(), 'room')
+    
     @action(detail=False, methods=['get'])
     def available(self, request):
         """Get available rooms for given dates"""
@@ -453,80 +533,192 @@ class RoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        rooms = Room.objects.filter(is_available=True)
-        
-        if room_type:
-            rooms = rooms.filter(room_type=room_type)
-        
-        available_rooms = []
         try:
             exclude_id = int(exclude_booking_id) if exclude_booking_id else None
         except (ValueError, TypeError):
             exclude_id = None
-        for room in rooms:
-            is_available = room.check_availability(check_in, check_out, exclude_booking_id=exclude_id)
-            if is_available:
-                available_rooms.append({
-                    'room_id': room.id,
-                    'room_number': room.room_number,
-                    'room_type': room.room_type,
-                    'room_type_display': room.get_room_type_display(),
-                    'is_available': True,
-                    'price_per_night': float(room.price_per_night),
-                    'description': room.description
-                })
-        
-        return Response(available_rooms)
+
+        # Single anti-join query (or an in-memory index lookup) regardless of room count
+        rooms = find_available_rooms(check_in, check_out, exclude_booking_id=exclude_id, room_type=room_type)
+
+        return Response([
+            {
+                'room_id': room.id,
+                'room_number': room.room_number,
+                'room_type': room.room_type,
+                'room_type_display': room.get_room_type_display(),
+                'is_available': True,
+                'price_per_night': float(room.price_per_night),
+                'description': room.description
+            }
+            for room in rooms
+        ])
     
     @action(detail=False, methods=['get'])
     def status(self, request):
-        """Get all rooms with their booking status for a given date"""
+        """
+        Get all rooms with their booking status for a given date.
+        
+        Pass from/to (YYYY-MM-DD) instead of date to get one board per day
+        for a range of up to 31 days in the same number of queries.
+        """
         target_date = request.query_params.get('date', None)
+        from_date = request.query_params.get('from', None)
+        to_date = request.query_params.get('to', None)
+        is_range = bool(from_date or to_date)
         
-        if target_date:
-            try:
-                target_date = date.fromisoformat(target_date)
-            except ValueError:
-                return Response(
-                    {"error": "Invalid date format. Use YYYY-MM-DD."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            target_date = timezone.now().date()
+        try:
+            if is_range:
+                start_date = date.fromisoformat(from_date) if from_date else timezone.now().date()
+                end_date = date.fromisoformat(to_date) if to_date else start_date
+            elif target_date:
+                start_date = end_date = date.fromisoformat(target_date)
+            else:
+                start_date = end_date = timezone.now().date()
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        rooms = Room.objects.all()
-        room_status = []
+        if end_date < start_date:
+            return Response(
+                {"error": "'to' must be on or after 'from'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (end_date - start_date).days >= self.MAX_STATUS_DAYS:
+            return Response(
+                {"error": f"Date range cannot exceed {self.MAX_STATUS_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        for room in rooms:
-            is_booked = not room.check_availability(target_date)
+        board = room_status_board(Room.objects.all(), start_date, end_date)
+        
+        def serialize(entry):
+            room = entry['room']
+            booking = entry['current_booking']
             current_booking = None
-            if is_booked:
-                booking = Booking.objects.filter(
-                    room=room,
-                    is_original=True,
-                    check_in_date__lte=target_date
-                ).exclude(
-                    check_out_date__lt=target_date
-                ).first()
-                if booking:
-                    current_booking = {
-                        'guest_name': booking.name,
-                        'check_in': str(booking.check_in_date),
-                        'check_out': str(booking.check_out_date) if booking.check_out_date else None
-                    }
-            
-            room_status.append({
+            if booking:
+                current_booking = {
+                    'guest_name': booking['name'],
+                    'check_in': str(booking['check_in_date']),
+                    'check_out': str(booking['check_out_date']) if booking['check_out_date'] else None
+                }
+            return {
                 'room_id': room.id,
                 'room_number': room.room_number,
                 'room_type': room.room_type,
                 'room_type_display': room.get_room_type_display(),
                 'is_available': room.is_available,
-                'is_booked': is_booked,
+                'is_booked': entry['is_booked'],
                 'current_booking': current_booking,
                 'price_per_night': float(room.price_per_night)
-            })
+            }
+        
+        if not is_range:
+            _, entries = board[0]
+            return Response([serialize(entry) for entry in entries])
+        
+        return Response([
+            {'date': str(day), 'rooms': [serialize(entry) for entry in entries]}
+            for day, entries in board
+        ])
+
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Rooms x days occupancy matrix for a date range (up to a year).
+        
+        Each room's booked days are returned as [offset, length] runs, where
+        offset counts days from 'from'.
+        """
+        from_date = request.query_params.get('from', None)
+        to_date = request.query_params.get('to', None)
+        room_type = request.query_params.get('room_type', None)
+        
+        if not from_date or not to_date:
+            return Response(
+                {"error": "from and to parameters are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start_date = date.fromisoformat(from_date)
+            end_date = date.fromisoformat(to_date)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end_date < start_date:
+            return Response(
+                {"error": "'to' must be on or after 'from'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (end_date - start_date).days >= self.MAX_CALENDAR_DAYS:
+            return Response(
+                {"error": f"Date range cannot exceed {self.MAX_CALENDAR_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rooms = Room.objects.all()
+        if room_type:
+            rooms = rooms.filter(room_type=room_type)
+        
+        rooms, matrix = occupancy_calendar(rooms, start_date, end_date)
+        runs = occupancy_runs(matrix)
+        
+        return Response({
+            'from': str(start_date),
+            'to': str(end_date),
+            'days': matrix.shape[1],
+            'rooms': [
+                {
+                    'room_id': room.id,
+                    'room_number': room.room_number,
+                    'room_type': room.room_type,
+                    'is_available': room.is_available,
+                    'booked': room_runs,
+                }
+                for room, room_runs in zip(rooms, runs)
+            ]
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsManager])
+    def occupancy(self, request):
+        """
+        Occupancy, ADR and RevPAR per day and per room type between ?from=
+        and ?to= (inclusive; defaults to the last 30 days). Managers only.
+        """
+        try:
+            end_date = request.query_params.get('to')
+            end_date = date.fromisoformat(end_date) if end_date else timezone.now().date()
+            start_date = request.query_params.get('from')
+            start_date = date.fromisoformat(start_date) if start_date else end_date - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end_date < start_date:
+            return Response(
+                {"error": "'to' must be on or after 'from'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (end_date - start_date).days >= self.MAX_ANALYTICS_DAYS:
+            return Response(
+                {"error": f"Date range cannot exceed {self.MAX_ANALYTICS_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(room_status)
+        return Response({
+            'from': str(start_date),
+            'to': str(end_date),
+            **analytics.occupancy(start_date, end_date),
+        })
 
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
@@ -571,34 +763,15 @@ class RoomIssueViewSet(viewsets.ModelViewSet):
     queryset = RoomIssue.objects.all()
     serializer_class = RoomIssueSerializer
     permission_classes = [IsAuthenticated]  # Both managers and receptionists have equal access
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         # Both managers and receptionists can see all issues
-        queryset = RoomIssue.objects.all()
-        
-        # Filter by room if provided
-        room_id = self.request.query_params.get('room', None)
-        if room_id:
-            queryset = queryset.filter(room_id=room_id)
-        
-        # Filter by status if provided
-        status_filter = self.request.query_params.get('status', None)
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        # Filter by issue_type if provided
-        issue_type = self.request.query_params.get('issue_type', None)
-        if issue_type:
-            queryset = queryset.filter(issue_type=issue_type)
-        
-        # Filter unresolved issues
-        unresolved = self.request.query_params.get('unresolved', None)
-        if unresolved and unresolved.lower() == 'true':
-            queryset = queryset.exclude(status__in=['fixed', 'resolved'])
-        
-        return queryset.order_by('-reported_at')
+        queryset = RoomIssue.objects.select_related('room', 'reported_by', 'fixed_by')
+        return filter_room_issues(queryset, self.request.query_params)
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def mark_fixed(self, request, pk=None):
         """Mark an issue as fixed"""
         issue = self.get_object()
@@ -618,6 +791,12 @@ class RoomIssueViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(issue)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Issues changed since ?since=<watermark>; see BookingViewSet.changes"""
+        queryset = RoomIssue.objects.select_related('room', 'reported_by', 'fixed_by')
+        return sync.changes_response(self, queryset, 'room_issue')
+    
     @action(detail=False, methods=['get'])
     def by_room(self, request):
         """Get all issues for a specific room"""
@@ -635,136 +814,374 @@ class RoomIssueViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get summary of room issues"""
-        total_issues = RoomIssue.objects.count()
-        unresolved = RoomIssue.objects.exclude(status__in=['fixed', 'resolved']).count()
-        
-        by_type = {}
-        for issue_type, display in RoomIssue.ISSUE_TYPE_CHOICES:
-            by_type[issue_type] = {
-                'display': display,
-                'count': RoomIssue.objects.filter(issue_type=issue_type).count(),
-                'unresolved': RoomIssue.objects.filter(
-                    issue_type=issue_type
-                ).exclude(status__in=['fixed', 'resolved']).count()
-            }
-        
-        by_status = {}
-        for status_val, display in RoomIssue.STATUS_CHOICES:
-            by_status[status_val] = {
-                'display': display,
-                'count': RoomIssue.objects.filter(status=status_val).count()
-            }
+        return Response(room_issue_summary())
+    
+    @action(detail=False, methods=['get'], url_path='resolution-times')
+    def resolution_times(self, request):
+        """
+        Mean and p50/p90/p99 time to fix (hours) overall and by room, issue
+        type and priority, for fixed issues reported between ?from= and ?to=.
+        """
+        try:
+            start = request.query_params.get('from')
+            start = date.fromisoformat(start) if start else None
+            end = request.query_params.get('to')
+            end = date.fromisoformat(end) if end else None
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
-            'total_issues': total_issues,
-            'unresolved': unresolved,
-            'resolved': total_issues - unresolved,
-            'by_type': by_type,
-            'by_status': by_status
+            'from': start,
+            'to': end,
+            **analytics.resolution_times(start, end),
         })
     
-    @action(detail=False, methods=['get'], url_path='export-excel')
+    @action(detail=False, methods=['get'], url_path='export-excel', renderer_classes=EXPORT_ACTION_RENDERERS)
     def export_excel(self, request):
-        """Export room issues to Excel file"""
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
+        """Export room issues as Excel, or ?format=csv / ndjson (optionally &compress=gzip)"""
         # Get issues based on filters
-        queryset = self.get_queryset()
-        
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Room Issues"
-        
-        # Headers
-        headers = [
-            'ID', 'Room Number', 'Room Type', 'Issue Type', 'Title',
-            'Description', 'Status', 'Priority', 'Reported By',
-            'Reported At', 'Fixed By', 'Fixed At', 'Resolution Notes',
-            'Created At', 'Updated At'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Data rows
-        for row_num, issue in enumerate(queryset, 2):
-            ws.cell(row=row_num, column=1, value=issue.id)
-            ws.cell(row=row_num, column=2, value=issue.room.room_number)
-            ws.cell(row=row_num, column=3, value=issue.room.get_room_type_display())
-            ws.cell(row=row_num, column=4, value=issue.get_issue_type_display())
-            ws.cell(row=row_num, column=5, value=issue.title)
-            ws.cell(row=row_num, column=6, value=issue.description)
-            ws.cell(row=row_num, column=7, value=issue.get_status_display())
-            ws.cell(row=row_num, column=8, value=issue.get_priority_display())
-            ws.cell(row=row_num, column=9, value=issue.reported_by.username if issue.reported_by else '')
-            ws.cell(row=row_num, column=10, value=issue.reported_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=11, value=issue.fixed_by.username if issue.fixed_by else '')
-            ws.cell(row=row_num, column=12, value=issue.fixed_at.strftime('%Y-%m-%d %H:%M:%S') if issue.fixed_at else '')
-            ws.cell(row=row_num, column=13, value=issue.resolution_notes)
-            ws.cell(row=row_num, column=14, value=issue.created_at.strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row_num, column=15, value=issue.updated_at.strftime('%Y-%m-%d %H:%M:%S'))
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create HTTP response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"room_issues_export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
-        return response
+        return RoomIssueExport().from_request(request, self.get_queryset())
+
+
+# Unread counts are keyed by everything they depend on, so this only bounds memory
+NOTIFICATION_COUNT_CACHE_SECONDS = 300
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """List and mark notifications as read. Notifications are created when reservations are made or issues reported/fixed."""
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Notification.objects.all().order_by('-created_at')
+        # is_read comes from the user's read watermark in the same query
+        return self.read_state.annotate_is_read(Notification.objects.all()).order_by('-created_at')
+
+    @property
+    def read_state(self):
+        if not hasattr(self, '_read_state'):
+            self._read_state = NotificationReadState.for_user(self.request.user)
+        return self._read_state
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Notifications added since ?since=<watermark>; see
+        BookingViewSet.changes. Notifications never change once created, and
+        read state is not synced here (use unread-count).
+        """
+        return sync.changes_response(self, self.get_queryset(), 'notification', field='created_at')
+
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark a single notification as read for the current user."""
         notification = self.get_object()
-        notification.read_by.add(request.user)
+        NotificationReadState.mark_read(request.user, notification)
+        notification.is_read = True
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='mark-all-read')
     def mark_all_read(self, request):
         """Mark all notifications as read for the current user."""
-        for notification in Notification.objects.all():
-            notification.read_by.add(request.user)
+        NotificationReadState.mark_all_read(request.user)
         return Response({'status': 'ok'})
 
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Unread count and newest notification ID for polling.
+        
+        The ETag changes whenever a notification is added or the user reads
+        one, so If-None-Match polls are answered with 304 without counting,
+        and counts are cached under the same key.
+        """
+        from django.core.cache import cache
+        from django.http import HttpResponseNotModified
+        
+        read_state = self.read_state
+        latest_id = Notification.objects.aggregate(latest=models.Max('id'))['latest']
+        last_read_at = read_state.last_read_at.isoformat() if read_state.last_read_at else ''
+        fingerprint = f"{request.user.pk}:{latest_id or 0}:{last_read_at}:{len(read_state.read_ids)}"
+        digest = hashlib.md5(fingerprint.encode()).hexdigest()
+        etag = f'"{digest}"'
+        
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            cache_key = f"notifications:unread:{digest}"
+            count = cache.get(cache_key)
+            if count is None:
+                count = read_state.unread().count()
+                cache.set(cache_key, count, NOTIFICATION_COUNT_CACHE_SECONDS)
+            response = Response({'unread_count': count, 'latest_id': latest_id})
+        
+        response['ETag'] = etag
+        # Let clients keep the answer but always revalidate it
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background exports.
+    
+    POST a kind (bookings, room_issues, booking_versions), export_format,
+    compress and filters to queue an export, poll the job until it is
+    completed, then fetch its download_url (Range requests supported).
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        return ExportJob.objects.filter(requested_by=self.request.user).order_by('-created_at')
+    
+    def create(self, request):
+        from . import jobs
+        
+        kind = request.data.get('kind')
+        export_format = request.data.get('export_format', 'xlsx')
+        compress = str(request.data.get('compress', '')).lower() in ['true', '1', 'gzip']
+        filters = request.data.get('filters') or {}
+        
+        if kind not in jobs.KINDS:
+            return Response(
+                {"error": f"Invalid kind. Use one of: {', '.join(jobs.KINDS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if export_format not in dict(ExportJob.FORMAT_CHOICES):
+            return Response(
+                {"error": "Invalid export_format. Use xlsx, csv or ndjson."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(filters, dict):
+            return Response(
+                {"error": "filters must be an object."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if kind in jobs.MANAGER_ONLY_KINDS and not request.user.is_manager():
+            return Response(
+                {"detail": "Only managers can export booking versions."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            filters = jobs.clean_filters(kind, filters)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        job, created = jobs.enqueue(request.user, kind, export_format, compress, filters)
+        serializer = self.get_serializer(job)
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        )
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the finished file; honours a single Range: bytes=... header"""
+        job = self.get_object()
+        if job.status != 'completed':
+            return Response(
+                {"detail": f"This export is {job.get_status_display().lower()}."},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not os.path.exists(job.file_path):
+            return Response(
+                {"detail": "The export file is no longer available. Please request it again."},
+                status=status.HTTP_410_GONE
+            )
+        
+        content_type = 'application/gzip' if job.compress else EXPORT_CONTENT_TYPES[job.export_format]
+        return _ranged_file_response(job.file_path, job.file_name, content_type, request.headers.get('Range'))
+
+
+def _ranged_file_response(path, filename, content_type, range_header):
+    """File download answering a single byte range with 206 Partial Content"""
+    from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+    
+    size = os.path.getsize(path)
+    byte_range = _parse_range(range_header, size)
+    
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+    
+    if byte_range is False:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    start, end = byte_range
+    
+    def read_range(block_size=64 * 1024):
+        with open(path, 'rb') as fileobj:
+            fileobj.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = fileobj.read(min(block_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+    
+    response = StreamingHttpResponse(
+        read_range(), status=status.HTTP_206_PARTIAL_CONTENT, content_type=content_type
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _parse_range(range_header, size):
+    """
+    (start, end) for a single bytes range, None to send the whole file, or
+    False when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    
+    start, _, end = range_header[len('bytes='):].strip().partition('-')
+    try:
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0:
+                return False
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@api_view(['POST'])
+def event_stream_ticket(request):
+    """A single-use ticket for opening the event stream (see event_stream)"""
+    return Response({
+        'ticket': events.issue_ticket(request.user),
+        'expires_in': settings.EVENT_STREAM_TICKET_SECONDS,
+    }, status=status.HTTP_201_CREATED)
+
+
+async def event_stream(request):
+    """
+    Server-sent events for notifications and booking, room and issue status.
+    
+    Only served by the ASGI application, which runs in its own process (see
+    render.yaml); under WSGI the stream would be buffered until it closed.
+    EventSource cannot send headers, so browsers authenticate with a
+    single-use ?ticket= from POST /api/events/ticket/; other clients may send
+    the JWT as a Bearer token. A reconnecting client sends Last-Event-ID (or
+    ?last_event_id=) and gets the events it missed, or a 'reset' event when
+    they are no longer kept and it should reload instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'The event stream is served by the ASGI application.'}, status=404)
+    
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+    
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    
+    response = StreamingHttpResponse(_event_messages(user, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _stream_user(request):
+    ticket = request.GET.get('ticket')
+    if ticket:
+        return events.redeem_ticket(ticket)
+    
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme != 'Bearer':
+        return None
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _replay(user, last_id):
+    """Missed events visible to user, or None if some may have been pruned"""
+    if not events.can_resume(last_id):
+        return None
+    missed = []
+    while True:
+        batch = events.events_after(last_id)
+        missed.extend(event for event in batch if event.is_visible_to(user))
+        if len(batch) < events.BATCH_SIZE:
+            return missed
+        last_id = batch[-1].pk
+
+
+def _sse_message(event):
+    return f"id: {event.pk}\nevent: {event.event_type}\ndata: {json.dumps(event.payload)}\n\n"
+
+
+async def _event_messages(user, last_id):
+    subscription = events.broker.subscribe()
+    deadline = time.monotonic() + settings.EVENT_STREAM_MAX_SECONDS
+    sent = set()
+    try:
+        yield f"retry: {settings.EVENT_STREAM_RETRY_MS}\n\n"
+        
+        while time.monotonic() < deadline:
+            if last_id is not None:
+                # Resuming, or fallen too far behind to trust the queue
+                missed = await sync_to_async(_replay)(user, last_id)
+                if missed is None:
+                    yield "event: reset\ndata: {}\n\n"
+                    missed = []
+                for event in missed:
+                    sent.add(event.pk)
+                    yield _sse_message(event)
+                last_id = None
+            
+            try:
+                batch = await subscription.get(settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ": ping\n\n"
+                continue
+            
+            for event in batch:
+                if event.pk in sent or not event.is_visible_to(user):
+                    continue
+                yield _sse_message(event)
+            
+            if subscription.overflowed:
+                subscription.overflowed = False
+                last_id = batch[-1].pk
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+    finally:
+        # Streams end after EVENT_STREAM_MAX_SECONDS and the client resumes
+        # with Last-Event-ID, so abandoned connections cannot pile up
+        events.broker.unsubscribe(subscription)
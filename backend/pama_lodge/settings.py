@@ -4,6 +4,7 @@ Django settings for pama_lodge project.
 
 from pathlib import Path
 from decouple import config
+from corsheaders.defaults import default_headers
 from datetime import timedelta
 import os
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -160,6 +162,77 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Answer room availability from an in-process interval index instead of the
+# database. Workers stay coherent through a shared version counter, which
+# each process reads at most every OCCUPANCY_INDEX_CHECK_SECONDS.
+OCCUPANCY_INDEX_ENABLED = config('OCCUPANCY_INDEX_ENABLED', default=False, cast=bool)
+OCCUPANCY_INDEX_CHECK_SECONDS = config('OCCUPANCY_INDEX_CHECK_SECONDS', default=2, cast=int)
+
+# Cache for cheap answers to frequently polled endpoints. Set REDIS_URL to
+# share it between worker processes; otherwise each process keeps its own.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pama-lodge',
+        }
+    }
+
+# How long dashboard statistics (admin index, room issue summary) may be
+# served from the cache; writes through the ORM invalidate them when they commit
+STATS_CACHE_SECONDS = config('STATS_CACHE_SECONDS', default=60, cast=int)
+
+# Live event stream (/api/events/). Served by the ASGI application in its
+# own process; the rest of the API runs on WSGI so streaming responses are
+# not buffered. The listener falls back to polling the event log this often
+# when PostgreSQL LISTEN is unavailable; streams close after
+# EVENT_STREAM_MAX_SECONDS and clients resume from the last event id.
+EVENT_STREAM_POLL_SECONDS = config('EVENT_STREAM_POLL_SECONDS', default=5, cast=int)
+EVENT_STREAM_HEARTBEAT_SECONDS = 15
+EVENT_STREAM_MAX_SECONDS = config('EVENT_STREAM_MAX_SECONDS', default=300, cast=int)
+EVENT_STREAM_RETRY_MS = 3000
+# Lifetime of the single-use ticket a browser opens the stream with
+EVENT_STREAM_TICKET_SECONDS = 30
+EVENT_LOG_RETENTION_HOURS = config('EVENT_LOG_RETENTION_HOURS', default=24, cast=int)
+
+# Responses to requests sent with an Idempotency-Key header are replayed to
+# retries for this long. A key whose first request has not finished after
+# IDEMPOTENCY_LEASE_SECONDS is given to the next retry; keep it above the
+# worker timeout.
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+IDEMPOTENCY_LEASE_SECONDS = config('IDEMPOTENCY_LEASE_SECONDS', default=60, cast=int)
+
+# Delta sync (/api/<collection>/changes/) re-sends rows written this recently
+# on the next sync, so a transaction that commits after a client synced
+# cannot slip in behind its watermark
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=5, cast=int)
+# Deletes are remembered this long; clients that have not synced for longer
+# are sent a full snapshot instead
+SYNC_TOMBSTONE_RETENTION_DAYS = config('SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# Booking versions store only changed fields, with a full snapshot every
+# this many versions to bound how far back a reconstruction has to read.
+BOOKING_VERSION_SNAPSHOT_INTERVAL = config('BOOKING_VERSION_SNAPSHOT_INTERVAL', default=10, cast=int)
+
+# Background export jobs: where finished files are kept and how many are
+# built at once by the in-process worker pool (0 leaves them to the
+# run_export_jobs management command). A job whose worker has not beaten
+# for EXPORT_JOB_STALE_SECONDS is queued again; jobs and their files are
+# deleted after EXPORT_RETENTION_HOURS.
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'exports'))
+EXPORT_JOB_WORKERS = config('EXPORT_JOB_WORKERS', default=2, cast=int)
+EXPORT_JOB_HEARTBEAT_SECONDS = 30
+EXPORT_JOB_STALE_SECONDS = config('EXPORT_JOB_STALE_SECONDS', default=120, cast=int)
+EXPORT_RETENTION_HOURS = config('EXPORT_RETENTION_HOURS', default=24, cast=int)
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
@@ -173,3 +246,8 @@ CORS_ALLOWED_ORIGINS = [origin.strip() for origin in CORS_ALLOWED_ORIGINS_STR.sp
 
 CORS_ALLOW_CREDENTIALS = True
 
+CORS_ALLOW_HEADERS = [*default_headers, 'idempotency-key']
+
+# Let the frontend read ETags to revalidate polled endpoints, and tell
+# replayed idempotent responses apart
+CORS_EXPOSE_HEADERS = ['ETag', 'Idempotent-Replayed']
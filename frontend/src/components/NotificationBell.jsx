@@ -2,35 +2,71 @@ import { useState, useEffect, useRef } from "react";
 import { useNavigate, Link } from "react-router-dom";
 import axios from "axios";
 import { formatDistanceToNow } from "date-fns";
+import eventStream from "../services/eventStream";
 
 const POLL_INTERVAL_MS = 30 * 1000; // 30 seconds
 
 const NotificationBell = () => {
   const navigate = useNavigate();
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
+  const [latestId, setLatestId] = useState(null);
   const [loading, setLoading] = useState(false);
   const [open, setOpen] = useState(false);
   const panelRef = useRef(null);
+  // ETag of the last unread-count answer; unchanged counts come back as 304
+  const etagRef = useRef(null);
 
   const fetchNotifications = async () => {
     try {
-      const res = await axios.get("/api/notifications/");
+      const res = await axios.get("/api/notifications/", { params: { page_size: 20 } });
       setNotifications(Array.isArray(res.data) ? res.data : res.data?.results ?? []);
     } catch (err) {
       console.error("Failed to fetch notifications:", err);
     }
   };
 
+  const fetchUnreadCount = async () => {
+    try {
+      const res = await axios.get("/api/notifications/unread-count/", {
+        headers: etagRef.current ? { "If-None-Match": etagRef.current } : {},
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+      });
+      if (res.status === 304) return;
+      etagRef.current = res.headers?.etag ?? null;
+      setUnreadCount(res.data.unread_count);
+      setLatestId(res.data.latest_id);
+    } catch (err) {
+      console.error("Failed to fetch unread count:", err);
+    }
+  };
+
   useEffect(() => {
-    fetchNotifications();
-    const id = setInterval(fetchNotifications, POLL_INTERVAL_MS);
-    return () => clearInterval(id);
+    fetchUnreadCount();
+    // New notifications are pushed over the event stream; polling is only
+    // the fallback while it is disconnected
+    const unsubscribers = [
+      eventStream.subscribe("notification", (n) => {
+        setUnreadCount((count) => count + 1);
+        setLatestId(n.id);
+      }),
+      eventStream.subscribe("open", fetchUnreadCount),
+      eventStream.subscribe("reset", fetchUnreadCount),
+    ];
+    const id = setInterval(() => {
+      if (!eventStream.connected) fetchUnreadCount();
+    }, POLL_INTERVAL_MS);
+    return () => {
+      clearInterval(id);
+      unsubscribers.forEach((unsubscribe) => unsubscribe());
+    };
   }, []);
 
+  // The list itself is only loaded while the panel is open
   useEffect(() => {
     if (!open) return;
     fetchNotifications();
-  }, [open]);
+  }, [open, latestId]);
 
   useEffect(() => {
     const handleClickOutside = (e) => {
@@ -40,14 +76,13 @@ const NotificationBell = () => {
     return () => document.removeEventListener("click", handleClickOutside);
   }, []);
 
-  const unreadCount = notifications.filter((n) => !n.is_read).length;
-
   const markRead = async (id) => {
     try {
       await axios.post(`/api/notifications/${id}/mark_read/`);
       setNotifications((prev) =>
         prev.map((n) => (n.id === id ? { ...n, is_read: true } : n))
       );
+      setUnreadCount((count) => Math.max(0, count - 1));
     } catch (err) {
       console.error("Failed to mark notification read:", err);
     }
@@ -58,6 +93,7 @@ const NotificationBell = () => {
     try {
       await axios.post("/api/notifications/mark-all-read/");
       setNotifications((prev) => prev.map((n) => ({ ...n, is_read: true })));
+      setUnreadCount(0);
     } catch (err) {
       console.error("Failed to mark all read:", err);
     } finally {
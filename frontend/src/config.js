@@ -4,5 +4,8 @@
 const API_BASE_URL = import.meta.env.VITE_API_URL || 
   (import.meta.env.PROD ? '' : 'http://localhost:8000')
 
+// The live event stream is served by a separate ASGI service in production
+export const EVENTS_BASE_URL = import.meta.env.VITE_EVENTS_URL || API_BASE_URL
+
 export default API_BASE_URL
 
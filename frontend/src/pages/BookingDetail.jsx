@@ -35,8 +35,15 @@ const BookingDetail = () => {
 
   const fetchVersions = async () => {
     try {
-      const response = await axios.get(`/api/bookings/${id}/versions/`)
-      setVersions(response.data)
+      // Version history is paginated; follow the pages to show it all
+      const allVersions = []
+      let url = `/api/bookings/${id}/versions/?full=true`
+      while (url) {
+        const response = await axios.get(url)
+        allVersions.push(...response.data.results)
+        url = response.data.next
+      }
+      setVersions(allVersions)
     } catch (error) {
       console.error('Error fetching versions:', error)
     }
@@ -5,7 +5,7 @@ import { useAuth } from '../contexts/AuthContext'
 import { differenceInDays, parseISO } from 'date-fns'
 import { useOnlineStatus } from '../hooks/useOnlineStatus'
 import offlineStorage from '../services/offlineStorage'
-import syncService from '../services/syncService'
+import syncService, { createIdempotencyKey } from '../services/syncService'
 
 const BookingForm = () => {
   const { id } = useParams()
@@ -309,11 +309,17 @@ const BookingForm = () => {
         await axios.put(`/api/bookings/${id}/`, formData)
         navigate('/bookings')
       } else {
-        // Creating new booking - can work offline
+        // Creating new booking - can work offline. The key lets a retry of
+        // this submission (from the offline queue) be recognised as the same booking
+        const idempotencyKey = createIdempotencyKey()
+        let submittedOnline = false
         if (isOnline) {
           // Try to submit online first
           try {
-            await axios.post('/api/bookings/', formData)
+            submittedOnline = true
+            await axios.post('/api/bookings/', formData, {
+              headers: { 'Idempotency-Key': idempotencyKey },
+            })
             navigate('/bookings')
             return
           } catch (error) {
@@ -323,7 +329,7 @@ const BookingForm = () => {
         }
 
         // Save offline
-        await offlineStorage.addBooking(formData)
+        await offlineStorage.addBooking(submittedOnline ? { ...formData, idempotencyKey } : formData)
         setSuccess('Booking saved offline! It will be synced automatically when you reconnect to the internet.')
         
         // Try to sync immediately if online (in case online submission failed but we're still online)
@@ -2,20 +2,40 @@ import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import axios from 'axios'
 import { useAuth } from '../contexts/AuthContext'
+import syncService from '../services/syncService'
 import { format } from 'date-fns'
 
 const BookingList = () => {
-  const { isManager } = useAuth()
+  const { isManager, user } = useAuth()
   const [bookings, setBookings] = useState([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState('')
   const [filterDate, setFilterDate] = useState('')
+  const [searchQuery, setSearchQuery] = useState('')
+  // Best matches for the submitted search, or null when not searching
+  const [searchResults, setSearchResults] = useState(null)
 
   useEffect(() => {
     fetchBookings()
-  }, [filterDate])
+  }, [filterDate, user])
 
   const fetchBookings = async () => {
+    if (!user) return
+    try {
+      // Keep a local copy up to date with delta sync and filter it here
+      const synced = await syncService.pullChanges('bookings', user.id)
+      setBookings(
+        synced
+          .filter((booking) => !filterDate || booking.check_in_date === filterDate)
+          .sort((a, b) => (a.created_at < b.created_at ? 1 : a.created_at > b.created_at ? -1 : b.id - a.id))
+      )
+      setError('')
+      setLoading(false)
+      return
+    } catch (error) {
+      console.error('Delta sync failed, loading the full list:', error)
+    }
+
     try {
       let url = '/api/bookings/'
       if (filterDate) {
@@ -33,6 +53,32 @@ const BookingList = () => {
     }
   }
 
+  const searchGuests = async (e) => {
+    e.preventDefault()
+    const query = searchQuery.trim()
+    if (!query) {
+      setSearchResults(null)
+      return
+    }
+    try {
+      const response = await axios.get('/api/bookings/search/', {
+        params: { q: query, page_size: 50 },
+      })
+      setSearchResults(response.data.results)
+      setError('')
+    } catch (error) {
+      setError('Guest search needs an internet connection')
+      console.error('Error searching bookings:', error)
+    }
+  }
+
+  const clearSearch = () => {
+    setSearchQuery('')
+    setSearchResults(null)
+  }
+
+  const shownBookings = searchResults ?? bookings
+
   if (loading) {
     return (
       <div className="flex items-center justify-center min-h-screen bg-gradient-to-br from-gray-50 to-blue-50">
@@ -93,6 +139,35 @@ const BookingList = () => {
             )}
           </div>
         </div>
+        <form onSubmit={searchGuests} className="mt-4 flex flex-col sm:flex-row sm:items-center sm:justify-between">
+          <label className="block text-xs sm:text-sm font-semibold text-gray-700 mb-2 sm:mb-0">
+            Search Guests
+          </label>
+          <div className="flex items-center space-x-2 sm:space-x-3">
+            <input
+              type="search"
+              value={searchQuery}
+              onChange={(e) => setSearchQuery(e.target.value)}
+              placeholder="Name, phone/ID or room"
+              className="flex-1 sm:flex-none px-3 sm:px-4 py-2 border-2 border-gray-200 rounded-lg focus:border-blue-500 focus:ring-2 focus:ring-blue-200 transition-all duration-200 text-sm sm:text-base"
+            />
+            <button
+              type="submit"
+              className="px-3 sm:px-4 py-2 text-xs sm:text-sm font-medium text-white bg-blue-600 rounded-lg hover:bg-blue-700 transition-colors duration-200"
+            >
+              Search
+            </button>
+            {searchResults && (
+              <button
+                type="button"
+                onClick={clearSearch}
+                className="px-3 sm:px-4 py-2 text-xs sm:text-sm font-medium text-gray-700 bg-gray-100 rounded-lg hover:bg-gray-200 transition-colors duration-200"
+              >
+                Clear
+              </button>
+            )}
+          </div>
+        </form>
       </div>
 
       {error && (
@@ -114,11 +189,11 @@ const BookingList = () => {
       <div className="bg-white rounded-xl shadow-lg overflow-hidden">
         <div className="px-4 sm:px-6 py-4 sm:py-5 border-b border-gray-200 bg-gradient-to-r from-gray-50 to-white">
           <h3 className="text-lg sm:text-xl font-bold text-gray-900">
-            All Bookings ({bookings.length})
+            {searchResults ? `Search Results (${searchResults.length})` : `All Bookings (${bookings.length})`}
           </h3>
         </div>
 
-        {bookings.length === 0 ? (
+        {shownBookings.length === 0 ? (
           <div className="px-4 sm:px-6 py-12 sm:py-16 text-center">
             <svg
               className="mx-auto h-16 w-16 text-gray-400"
@@ -183,7 +258,7 @@ const BookingList = () => {
                 </tr>
               </thead>
               <tbody className="bg-white divide-y divide-gray-200">
-                {bookings.map((booking) => (
+                {shownBookings.map((booking) => (
                   <tr
                     key={booking.id}
                     className="hover:bg-blue-50 transition-colors duration-150"
@@ -19,7 +19,7 @@ const Dashboard = () => {
     try {
       const [totalsResponse, bookingsResponse] = await Promise.all([
         axios.get(`/api/bookings/daily_totals/?date=${selectedDate}`),
-        axios.get('/api/bookings/'),
+        axios.get('/api/bookings/?page_size=10'),
       ])
       setDailyTotals(totalsResponse.data)
       const bookings = Array.isArray(bookingsResponse.data) 
@@ -0,0 +1,95 @@
+import axios from 'axios'
+import { EVENTS_BASE_URL } from '../config'
+
+// Event types pushed by /api/events/
+const EVENT_TYPES = ['notification', 'booking', 'room', 'room_issue', 'reset']
+const RECONNECT_DELAY_MS = 5000
+
+// One shared server-sent event connection for the whole app
+class EventStream {
+  constructor() {
+    this.source = null
+    this.listeners = {}
+    this.lastEventId = null
+    this.reconnectTimer = null
+    // Bumped by close() so a connect() still fetching its ticket gives up
+    this.generation = 0
+    this.connecting = false
+  }
+
+  get connected() {
+    return this.source !== null && this.source.readyState === EventSource.OPEN
+  }
+
+  // Returns an unsubscribe function; 'open' fires whenever the stream connects
+  subscribe(type, listener) {
+    this.listeners[type] = [...(this.listeners[type] || []), listener]
+    this.connect()
+    return () => {
+      this.listeners[type] = (this.listeners[type] || []).filter((l) => l !== listener)
+      if (!Object.values(this.listeners).some((list) => list.length > 0)) this.close()
+    }
+  }
+
+  emit(type, data) {
+    const listeners = this.listeners[type] || []
+    listeners.forEach((listener) => listener(data))
+  }
+
+  async connect() {
+    const token = localStorage.getItem('token')
+    if (this.source || this.connecting || !token || typeof EventSource === 'undefined') return
+
+    // EventSource cannot send headers, so the stream is opened with a
+    // short-lived single-use ticket rather than the JWT itself
+    const generation = this.generation
+    this.connecting = true
+    let ticket
+    try {
+      const res = await axios.post('/api/events/ticket/')
+      ticket = res.data.ticket
+    } catch {
+      this.connecting = false
+      if (generation === this.generation) this.scheduleReconnect()
+      return
+    }
+    this.connecting = false
+    if (generation !== this.generation) return
+
+    const params = new URLSearchParams({ ticket })
+    if (this.lastEventId) params.set('last_event_id', this.lastEventId)
+    const source = new EventSource(`${EVENTS_BASE_URL}/api/events/?${params}`)
+    this.source = source
+
+    EVENT_TYPES.forEach((type) => {
+      source.addEventListener(type, (e) => {
+        if (e.lastEventId) this.lastEventId = e.lastEventId
+        this.emit(type, e.data ? JSON.parse(e.data) : {})
+      })
+    })
+    source.onopen = () => this.emit('open', {})
+    source.onerror = () => {
+      // The ticket is used up, so the browser's own retry would be refused;
+      // reconnect with a new ticket, resuming after the last event seen
+      source.close()
+      if (this.source !== source) return
+      this.source = null
+      this.emit('error', {})
+      this.scheduleReconnect()
+    }
+  }
+
+  scheduleReconnect() {
+    clearTimeout(this.reconnectTimer)
+    this.reconnectTimer = setTimeout(() => this.connect(), RECONNECT_DELAY_MS)
+  }
+
+  close() {
+    this.generation += 1
+    clearTimeout(this.reconnectTimer)
+    if (this.source) this.source.close()
+    this.source = null
+  }
+}
+
+export default new EventStream()
@@ -2,7 +2,7 @@
 class OfflineStorage {
   constructor() {
     this.dbName = 'PamaLodgeDB'
-    this.dbVersion = 1
+    this.dbVersion = 2
     this.db = null
   }
 
@@ -28,6 +28,17 @@ class OfflineStorage {
           bookingStore.createIndex('timestamp', 'timestamp', { unique: false })
           bookingStore.createIndex('synced', 'synced', { unique: false })
         }
+
+        // Server rows mirrored by delta sync, and each collection's watermark
+        if (!db.objectStoreNames.contains('syncedRecords')) {
+          const recordStore = db.createObjectStore('syncedRecords', {
+            keyPath: ['collection', 'id'],
+          })
+          recordStore.createIndex('collection', 'collection', { unique: false })
+        }
+        if (!db.objectStoreNames.contains('syncState')) {
+          db.createObjectStore('syncState', { keyPath: 'collection' })
+        }
       }
     })
   }
@@ -108,6 +119,70 @@ class OfflineStorage {
     })
   }
 
+  async getSyncState(collection) {
+    if (!this.db) await this.init()
+
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction(['syncState'], 'readonly')
+      const request = transaction.objectStore('syncState').get(collection)
+
+      request.onsuccess = () => resolve(request.result || null)
+      request.onerror = () => reject(request.error)
+    })
+  }
+
+  // Apply one page from /changes/ and store its watermark in a single transaction
+  async applyChanges(collection, { results, removed, watermark }, user) {
+    if (!this.db) await this.init()
+
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction(['syncedRecords', 'syncState'], 'readwrite')
+      const records = transaction.objectStore('syncedRecords')
+
+      results.forEach((record) => records.put({ ...record, collection }))
+      removed.forEach((id) => records.delete([collection, id]))
+      transaction.objectStore('syncState').put({ collection, watermark, user })
+
+      transaction.oncomplete = () => resolve()
+      transaction.onerror = () => reject(transaction.error)
+    })
+  }
+
+  async getSyncedRecords(collection) {
+    if (!this.db) await this.init()
+
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction(['syncedRecords'], 'readonly')
+      const index = transaction.objectStore('syncedRecords').index('collection')
+      const request = index.getAll(collection)
+
+      request.onsuccess = () => resolve(request.result)
+      request.onerror = () => reject(request.error)
+    })
+  }
+
+  async clearSyncedRecords(collection) {
+    if (!this.db) await this.init()
+
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction(['syncedRecords', 'syncState'], 'readwrite')
+      const index = transaction.objectStore('syncedRecords').index('collection')
+      const request = index.openKeyCursor(IDBKeyRange.only(collection))
+
+      request.onsuccess = () => {
+        const cursor = request.result
+        if (cursor) {
+          transaction.objectStore('syncedRecords').delete(cursor.primaryKey)
+          cursor.continue()
+        }
+      }
+      transaction.objectStore('syncState').delete(collection)
+
+      transaction.oncomplete = () => resolve()
+      transaction.onerror = () => reject(transaction.error)
+    })
+  }
+
   async getPendingCount() {
     const bookings = await this.getAllOfflineBookings()
     return bookings.length
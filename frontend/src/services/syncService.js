@@ -5,6 +5,28 @@ import API_BASE_URL from '../config'
 // Ensure axios uses the correct base URL
 axios.defaults.baseURL = API_BASE_URL
 
+// Rows per /changes/ request
+const SYNC_PAGE_SIZE = 500
+// Queued bookings per /bookings/bulk/ request (the server accepts up to 100)
+const BULK_BATCH_SIZE = 50
+
+// A unique key for the Idempotency-Key header, so a retried request is not applied twice
+export const createIdempotencyKey = () =>
+  typeof crypto !== 'undefined' && crypto.randomUUID
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`
+
+// The same batch of queued bookings always gets the same key, so resending
+// a batch whose response was lost replays that response instead of
+// creating the bookings again
+const batchIdempotencyKey = async (batch) => {
+  if (typeof crypto === 'undefined' || !crypto.subtle) return null
+  const ids = new TextEncoder().encode(batch.map((booking) => booking.id).join(','))
+  const digest = await crypto.subtle.digest('SHA-256', ids)
+  const hex = Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('')
+  return `offline-batch-${hex}`
+}
+
 class SyncService {
   constructor() {
     this.isSyncing = false
@@ -38,22 +60,17 @@ class SyncService {
       let syncedCount = 0
       let failedCount = 0
 
-      for (const booking of offlineBookings) {
+      // Bookings whose online submission may have gone through before it
+      // failed are resent on their own with the key that submission used
+      const keyed = offlineBookings.filter((booking) => booking.idempotencyKey)
+      for (const booking of keyed) {
+        const { id, timestamp, synced, idempotencyKey, ...bookingData } = booking
         try {
-          // Remove offline-specific fields before syncing
-          const { id, timestamp, synced, ...bookingData } = booking
-
-          const response = await axios.post('/api/bookings/', bookingData)
-
-          // Mark as synced if successful
+          await axios.post('/api/bookings/', bookingData, {
+            headers: { 'Idempotency-Key': idempotencyKey },
+          })
           await offlineStorage.markAsSynced(booking.id)
           syncedCount++
-
-          this.notifySyncListeners({
-            syncing: true,
-            count: syncedCount,
-            total: offlineBookings.length,
-          })
         } catch (error) {
           console.error('Failed to sync booking:', error)
           failedCount++
@@ -65,6 +82,51 @@ class SyncService {
         }
       }
 
+      // Submit the rest in batches rather than one request per booking
+      const queued = offlineBookings.filter((booking) => !booking.idempotencyKey)
+      for (let start = 0; start < queued.length; start += BULK_BATCH_SIZE) {
+        const batch = queued.slice(start, start + BULK_BATCH_SIZE)
+        // Remove offline-specific fields before syncing
+        const payload = batch.map(({ id, timestamp, synced, ...bookingData }) => bookingData)
+        const key = await batchIdempotencyKey(batch)
+
+        let results
+        try {
+          const response = await axios.post('/api/bookings/bulk/', payload, {
+            headers: key ? { 'Idempotency-Key': key } : {},
+          })
+          results = response.data.results
+        } catch (error) {
+          // Nothing in the batch was saved; leave it queued for the next sync
+          console.error('Failed to sync bookings:', error)
+          failedCount += batch.length
+          continue
+        }
+
+        for (const result of results) {
+          const booking = batch[result.index]
+          if (result.status === 201) {
+            // Mark as synced if successful
+            await offlineStorage.markAsSynced(booking.id)
+            syncedCount++
+          } else {
+            console.error('Failed to sync booking:', result.errors)
+            failedCount++
+
+            // If it's a validation error (400), mark as synced to avoid retrying invalid data
+            if (result.status === 400) {
+              await offlineStorage.markAsSynced(booking.id)
+            }
+          }
+        }
+
+        this.notifySyncListeners({
+          syncing: true,
+          count: syncedCount,
+          total: offlineBookings.length,
+        })
+      }
+
       this.notifySyncListeners({
         syncing: false,
         synced: syncedCount,
@@ -85,6 +147,39 @@ class SyncService {
     }
   }
 
+  // Bring the local copy of a collection (bookings, rooms, room-issues,
+  // notifications) up to date from /api/<collection>/changes/ and return it.
+  // The first pull downloads everything; later ones only what changed.
+  async pullChanges(collection, userId) {
+    let state = await offlineStorage.getSyncState(collection)
+    if (state && state.user !== userId) {
+      // Another user's copy: what they could see may differ
+      await offlineStorage.clearSyncedRecords(collection)
+      state = null
+    }
+
+    if (navigator.onLine) {
+      let watermark = state?.watermark
+      let hasMore = true
+      while (hasMore) {
+        const params = { limit: SYNC_PAGE_SIZE }
+        if (watermark) params.since = watermark
+        const response = await axios.get(`/api/${collection}/changes/`, { params })
+        if (response.data.full_resync) {
+          // Offline too long: deletes since then are no longer on record
+          await offlineStorage.clearSyncedRecords(collection)
+        }
+        await offlineStorage.applyChanges(collection, response.data, userId)
+        watermark = response.data.watermark
+        hasMore = response.data.has_more
+      }
+    } else if (!state) {
+      throw new Error('Device is offline and nothing has been synced yet')
+    }
+
+    return offlineStorage.getSyncedRecords(collection)
+  }
+
   async checkAndSync() {
     if (navigator.onLine && !this.isSyncing) {
       const pendingCount = await offlineStorage.getPendingCount()